@@ -5,7 +5,21 @@ import datetime
 import requests
 import threading
 import calendar
-from typing import Optional
+import copy
+import json
+import logging
+import random
+import re
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Set
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger("vibecheck.ui")
 
 # --- UI Constants ---
 BG_COLOR = "#f8f9fa"
@@ -21,8 +35,669 @@ SHADOW_COLOR = "#6c757d"
 
 # --- API & App State ---
 API_BASE_URL = "http://127.0.0.1:8000/api"
+# Draw trend charts natively from /mood-series; set to False to fall back to server-rendered PNGs.
+USE_NATIVE_CHARTS = True
 app_state = {"user_id": None, "user_name": None}
 
+# --- API Client ---
+# (connect, read) timeouts in seconds. Login/registration get more read time for password hashing.
+AUTH_TIMEOUT = (3.05, 15)
+READ_TIMEOUT = (3.05, 8)
+WRITE_TIMEOUT = (3.05, 8)
+# The server sends a keepalive every 15 seconds, so a read that waits longer than this means the stream is dead.
+EVENTS_TIMEOUT = (3.05, 45)
+GET_RETRIES = 3
+ETAG_CACHE_SIZE = 64
+# The server wraps each search hit in these; they cannot collide with anything the user typed.
+SNIPPET_OPEN = "\x02"
+SNIPPET_CLOSE = "\x03"
+SNIPPET_HIT = re.compile(f"({SNIPPET_OPEN}[^{SNIPPET_CLOSE}]*{SNIPPET_CLOSE})")
+# A chart signature this close to expiry is renewed rather than put in a new image URL.
+CHART_ACCESS_MARGIN = 60
+
+class ApiError(Exception):
+    """The server answered, but with an error status; `detail` is its user-facing message."""
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+class ApiClient:
+    """One pooled keep-alive session for every backend call, with timeouts and GET retries.
+
+    Network failures raise requests.exceptions.RequestException; error responses raise ApiError.
+    After login() every request carries the session token until logout().
+    """
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self.session = requests.Session()
+        # Only idempotent GETs are retried; a retried POST could log the same mood twice.
+        retry = Retry(total=GET_RETRIES, backoff_factor=0.3, status_forcelist=(502, 503, 504),
+                      allowed_methods=frozenset(["GET"]), respect_retry_after_header=True, raise_on_status=False)
+        self.session.mount("http://", HTTPAdapter(pool_maxsize=10, max_retries=retry))
+        self.session.mount("https://", HTTPAdapter(pool_maxsize=10, max_retries=retry))
+        # (path, params) -> (ETag, decoded body) for endpoints that support If-None-Match.
+        self._etag_cache = OrderedDict()
+        self._etag_lock = threading.Lock()
+        self.token = None
+        self.user_id = None
+        # (user_id, {"expires", "sig"}) for chart image URLs.
+        self._chart_access = None
+
+    def _request(self, method: str, path: str, timeout, headers=None, **kwargs):
+        headers = dict(headers or {})
+        if self.token:
+            headers.setdefault("Authorization", f"Bearer {self.token}")
+        response = self.session.request(method, f"{self.base_url}{path}", timeout=timeout, headers=headers, **kwargs)
+        if response.status_code >= 400:
+            try:
+                detail = response.json().get("detail", "An unknown error occurred.")
+            except ValueError:
+                detail = "An unknown error occurred."
+            raise ApiError(response.status_code, str(detail))
+        return response
+
+    def _get(self, path: str, **params):
+        return self._request("GET", path, READ_TIMEOUT, params=params or None).json()
+
+    def _get_conditional(self, path: str, **params):
+        """GET that revalidates with the last ETag; an unchanged resource comes back as a body-less 304."""
+        key = (path, tuple(sorted(params.items())))
+        with self._etag_lock:
+            cached = self._etag_cache.get(key)
+        headers = {"If-None-Match": cached[0]} if cached else None
+        response = self._request("GET", path, READ_TIMEOUT, params=params or None, headers=headers)
+        if response.status_code == 304 and cached:
+            body = cached[1]
+        else:
+            body = response.json()
+        etag = response.headers.get("ETag")
+        if etag:
+            with self._etag_lock:
+                self._etag_cache[key] = (etag, body)
+                self._etag_cache.move_to_end(key)
+                while len(self._etag_cache) > ETAG_CACHE_SIZE:
+                    self._etag_cache.popitem(last=False)
+        return body
+
+    # Authentication
+    def login(self, name: str, password: str) -> dict:
+        data = self._request("POST", "/login", AUTH_TIMEOUT, json={"name": name, "password": password}).json()
+        self.token, self.user_id = data["token"], data["user_id"]
+        return data
+
+    def logout(self):
+        """Forgets the session and asks the server to revoke it; offline, the token is simply dropped."""
+        token, self.token, self.user_id = self.token, None, None
+        self._chart_access = None
+        with self._etag_lock:
+            self._etag_cache.clear()
+        if token:
+            try:
+                self._request("POST", "/logout", WRITE_TIMEOUT, headers={"Authorization": f"Bearer {token}"})
+            except (ApiError, requests.exceptions.RequestException):
+                pass
+
+    def register(self, name: str, password: str) -> dict:
+        return self._request("POST", "/register", AUTH_TIMEOUT, json={"name": name, "password": password}).json()
+
+    # Sync
+    def add_entries_batch(self, user_id: int, entries: List[dict]) -> dict:
+        """Sends local entries (LocalStore rows) in one request; returns {"stored": [...], "duplicates": [...]} keys."""
+        payload = []
+        for entry in entries:
+            item = {"type": entry["type"], "client_key": entry["client_key"], "timestamp": entry["timestamp"]}
+            if entry["type"] == "mood":
+                item.update(mood_score=entry["mood_score"], notes=entry["notes"] or "")
+            else:
+                item["content"] = entry["content"]
+            payload.append(item)
+        return self._request("POST", "/entries/batch", WRITE_TIMEOUT, json={"user_id": user_id, "entries": payload}).json()
+
+    # Mood tracking
+    def today_moods(self, user_id: int) -> List[dict]:
+        return self._get(f"/today-moods/{user_id}")
+
+    def mood_series(self, user_id: int, start: datetime.date, end: datetime.date, bucket: str = "day") -> dict:
+        return self._get_conditional(f"/mood-series/{user_id}", **{"from": start.isoformat(), "to": end.isoformat(), "bucket": bucket})
+
+    def mood_data_check(self, user_id: int, timespan: str) -> dict:
+        return self._get(f"/mood-data-check/{user_id}", timespan=timespan)
+
+    def mood_chart_url(self, user_id: int, timespan: str, chart_version: str) -> str:
+        # Image controls cannot send headers, so the URL carries a short-lived signature instead of the token.
+        access = self._chart_access
+        if access is None or access[0] != user_id or access[1]["expires"] - time.time() < CHART_ACCESS_MARGIN:
+            access = self._chart_access = (user_id, self._get(f"/mood-chart-access/{user_id}"))
+        signed = access[1]
+        return (f"{self.base_url}/mood-chart/{user_id}?timespan={timespan}&v={chart_version}"
+                f"&expires={signed['expires']}&sig={signed['sig']}")
+
+    # Journaling
+    def journals(self, user_id: int, cursor: Optional[str] = None) -> dict:
+        """One newest-first page: {"entries": [...], "next_cursor": str or None}."""
+        params = {"cursor": cursor} if cursor else {}
+        return self._get(f"/journals/{user_id}", **params)
+
+    def search_journals(self, user_id: int, query: str, cursor: Optional[str] = None) -> dict:
+        """Best matches first; each entry has a "snippet" with hits wrapped in SNIPPET_OPEN/SNIPPET_CLOSE."""
+        params = {"q": query, "cursor": cursor} if cursor else {"q": query}
+        return self._get(f"/journals/{user_id}/search", **params)
+
+    def delete_journal(self, entry_id: int):
+        self._request("DELETE", f"/journal/{entry_id}", WRITE_TIMEOUT)
+
+    def activity_dates(self, user_id: int, start_month: datetime.date, end_month: datetime.date) -> Set[str]:
+        params = {"from": start_month.strftime("%Y-%m"), "to": end_month.strftime("%Y-%m")}
+        return set(self._get_conditional(f"/activity-dates/{user_id}", **params).get("dates", []))
+
+    # Live updates
+    def open_events(self, user_id: int, last_event_id: Optional[str] = None) -> requests.Response:
+        """Opens the /events stream of server-sent events; the caller reads it line by line and closes it."""
+        headers = {"Accept": "text/event-stream"}
+        if last_event_id:
+            headers["Last-Event-ID"] = last_event_id
+        return self._request("GET", f"/events/{user_id}", EVENTS_TIMEOUT, headers=headers, stream=True)
+
+    # Insights
+    def recommendation(self, user_id: int) -> str:
+        return self._get(f"/recommendation/{user_id}").get("recommendation", "Could not get a recommendation.")
+
+    def wellness_tip(self) -> dict:
+        return self._get("/wellness-tip")
+
+api = ApiClient(API_BASE_URL)
+
+# --- Local Replica ---
+LOCAL_DB_PATH = "vibecheck_local.db"
+# Synced entries stay on the device this long, so today's timeline and the calendar show them offline too.
+LOCAL_RETENTION_DAYS = 35
+
+class LocalStore:
+    """On-device SQLite copy of the user's own recent entries and of the last server responses.
+
+    `entries` doubles as the durable outbox: a row with synced = 0 has not reached the server yet
+    (1 = synced, -1 = rejected by the server and kept for inspection). `snapshots` keeps the last
+    payload of each read so a screen can render before the network answers.
+    """
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode = WAL")
+            # An entry confirmed in the UI has to survive a crash or power cut until it syncs.
+            self._conn.execute("PRAGMA synchronous = FULL")
+            with self._conn:
+                self._conn.execute('''CREATE TABLE IF NOT EXISTS entries (
+                                      client_key TEXT PRIMARY KEY,
+                                      user_id INTEGER NOT NULL,
+                                      type TEXT NOT NULL,
+                                      timestamp TEXT NOT NULL,
+                                      mood_score INTEGER,
+                                      notes TEXT,
+                                      content TEXT,
+                                      synced INTEGER NOT NULL DEFAULT 0)''')
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_user_time ON entries(user_id, timestamp)")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS idx_entries_pending ON entries(synced, timestamp)")
+                self._conn.execute('''CREATE TABLE IF NOT EXISTS snapshots (
+                                      user_id INTEGER NOT NULL,
+                                      key TEXT NOT NULL,
+                                      payload TEXT NOT NULL,
+                                      PRIMARY KEY (user_id, key))''')
+
+    def _query(self, sql: str, params: tuple = ()) -> List[dict]:
+        with self._lock:
+            return [dict(row) for row in self._conn.execute(sql, params).fetchall()]
+
+    def _write(self, sql: str, params: tuple = ()):
+        with self._lock, self._conn:
+            self._conn.execute(sql, params)
+
+    def record(self, user_id: int, entry_type: str, mood_score: Optional[int] = None,
+               notes: Optional[str] = None, content: Optional[str] = None) -> dict:
+        """Stores a new entry as pending and returns it; the timestamp is taken now, on this device."""
+        entry = {"client_key": uuid.uuid4().hex, "user_id": user_id, "type": entry_type,
+                 "timestamp": datetime.datetime.now().isoformat(timespec="seconds"),
+                 "mood_score": mood_score, "notes": notes, "content": content}
+        self._write("INSERT INTO entries (client_key, user_id, type, timestamp, mood_score, notes, content) "
+                    "VALUES (:client_key, :user_id, :type, :timestamp, :mood_score, :notes, :content)", entry)
+        return entry
+
+    def pending(self, user_id: int, limit: int) -> List[dict]:
+        return self._query("SELECT * FROM entries WHERE user_id = ? AND synced = 0 ORDER BY timestamp LIMIT ?",
+                           (user_id, limit))
+
+    def pending_count(self) -> int:
+        return self._query("SELECT COUNT(*) AS n FROM entries WHERE synced = 0")[0]["n"]
+
+    def mark(self, client_keys: List[str], synced: int):
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE entries SET synced = ? WHERE client_key = ?", [(synced, key) for key in client_keys])
+
+    def entries_between(self, user_id: int, entry_type: str, start: datetime.date, end: datetime.date) -> List[dict]:
+        """Local entries of one type whose timestamp falls on a day from `start` up to, not including, `end`."""
+        return self._query("SELECT * FROM entries WHERE user_id = ? AND type = ? AND timestamp >= ? AND timestamp < ? "
+                           "ORDER BY timestamp", (user_id, entry_type, start.isoformat(), end.isoformat()))
+
+    def pending_journals(self, user_id: int) -> List[dict]:
+        return self._query("SELECT * FROM entries WHERE user_id = ? AND type = 'journal' AND synced = 0 "
+                           "ORDER BY timestamp DESC", (user_id,))
+
+    def entry_dates(self, user_id: int, month: datetime.date) -> Set[str]:
+        rows = self._query("SELECT DISTINCT substr(timestamp, 1, 10) AS day FROM entries "
+                           "WHERE user_id = ? AND timestamp >= ? AND timestamp < ?",
+                           (user_id, month.isoformat(), add_months(month, 1).isoformat()))
+        return {row["day"] for row in rows}
+
+    def load_snapshot(self, user_id: int, key: str):
+        rows = self._query("SELECT payload FROM snapshots WHERE user_id = ? AND key = ?", (user_id, key))
+        return json.loads(rows[0]["payload"]) if rows else None
+
+    def save_snapshot(self, user_id: int, key: str, payload):
+        self._write("INSERT OR REPLACE INTO snapshots (user_id, key, payload) VALUES (?, ?, ?)",
+                    (user_id, key, json.dumps(payload)))
+
+    def prune(self):
+        cutoff = (datetime.date.today() - datetime.timedelta(days=LOCAL_RETENTION_DAYS)).isoformat()
+        self._write("DELETE FROM entries WHERE synced = 1 AND timestamp < ?", (cutoff,))
+        self._write("DELETE FROM snapshots WHERE key LIKE 'today-moods:%' AND key < ?", (f"today-moods:{cutoff}",))
+
+local_store = LocalStore(LOCAL_DB_PATH)
+
+# --- Activity Date Cache ---
+# Months fetched around the displayed one, so flipping to a neighbour is usually already cached.
+CALENDAR_PREFETCH_MONTHS = 1
+
+def add_months(d: datetime.date, delta: int) -> datetime.date:
+    """First day of the month `delta` months away from `d`."""
+    year, month = divmod(d.year * 12 + d.month - 1 + delta, 12)
+    return datetime.date(year, month + 1, 1)
+
+class ActivityDateCache:
+    """Per-month sets of ISO dates that have a mood or journal entry on the server, for the logged-in user.
+
+    Months are filled from /activity-dates and saved to the local store, so a restart can draw them
+    before the network answers. Months fetched in this session count as fresh; month navigation only
+    fetches the rest. Live updates patch the months held in place. Entries made on this device are
+    overlaid from the local store when drawing.
+    """
+
+    def __init__(self, store: LocalStore):
+        self._store = store
+        self._lock = threading.Lock()
+        self._user_id = None
+        self._months = {}
+        self._fresh = set()
+
+    @staticmethod
+    def _month_key(d: datetime.date) -> str:
+        return d.strftime("%Y-%m")
+
+    def _switch_user(self, user_id: int):
+        if user_id != self._user_id:
+            self._user_id = user_id
+            self._months.clear()
+            self._fresh.clear()
+
+    def get(self, user_id: int, month: datetime.date) -> Optional[Set[str]]:
+        with self._lock:
+            self._switch_user(user_id)
+            key = self._month_key(month)
+            if key not in self._months:
+                saved = self._store.load_snapshot(user_id, f"activity:{key}")
+                if saved is not None:
+                    self._months[key] = set(saved)
+            return self._months.get(key)
+
+    def is_fresh(self, user_id: int, month: datetime.date) -> bool:
+        with self._lock:
+            self._switch_user(user_id)
+            return self._month_key(month) in self._fresh
+
+    def store(self, user_id: int, start_month: datetime.date, end_month: datetime.date, dates: Set[str]):
+        with self._lock:
+            self._switch_user(user_id)
+            month = start_month
+            while month <= end_month:
+                key = self._month_key(month)
+                self._months[key] = {d for d in dates if d.startswith(key)}
+                self._fresh.add(key)
+                self._store.save_snapshot(user_id, f"activity:{key}", sorted(self._months[key]))
+                month = add_months(month, 1)
+
+    def invalidate(self, user_id: int, day: datetime.date):
+        with self._lock:
+            self._switch_user(user_id)
+            self._fresh.discard(self._month_key(day))
+
+    def patch(self, user_id: int, day: str, active: bool):
+        """Marks or unmarks one ISO date in a month already held, as reported by a live update."""
+        with self._lock:
+            self._switch_user(user_id)
+            key = day[:7]
+            dates = self._months.get(key)
+            if dates is None or (day in dates) == active:
+                return
+            if active:
+                dates.add(day)
+            else:
+                dates.discard(day)
+            self._store.save_snapshot(user_id, f"activity:{key}", sorted(dates))
+
+    def expire(self):
+        """Makes every month count as stale, e.g. after live updates were missed."""
+        with self._lock:
+            self._fresh.clear()
+
+    def clear(self):
+        with self._lock:
+            self._user_id = None
+            self._months.clear()
+            self._fresh.clear()
+
+activity_cache = ActivityDateCache(local_store)
+
+# --- Background Tasks ---
+class BackgroundRunner:
+    """Runs API calls off the Flet event thread and hands results back only while they are still wanted.
+
+    Every submit names a slot (e.g. "calendar"). A result is dropped if a newer request was made for the
+    same slot, or if the user navigated to another route after the request started.
+    """
+
+    def __init__(self, workers: int = 4):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vibecheck-api")
+        self._lock = threading.Lock()
+        self._route_generation = 0
+        self._latest = {}
+
+    def new_route(self):
+        with self._lock:
+            self._route_generation += 1
+            self._latest.clear()
+
+    def _is_current(self, slot: str, token: tuple) -> bool:
+        with self._lock:
+            return self._latest.get(slot) == token
+
+    def submit(self, slot: str, fetch, on_success, on_error=None):
+        with self._lock:
+            token = (self._route_generation, self._latest.get(slot, (0, 0))[1] + 1)
+            self._latest[slot] = token
+
+        def run():
+            try:
+                result = fetch()
+            except Exception as err:
+                if on_error and self._is_current(slot, token):
+                    on_error(err)
+                return
+            if self._is_current(slot, token):
+                on_success(result)
+
+        return self._executor.submit(run)
+
+runner = BackgroundRunner()
+
+# --- Outbox Sync ---
+SYNC_BATCH_SIZE = 100
+SYNC_IDLE_INTERVAL = 30.0
+SYNC_RETRY_BASE = 2.0
+SYNC_RETRY_MAX = 120.0
+
+class OutboxSync:
+    """Background thread that pushes pending local entries to /entries/batch.
+
+    It wakes on every local write and every SYNC_IDLE_INTERVAL seconds. After a network error or any error
+    status other than 400/422 it backs off exponentially with jitter. A batch rejected as invalid is split
+    until the entries at fault are found; only those are set aside. Entries carry their client_key as an idempotency key, so
+    resending a batch whose response was lost cannot create duplicates.
+    """
+
+    def __init__(self, store: LocalStore, client: ApiClient):
+        self.store = store
+        self.client = client
+        self._wake = threading.Event()
+        self._thread = None
+        self._failures = 0
+        self._retry_at = 0.0
+        # Called from the sync thread with the number of entries still waiting.
+        self.on_change = None
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="vibecheck-sync", daemon=True)
+            self._thread.start()
+
+    def flush_soon(self):
+        self._wake.set()
+
+    def _run(self):
+        while True:
+            if self._failures:
+                # A new entry during backoff does not cut the wait short; it goes out with the retry.
+                time.sleep(max(0.0, self._retry_at - time.monotonic()))
+            else:
+                self._wake.wait(SYNC_IDLE_INTERVAL)
+            self._wake.clear()
+            self._flush()
+            if self.on_change:
+                self.on_change(self.store.pending_count())
+
+    def _flush(self):
+        # Only the signed-in user's entries can be sent; anyone else's wait until they log in here again.
+        user_id = self.client.user_id
+        while user_id is not None and (entries := self.store.pending(user_id, SYNC_BATCH_SIZE)):
+            try:
+                self._send(user_id, entries)
+            except (ApiError, requests.exceptions.RequestException):
+                self._back_off()
+                return
+        self._failures = 0
+
+    def _send(self, user_id: int, entries: List[dict]):
+        try:
+            result = self.client.add_entries_batch(user_id, entries)
+        except ApiError as err:
+            if err.status_code not in (400, 422):
+                raise
+            if len(entries) == 1:
+                # The server will never accept this entry as it is; keep it locally but stop resending it.
+                self.store.mark([entries[0]["client_key"]], -1)
+                return
+            # Halving finds the bad entries in a few requests, and the rest of the batch still goes out.
+            middle = len(entries) // 2
+            self._send(user_id, entries[:middle])
+            self._send(user_id, entries[middle:])
+            return
+        self.store.mark(result.get("stored", []) + result.get("duplicates", []), 1)
+
+    def _back_off(self):
+        self._failures += 1
+        delay = min(SYNC_RETRY_MAX, SYNC_RETRY_BASE * 2 ** (self._failures - 1))
+        self._retry_at = time.monotonic() + delay * random.uniform(0.5, 1.0)
+
+outbox = OutboxSync(local_store, api)
+
+# --- Live Updates ---
+EVENTS_RETRY_BASE = 1.0
+EVENTS_RETRY_MAX = 60.0
+
+def patch_series(series: dict, day: str, count: int, mean: float):
+    """Puts one day's new average into a daily /mood-series payload, if the day is inside its window."""
+    if series.get("bucket") != "day" or not series["from"] <= day <= series["to"]:
+        return
+    dates = series["dates"]
+    index = next((i for i, d in enumerate(dates) if d >= day), len(dates))
+    if index < len(dates) and dates[index] == day:
+        series["mean"][index], series["count"][index] = mean, count
+    else:
+        dates.insert(index, day)
+        series["mean"].insert(index, mean)
+        series["count"].insert(index, count)
+
+class LiveUpdates:
+    """Background thread that follows /events/{user_id} while a user is logged in.
+
+    The server pushes small changes as server-sent events: a new mood or journal entry, a day that now
+    has activity, a deleted entry, a day's new average. Shared caches are patched here, then `on_event`
+    (set by the screen on display) patches what is drawn. Payloads handed to remember() are patched too,
+    and recall() returns them for as long as no update can have been missed, so screens need not refetch.
+    A dropped stream resumes from the last event id; if the server can no longer replay that far it
+    sends "resync", and everything remembered is forgotten.
+    """
+
+    def __init__(self, store: LocalStore, client: ApiClient, activity: ActivityDateCache):
+        self.store = store
+        self.client = client
+        self.activity = activity
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._response = None
+        self._last_event_id = None
+        self._remembered = {}
+        self.live = False
+        # Called from the stream thread with each event, including {"type": "resync"}.
+        self.on_event = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            # Each thread gets its own stop flag, so one still winding down after stop() cannot be revived.
+            self._stop = threading.Event()
+            self._last_event_id = None
+            self._thread = threading.Thread(target=self._run, args=(self._stop,), name="vibecheck-events", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            self._stop.set()
+            self._thread = None
+            response, self._response = self._response, None
+            self.live = False
+            self._remembered.clear()
+        if response is not None:
+            # Unblocks the read in the stream thread.
+            response.close()
+
+    def remember(self, key: str, payload):
+        # Copies both ways: the stream thread patches the remembered payload while screens draw theirs.
+        with self._lock:
+            if self.live:
+                self._remembered[key] = copy.deepcopy(payload)
+
+    def recall(self, key: str):
+        with self._lock:
+            return copy.deepcopy(self._remembered.get(key)) if self.live else None
+
+    def _run(self, stop: threading.Event):
+        try:
+            self._follow(stop)
+        finally:
+            with self._lock:
+                # Lets start() open a new stream once this one has given up, e.g. after a 401.
+                if self._thread is threading.current_thread():
+                    self._thread = None
+
+    def _follow(self, stop: threading.Event):
+        failures = 0
+        while not stop.is_set() and (user_id := self.client.user_id) is not None:
+            try:
+                response = self.client.open_events(user_id, self._last_event_id)
+                with self._lock:
+                    if stop.is_set():
+                        response.close()
+                        return
+                    self._response = response
+                failures = 0
+                self._read(user_id, response, stop)
+            except ApiError as err:
+                if err.status_code in (401, 403):
+                    # Logged out or expired; the next login starts a new stream.
+                    return
+                failures += 1
+            except (requests.exceptions.RequestException, ValueError):
+                failures += 1
+            except Exception:
+                # Closing the response in stop() can surface as almost any error in the blocked read.
+                if stop.is_set():
+                    return
+                # Anything else, such as a malformed event, is retried like a dropped connection.
+                logger.exception("Live updates stream failed")
+                failures += 1
+            finally:
+                with self._lock:
+                    if not stop.is_set():
+                        self.live = False
+                        self._response = None
+            # A stream the server ended on schedule is resumed at once; failures back off with jitter.
+            if failures:
+                stop.wait(min(EVENTS_RETRY_MAX, EVENTS_RETRY_BASE * 2 ** (failures - 1)) * random.uniform(0.5, 1.0))
+
+    def _read(self, user_id: int, response: requests.Response, stop: threading.Event):
+        event_id, data = None, []
+        with response:
+            for line in response.iter_lines(decode_unicode=True):
+                if stop.is_set():
+                    return
+                if line.startswith("id:"):
+                    event_id = line[3:].strip()
+                elif line.startswith("data:"):
+                    data.append(line[5:].strip())
+                elif not line and data:
+                    self._dispatch(user_id, event_id, json.loads("\n".join(data)))
+                    event_id, data = None, []
+                # "event:" repeats the type given in the data, and lines starting with ":" are keepalives.
+
+    def _dispatch(self, user_id: int, event_id: Optional[str], event: dict):
+        if event_id:
+            self._last_event_id = event_id
+        if event["type"] == "ready":
+            with self._lock:
+                if event_id:
+                    # A brand-new stream: whatever was fetched before it may already have missed an update.
+                    self._remembered.clear()
+                    self.activity.expire()
+                self.live = True
+            return
+        if event["type"] == "resync":
+            with self._lock:
+                self._remembered.clear()
+            self.activity.expire()
+        else:
+            self._apply(user_id, event)
+        handler = self.on_event
+        if handler:
+            handler(event)
+
+    def _apply(self, user_id: int, event: dict):
+        if event["type"] == "activity":
+            self.activity.patch(user_id, event["date"], True)
+        elif event["type"] == "journal-deleted" and not event["active"]:
+            self.activity.patch(user_id, event["date"], False)
+        elif event["type"] == "mood" and event["date"][:10] == datetime.date.today().isoformat():
+            key = f"today-moods:{event['date'][:10]}"
+            mood = {field: event[field] for field in ("mood_score", "date", "notes", "client_key")}
+            with self._lock:
+                moods = self._remembered.get(key)
+                if moods is not None and (mood["client_key"] is None or
+                                          all(m.get("client_key") != mood["client_key"] for m in moods)):
+                    moods.append(mood)
+                    moods.sort(key=lambda m: m["date"])
+                    self.store.save_snapshot(user_id, key, moods)
+        elif event["type"] == "rollup":
+            with self._lock:
+                for key, series in self._remembered.items():
+                    if key.startswith("mood-series:"):
+                        patch_series(series, event["date"], event["count"], event["mean"])
+
+live_updates = LiveUpdates(local_store, api, activity_cache)
+
 def main(page: ft.Page):
     page.title = "VibeCheck"
     page.bgcolor = BG_COLOR
@@ -32,6 +707,10 @@ def main(page: ft.Page):
     # --- UI Element Refs ---
     journal_entry_ref = ft.Ref[ft.TextField]()
 
+    # --- Offline Sync ---
+    local_store.prune()
+    outbox.start()
+
     # --- MAIN UI VIEW CREATORS ---
 
     def create_login_view():
@@ -48,16 +727,16 @@ def main(page: ft.Page):
                 page.update()
                 return
             try:
-                response = requests.post(f"{API_BASE_URL}/login", json={"name": login_username_field.value, "password": login_password_field.value})
-                if response.status_code == 200:
-                    data = response.json()
-                    app_state["user_id"] = data["user_id"]
-                    app_state["user_name"] = data["name"]
-                    page.go("/main")
-                else:
-                    error_text.value = response.json().get("detail", "An unknown error occurred.")
-                    error_text.visible = True
-                    page.update()
+                data = api.login(login_username_field.value, login_password_field.value)
+                app_state["user_id"] = data["user_id"]
+                app_state["user_name"] = data["name"]
+                outbox.flush_soon()
+                live_updates.start()
+                page.go("/main")
+            except ApiError as err:
+                error_text.value = err.detail
+                error_text.visible = True
+                page.update()
             except requests.exceptions.RequestException:
                 error_text.value = "Cannot connect to the server."
                 error_text.visible = True
@@ -107,15 +786,14 @@ def main(page: ft.Page):
                 page.update()
                 return
             try:
-                response = requests.post(f"{API_BASE_URL}/register", json={"name": reg_username_field.value, "password": reg_password_field.value})
-                if response.status_code == 200:
-                    page.snack_bar = ft.SnackBar(content=ft.Text("Account created! Please log in."), bgcolor=SUCCESS_COLOR)
-                    page.snack_bar.open = True
-                    page.go("/")
-                else:
-                    error_text.value = response.json().get("detail", "Registration failed.")
-                    error_text.visible = True
-                    page.update()
+                api.register(reg_username_field.value, reg_password_field.value)
+                page.snack_bar = ft.SnackBar(content=ft.Text("Account created! Please log in."), bgcolor=SUCCESS_COLOR)
+                page.snack_bar.open = True
+                page.go("/")
+            except ApiError as err:
+                error_text.value = err.detail
+                error_text.visible = True
+                page.update()
             except requests.exceptions.RequestException:
                 error_text.value = "Cannot connect to the server."
                 error_text.visible = True
@@ -150,7 +828,7 @@ def main(page: ft.Page):
             horizontal_alignment=ft.CrossAxisAlignment.CENTER
         )
 
-        def build_today_view():
+        def build_today_view(moods: Optional[List[dict]]):
             mood_map = {9: "😄", 7: "😊", 5: "😐", 3: "😟", 1: "😠"}
             score_to_label_map = {9: "Happy", 7: "Content", 5: "Neutral", 3: "Sad", 1: "Angry"}
             color_map = {9: ft.Colors.GREEN_200, 7: ft.Colors.LIGHT_GREEN_300, 5: ft.Colors.YELLOW_200, 3: ft.Colors.AMBER_300, 1: ft.Colors.RED_200}
@@ -158,35 +836,30 @@ def main(page: ft.Page):
             timeline = ft.ListView(expand=True, spacing=10, auto_scroll=True)
             timeline.controls.append(ft.Text(datetime.date.today().strftime("%A, %B %d"), size=20, weight=ft.FontWeight.BOLD, color=BLACK))
             
-            try:
-                response = requests.get(f"{API_BASE_URL}/today-moods/{app_state['user_id']}")
-                if response.status_code == 200:
-                    moods = response.json()
-                    if not moods:
-                        timeline.controls.append(ft.Text("No moods logged yet today.", color=TEXT_MUTED, italic=True))
-                    for mood in moods:
-                        mood_date = datetime.datetime.fromisoformat(mood['date'])
-                        mood_score = mood['mood_score']
-                        mood_label = score_to_label_map.get(mood_score, "a certain way")
-
-                        mood_card = ft.Container(
-                            content=ft.Row([
-                                ft.Text(mood_map.get(mood_score, "❓"), size=24),
-                                ft.Text(f"You felt {mood_label}", expand=True, color=BLACK),
-                                ft.Text(mood_date.strftime("%I:%M %p"), color=BLACK),
-                            ], vertical_alignment=ft.CrossAxisAlignment.CENTER),
-                            width=400,
-                            padding=15,
-                            border_radius=8,
-                            bgcolor=color_map.get(mood_score, ft.Colors.GREY_300)
-                        )
-                        timeline.controls.append(mood_card)
-            except requests.exceptions.RequestException: pass
+            if moods is not None:
+                if not moods:
+                    timeline.controls.append(ft.Text("No moods logged yet today.", color=TEXT_MUTED, italic=True))
+                for mood in moods:
+                    mood_date = datetime.datetime.fromisoformat(mood['date'])
+                    mood_score = mood['mood_score']
+                    mood_label = score_to_label_map.get(mood_score, "a certain way")
+
+                    mood_card = ft.Container(
+                        content=ft.Row([
+                            ft.Text(mood_map.get(mood_score, "❓"), size=24),
+                            ft.Text(f"You felt {mood_label}", expand=True, color=BLACK),
+                            ft.Text(mood_date.strftime("%I:%M %p"), color=BLACK),
+                        ], vertical_alignment=ft.CrossAxisAlignment.CENTER),
+                        width=400,
+                        padding=15,
+                        border_radius=8,
+                        bgcolor=color_map.get(mood_score, ft.Colors.GREY_300)
+                    )
+                    timeline.controls.append(mood_card)
             
             return ft.Container(content=timeline, expand=True, alignment=ft.alignment.center)
 
-        def build_line_chart_view(timespan: str):
-            url = f"{API_BASE_URL}/mood-chart/{app_state['user_id']}?timespan={timespan}&v={datetime.datetime.now().timestamp()}"
+        def build_line_chart_view(url: str):
             return ft.Container(
                 content=ft.Image(
                     src=url,
@@ -195,47 +868,152 @@ def main(page: ft.Page):
                 expand=True,
             )
 
-        def update_view(e, timespan: str):
+        def build_native_chart_view(timespan: str, series: dict):
+            mood_labels = {9: "😄 Happy", 7: "😊 Content", 5: "😐 Neutral", 3: "😟 Sad", 1: "😠 Angry"}
+            start = datetime.date.fromisoformat(series["from"])
+            end = datetime.date.fromisoformat(series["to"])
+            # x is days since the start of the window, so gaps between logged days keep their width.
+            points = [
+                ft.LineChartDataPoint((datetime.date.fromisoformat(day) - start).days, mean, tooltip=f"{day[5:]}: {mean}")
+                for day, mean in zip(series["dates"], series["mean"])
+            ]
+            label_step = 1 if timespan == "7d" else 3
+            bottom_labels = [
+                ft.ChartAxisLabel(
+                    value=offset,
+                    label=ft.Text((start + datetime.timedelta(days=offset)).strftime("%m-%d"), size=11, color=TEXT_MUTED),
+                )
+                for offset in range(0, (end - start).days + 1, label_step)
+            ]
+            chart = ft.LineChart(
+                data_series=[ft.LineChartData(data_points=points, stroke_width=3, color=PRIMARY_COLOR, point=True)],
+                min_x=0,
+                max_x=(end - start).days,
+                min_y=0,
+                max_y=10,
+                left_axis=ft.ChartAxis(
+                    labels=[ft.ChartAxisLabel(value=score, label=ft.Text(label, size=12, color=BLACK)) for score, label in mood_labels.items()],
+                    labels_size=100,
+                ),
+                bottom_axis=ft.ChartAxis(labels=bottom_labels, labels_size=32),
+                horizontal_grid_lines=ft.ChartGridLines(interval=2, color=BORDER_COLOR, width=1, dash_pattern=[4, 4]),
+                expand=True,
+            )
+            days_label = "7" if timespan == "7d" else "30"
+            return ft.Column([
+                ft.Text(f"Your Daily Average Mood (Last {days_label} Days)", size=16, weight=ft.FontWeight.BOLD, color=BLACK),
+                ft.Container(content=chart, expand=True, padding=20),
+            ], expand=True, horizontal_alignment=ft.CrossAxisAlignment.CENTER)
+
+        def build_not_enough_data_view(timespan: str):
+            message = f"Not enough mood data for the last {timespan.replace('d', '')} days. Keep logging to see your trend!"
+            return ft.Column([
+                    ft.Icon(name=ft.Icons.INFO_OUTLINE, size=48, color=TEXT_MUTED),
+                    ft.Text(
+                        value=message,
+                        size=16,
+                        color=TEXT_MUTED,
+                        text_align=ft.TextAlign.CENTER,
+                        italic=True,
+                        width=400
+                    )
+                ],
+                horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+                spacing=10)
+
+        def show_content(control: ft.Control):
             content_area.controls.clear()
-            content_area.controls.append(ft.ProgressRing())
+            content_area.controls.append(control)
             page.update()
 
+        def show_load_error(timespan: str, err: Exception):
+            if isinstance(err, ApiError):
+                show_content(build_not_enough_data_view(timespan))
+            else:
+                show_content(ft.Text("Error: Could not connect to the server.", color=ERROR_COLOR))
+
+        def update_view(e, timespan: str):
+            nonlocal shown_timespan
+            shown_timespan = timespan
+            user_id = app_state['user_id']
+            today = datetime.date.today()
+
             if timespan == "today":
-                content_area.controls.clear()
-                content_area.controls.append(build_today_view())
-                page.update()
+                snapshot_key = f"today-moods:{today.isoformat()}"
+
+                def with_local(server_moods: List[dict]) -> List[dict]:
+                    # Entries from this device that the server copy does not have yet (pending, or synced since it was fetched).
+                    known = {mood.get("client_key") for mood in server_moods}
+                    local = [{"mood_score": entry["mood_score"], "date": entry["timestamp"], "notes": entry["notes"],
+                              "client_key": entry["client_key"]}
+                             for entry in local_store.entries_between(user_id, "mood", today, today + datetime.timedelta(days=1))
+                             if entry["client_key"] not in known]
+                    return sorted(server_moods + local, key=lambda mood: mood["date"])
+
+                def on_moods(moods: List[dict]):
+                    local_store.save_snapshot(user_id, snapshot_key, moods)
+                    live_updates.remember(snapshot_key, moods)
+                    show_content(build_today_view(with_local(moods)))
+
+                remembered = live_updates.recall(snapshot_key)
+                if remembered is not None:
+                    # Live updates have kept the server copy current since it was fetched.
+                    show_content(build_today_view(with_local(remembered)))
+                    return
+                # Draw from the device first; the server copy replaces it when it arrives.
+                saved = local_store.load_snapshot(user_id, snapshot_key)
+                show_content(build_today_view(with_local(saved or [])))
+                runner.submit("mood-tracker", lambda: api.today_moods(user_id), on_moods)
                 return
 
-            try:
-                check_url = f"{API_BASE_URL}/mood-data-check/{app_state['user_id']}?timespan={timespan}"
-                response = requests.get(check_url)
-                content_area.controls.clear()
+            if USE_NATIVE_CHARTS:
+                days = 7 if timespan == "7d" else 30
+                series_key = f"mood-series:{timespan}:{today.isoformat()}"
 
-                if response.status_code == 200 and response.json().get("has_enough_data"):
-                    content_area.controls.append(build_line_chart_view(timespan))
-                else:
-                    message = f"Not enough mood data for the last {timespan.replace('d', '')} days. Keep logging to see your trend!"
-                    content_area.controls.append(
-                        ft.Column([
-                            ft.Icon(name=ft.Icons.INFO_OUTLINE, size=48, color=TEXT_MUTED),
-                            ft.Text(
-                                value=message,
-                                size=16,
-                                color=TEXT_MUTED,
-                                text_align=ft.TextAlign.CENTER,
-                                italic=True,
-                                width=400
-                            )
-                        ],
-                        horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                        spacing=10)
-                    )
-            except requests.exceptions.RequestException:
-                content_area.controls.clear()
-                content_area.controls.append(ft.Text("Error: Could not connect to the server.", color=ERROR_COLOR))
+                def show_series(series: dict):
+                    if len(series.get("dates", [])) >= 2:
+                        show_content(build_native_chart_view(timespan, series))
+                    else:
+                        show_content(build_not_enough_data_view(timespan))
 
-            page.update()
-        
+                def on_series(series: dict):
+                    live_updates.remember(series_key, series)
+                    show_series(series)
+
+                remembered = live_updates.recall(series_key)
+                if remembered is not None:
+                    show_series(remembered)
+                    return
+                show_content(ft.ProgressRing())
+                runner.submit("mood-tracker", lambda: api.mood_series(user_id, today - datetime.timedelta(days=days), today),
+                              on_series, lambda err: show_load_error(timespan, err))
+            else:
+                def load_chart_url() -> Optional[str]:
+                    check = api.mood_data_check(user_id, timespan)
+                    if not check.get("has_enough_data"):
+                        return None
+                    # The version only changes when new moods are logged, so repeat views reuse the cached image.
+                    return api.mood_chart_url(user_id, timespan, check.get("chart_version", ""))
+
+                def on_chart_url(url: Optional[str]):
+                    if url:
+                        show_content(build_line_chart_view(url))
+                    else:
+                        show_content(build_not_enough_data_view(timespan))
+
+                show_content(ft.ProgressRing())
+                runner.submit("mood-tracker", load_chart_url, on_chart_url, lambda err: show_load_error(timespan, err))
+
+        def on_live_update(event: dict):
+            # Runs on the live-update thread, possibly after the user has left this screen.
+            if page.route != "/mood-tracker":
+                return
+            if (event["type"] == "resync" or (event["type"] == "mood" and shown_timespan == "today")
+                    or (event["type"] == "rollup" and shown_timespan != "today")):
+                update_view(None, shown_timespan)
+
+        shown_timespan = "today"
+        live_updates.on_event = on_live_update
         update_view(None, "today")
 
         return ft.View(
@@ -267,46 +1045,182 @@ def main(page: ft.Page):
         )
 
     def create_journal_history_view():
-        entries_list = ft.ListView(expand=True, spacing=10, padding=20)
+        entries_list = ft.ListView(expand=True, spacing=10, padding=20, on_scroll_interval=100)
+        # Always the last row: shows the spinner, the "load older" button or an error.
+        footer = ft.Container()
+        user_id = app_state['user_id']
+        next_cursor = None
+        loading = False
+        # Empty while browsing the full history; otherwise the list shows search results for it.
+        query = ""
 
         def handle_delete(e):
-            entry_id = e.control.data
+            entry = e.control.data
             try:
-                response = requests.delete(f"{API_BASE_URL}/journal/{entry_id}")
-                if response.status_code == 200:
-                    entry_container_to_remove = e.control.parent.parent
+                api.delete_journal(entry['id'])
+                if not live_updates.live:
+                    # The day may still have other entries, so refetch that month instead of guessing.
+                    # A live update reports it otherwise.
+                    activity_cache.invalidate(app_state['user_id'], datetime.date.fromisoformat(entry['date']))
+                entry_container_to_remove = e.control.parent.parent
+                if entry_container_to_remove in entries_list.controls:
                     entries_list.controls.remove(entry_container_to_remove)
-                    page.update()
-            except requests.exceptions.RequestException: pass
+                page.update()
+            except (ApiError, requests.exceptions.RequestException): pass
 
-        try:
-            response = requests.get(f"{API_BASE_URL}/journals/{app_state['user_id']}")
-            if response.status_code == 200:
-                entries = response.json()
-                if not entries:
-                    entries_list.controls.append(ft.Text("You have no journal entries yet.", italic=True, color=TEXT_MUTED))
-                for entry in entries:
-                    entries_list.controls.append(
-                        ft.Container(
-                            content=ft.Row([
-                                ft.Column([
-                                    ft.Text(entry['date'], weight=ft.FontWeight.BOLD),
-                                    ft.Text(entry['content'], selectable=True),
-                                ], expand=True),
-                                ft.IconButton(
-                                    icon=ft.Icons.DELETE_OUTLINE, icon_color=ERROR_COLOR,
-                                    data=entry['id'], on_click=handle_delete, tooltip="Delete Entry"
-                                ),
-                            ]),
-                            padding=15, border=ft.border.all(1, BORDER_COLOR), border_radius=10
-                        )
-                    )
-        except requests.exceptions.RequestException:
-            entries_list.controls.append(ft.Text("Could not load entries. Connection error.", color=ERROR_COLOR))
+        def snippet_text(snippet: str) -> ft.Text:
+            spans = []
+            for part in SNIPPET_HIT.split(snippet):
+                if part.startswith(SNIPPET_OPEN):
+                    spans.append(ft.TextSpan(part[1:-1], ft.TextStyle(weight=ft.FontWeight.BOLD, bgcolor=ft.Colors.with_opacity(0.25, PRIMARY_COLOR))))
+                elif part:
+                    spans.append(ft.TextSpan(part))
+            return ft.Text(spans=spans, selectable=True)
+
+        def build_entry(entry: dict) -> ft.Control:
+            body = snippet_text(entry['snippet']) if 'snippet' in entry else ft.Text(entry['content'], selectable=True)
+            return ft.Container(
+                content=ft.Row([
+                    ft.Column([
+                        ft.Text(entry['date'], weight=ft.FontWeight.BOLD),
+                        body,
+                    ], expand=True),
+                    ft.IconButton(
+                        icon=ft.Icons.DELETE_OUTLINE, icon_color=ERROR_COLOR,
+                        data=entry, on_click=handle_delete, tooltip="Delete Entry"
+                    ),
+                ]),
+                padding=15, border=ft.border.all(1, BORDER_COLOR), border_radius=10, data=entry
+            )
+
+        def build_pending_entry(entry: dict) -> ft.Control:
+            # Not on the server yet, so there is nothing to delete there; it syncs in the background.
+            return ft.Container(
+                content=ft.Row([
+                    ft.Column([
+                        ft.Text(entry['timestamp'][:10], weight=ft.FontWeight.BOLD),
+                        ft.Text(entry['content'], selectable=True),
+                    ], expand=True),
+                    ft.Icon(ft.Icons.CLOUD_UPLOAD_OUTLINED, color=TEXT_MUTED, tooltip="Waiting to sync"),
+                ]),
+                padding=15, border=ft.border.all(1, BORDER_COLOR), border_radius=10, data=entry
+            )
+
+        def first_page_controls(entries: List[dict]) -> List[ft.Control]:
+            known = {entry.get('client_key') for entry in entries}
+            pending = [entry for entry in local_store.pending_journals(user_id) if entry['client_key'] not in known]
+            return [build_pending_entry(entry) for entry in pending] + [build_entry(entry) for entry in entries]
+
+        def load_more():
+            nonlocal loading
+            if loading: return
+            loading = True
+            cursor, text = next_cursor, query
+            footer.content = ft.Row([ft.ProgressRing(width=20, height=20), ft.Text("Loading entries...", color=TEXT_MUTED)])
+            # The first page is requested while the view is still being built and not on the page yet.
+            if footer.page:
+                footer.update()
+            if text:
+                fetch = lambda: api.search_journals(user_id, text, cursor)
+            else:
+                fetch = lambda: api.journals(user_id, cursor)
+            runner.submit("journal-history", fetch, lambda result: show_entries(result, cursor is None and not text),
+                          show_load_error)
+
+        def show_entries(result: dict, history_start: bool = False):
+            nonlocal loading, next_cursor
+            loading = False
+            next_cursor = result.get("next_cursor")
+            entries = result.get("entries", [])
+            if history_start:
+                # The server's first page replaces whatever was drawn from the device, and is saved for next time.
+                local_store.save_snapshot(user_id, "journals:first-page", entries)
+                entries_list.controls[:] = first_page_controls(entries) + [footer]
+            else:
+                # Only the new page is built; rows already on screen are left alone.
+                entries_list.controls[-1:-1] = [build_entry(entry) for entry in entries]
+            if len(entries_list.controls) == 1:
+                empty_message = "No entries match your search." if query else "You have no journal entries yet."
+                entries_list.controls.insert(-1, ft.Text(empty_message, italic=True, color=TEXT_MUTED))
+            more_label = "Show more results" if query else "Load older entries"
+            footer.content = ft.TextButton(more_label, on_click=lambda _: load_more()) if next_cursor else None
+            page.update()
+
+        def show_load_error(err: Exception):
+            nonlocal loading
+            loading = False
+            message = "Could not load entries." if isinstance(err, ApiError) else "Could not load entries. Connection error."
+            footer.content = ft.Row([ft.Text(message, color=ERROR_COLOR), ft.TextButton("Retry", on_click=lambda _: load_more())])
+            page.update()
+
+        def handle_scroll(e: ft.OnScrollEvent):
+            # Fetch the next page shortly before the user reaches the bottom.
+            if next_cursor and not loading and e.pixels >= e.max_scroll_extent - 300:
+                load_more()
+
+        def run_search(text: str):
+            nonlocal query, next_cursor, loading
+            if text.strip() == query:
+                return
+            query = text.strip()
+            # Start over from the first page; a request still in flight for the old query is superseded.
+            next_cursor = None
+            loading = False
+            entries_list.controls[:] = [footer]
+            load_more()
+            page.update()
+
+        def handle_search_change(e):
+            # Clearing the box goes straight back to the full history.
+            if not e.control.value:
+                run_search("")
+
+        def on_live_update(event: dict):
+            # Runs on the live-update thread, possibly after the user has left this screen.
+            nonlocal next_cursor, loading
+            if page.route != "/journal-history":
+                return
+            rows = entries_list.controls
+            if event["type"] == "journal-deleted":
+                rows[:] = [row for row in rows if not (isinstance(row.data, dict) and row.data.get("id") == event["id"])]
+            elif event["type"] == "journal" and not query:
+                entries = [row.data for row in rows if isinstance(row.data, dict) and "id" in row.data]
+                if any(entry["id"] == event["id"] for entry in entries):
+                    return
+                # Newest first, like the pages; an entry older than everything shown belongs to a page not loaded yet.
+                key = (event["date"], event["id"])
+                older = next((entry for entry in entries if (entry["date"], entry["id"]) < key), None)
+                if older is None and next_cursor:
+                    return
+                # The server copy replaces this device's pending row, and the "no entries yet" message goes.
+                rows[:] = [row for row in rows if not isinstance(row, ft.Text) and not
+                           (isinstance(row.data, dict) and event["client_key"] and row.data.get("client_key") == event["client_key"])]
+                position = next((i for i, row in enumerate(rows) if older is not None and row.data is older), len(rows) - 1)
+                rows.insert(position, build_entry(event))
+            elif event["type"] == "resync" and not query:
+                next_cursor = None
+                loading = False
+                load_more()
+                return
+            else:
+                return
+            page.update()
+
+        live_updates.on_event = on_live_update
+
+        search_field = ft.TextField(
+            hint_text="Search your entries", prefix_icon=ft.Icons.SEARCH, color=BLACK,
+            on_submit=lambda e: run_search(e.control.value), on_change=handle_search_change,
+        )
+
+        entries_list.on_scroll = handle_scroll
+        # Draw the last known first page and any unsynced entries right away, then ask the server.
+        entries_list.controls[:] = first_page_controls(local_store.load_snapshot(user_id, "journals:first-page") or []) + [footer]
+        load_more()
 
         return ft.View(
             "/journal-history",
-            [entries_list],
+            [ft.Container(search_field, padding=ft.padding.only(left=20, right=20, top=10)), entries_list],
             appbar=ft.AppBar(
                 title=ft.Text("Your Past Entries"),
                 leading=ft.IconButton(icon=ft.Icons.ARROW_BACK, on_click=lambda _: page.go("/main"))
@@ -339,11 +1253,28 @@ def main(page: ft.Page):
                 page.update()
                 threading.Timer(3.0, hide_confirmation).start()
 
-        def update_calendar(date_to_display: datetime.date):
+        def update_calendar(date_to_display: datetime.date, revalidate: bool = False):
             nonlocal current_date
             current_date = date_to_display
-            
+            user_id = app_state['user_id']
+            # Draw the month right away from the device; only months not fetched this session (or a revalidation) go to the server.
+            render_calendar()
+            if activity_cache.is_fresh(user_id, current_date) and not revalidate:
+                return
+            start = add_months(current_date, -CALENDAR_PREFETCH_MONTHS)
+            end = add_months(current_date, CALENDAR_PREFETCH_MONTHS)
+
+            def on_activity_dates(dates: Set[str]):
+                activity_cache.store(user_id, start, end, dates)
+                render_calendar()
+
+            runner.submit("calendar", lambda: api.activity_dates(user_id, start, end), on_activity_dates)
+
+        def render_calendar():
             if not calendar_header or not calendar_grid: return
+            user_id = app_state['user_id']
+            # Server dates plus entries made on this device, including ones still waiting to sync.
+            entry_dates = (activity_cache.get(user_id, current_date) or set()) | local_store.entry_dates(user_id, current_date.replace(day=1))
 
             calendar_header.value = current_date.strftime("%B %Y")
             calendar_grid.controls.clear()
@@ -361,13 +1292,6 @@ def main(page: ft.Page):
                     ft.Container(content=ft.Text(str(day_num)), alignment=ft.alignment.center, opacity=0.35)
                 )
 
-            entry_dates = set()
-            try:
-                response = requests.get(f"{API_BASE_URL}/activity-dates/{app_state['user_id']}")
-                if response.status_code == 200:
-                    entry_dates = set(response.json().get("dates", []))
-            except requests.exceptions.RequestException: pass
-
             today_str = datetime.date.today().isoformat()
             for day_num in range(1, days_in_month + 1):
                 day_date = datetime.date(current_date.year, current_date.month, day_num)
@@ -419,18 +1343,20 @@ def main(page: ft.Page):
             label = e.control.data
             score = score_map.get(label, 5)
             try:
-                requests.post(f"{API_BASE_URL}/mood-entry", json={"user_id": app_state["user_id"], "mood_score": score, "notes": f"Selected mood: {label}"})
-                show_confirmation(mood_confirmation_text, f"Mood '{label}' saved!", SUCCESS_COLOR)
-                for item_container in e.control.parent.controls:
-                    is_selected = (item_container == e.control)
-                    item_container.bgcolor = PRIMARY_COLOR if is_selected else WHITE
-                    item_container.border = ft.border.all(2, PRIMARY_COLOR if is_selected else BORDER_COLOR)
-                    item_container.content.controls[0].color = WHITE if is_selected else TEXT_COLOR
-                    item_container.content.controls[1].color = WHITE if is_selected else TEXT_MUTED
-                update_calendar(current_date)
-                page.update()
-            except requests.exceptions.RequestException: 
-                show_confirmation(mood_confirmation_text, "Connection error.", ERROR_COLOR)
+                # Saved on the device first; the outbox sends it whenever the server is reachable.
+                local_store.record(app_state["user_id"], "mood", mood_score=score, notes=f"Selected mood: {label}")
+            except sqlite3.Error:
+                show_confirmation(mood_confirmation_text, "Could not save the mood on this device.", ERROR_COLOR)
+                return
+            outbox.flush_soon()
+            show_confirmation(mood_confirmation_text, f"Mood '{label}' saved!", SUCCESS_COLOR)
+            for item_container in e.control.parent.controls:
+                is_selected = (item_container == e.control)
+                item_container.bgcolor = PRIMARY_COLOR if is_selected else WHITE
+                item_container.border = ft.border.all(2, PRIMARY_COLOR if is_selected else BORDER_COLOR)
+                item_container.content.controls[0].color = WHITE if is_selected else TEXT_COLOR
+                item_container.content.controls[1].color = WHITE if is_selected else TEXT_MUTED
+            render_calendar()
 
         def save_entry(e):
             if not app_state["user_id"]: return
@@ -439,36 +1365,41 @@ def main(page: ft.Page):
                 show_confirmation(journal_confirmation_text, "Journal entry is empty.", ERROR_COLOR)
                 return
             try:
-                requests.post(f"{API_BASE_URL}/journal-entry", json={"user_id": app_state["user_id"], "content": content})
-                journal_entry_ref.current.value = ""
-                show_confirmation(journal_confirmation_text, "Journal entry saved!", SUCCESS_COLOR)
-                update_calendar(current_date)
-                page.update()
-            except requests.exceptions.RequestException: 
-                show_confirmation(journal_confirmation_text, "Connection error.", ERROR_COLOR)
+                local_store.record(app_state["user_id"], "journal", content=content)
+            except sqlite3.Error:
+                show_confirmation(journal_confirmation_text, "Could not save the entry on this device.", ERROR_COLOR)
+                return
+            outbox.flush_soon()
+            journal_entry_ref.current.value = ""
+            show_confirmation(journal_confirmation_text, "Journal entry saved!", SUCCESS_COLOR)
+            render_calendar()
 
         def get_ai_recommendation(e):
-            try:
-                response = requests.get(f"{API_BASE_URL}/recommendation/{app_state['user_id']}")
-                if response.status_code == 200:
-                    suggestion = response.json().get("recommendation", "Could not get a recommendation.")
-                    recommendation_text.current.value = suggestion
-                    recommendation_text.current.visible = True
-                    page.update()
-                else:
+            def on_recommendation(suggestion: str):
+                recommendation_text.current.value = suggestion
+                page.update()
+
+            def on_error(err: Exception):
+                recommendation_text.current.visible = False
+                page.update()
+                if isinstance(err, ApiError):
                     show_confirmation(mood_confirmation_text, "Could not fetch insights.", ERROR_COLOR)
-            except requests.exceptions.RequestException:
-                show_confirmation(mood_confirmation_text, "Connection error.", ERROR_COLOR)
+                else:
+                    show_confirmation(mood_confirmation_text, "Connection error.", ERROR_COLOR)
+
+            recommendation_text.current.value = "Thinking..."
+            recommendation_text.current.visible = True
+            page.update()
+            user_id = app_state['user_id']
+            runner.submit("recommendation", lambda: api.recommendation(user_id), on_recommendation, on_error)
         
         def fetch_wellness_tip():
-            try:
-                response = requests.get(f"{API_BASE_URL}/wellness-tip")
-                if response.status_code == 200:
-                    data = response.json()
-                    wellness_quote_text.value = f"\"{data.get('quote')}\""
-                    wellness_author_text.value = f"- {data.get('author')}"
-                    page.update()
-            except requests.exceptions.RequestException: pass
+            def on_tip(data: dict):
+                wellness_quote_text.value = f"\"{data.get('quote')}\""
+                wellness_author_text.value = f"- {data.get('author')}"
+                page.update()
+
+            runner.submit("wellness-tip", api.wellness_tip, on_tip)
 
         mood_items = []
         moods = [("😄", "Happy"), ("😊", "Content"), ("😐", "Neutral"), ("😟", "Sad"), ("😠", "Angry")]
@@ -536,7 +1467,34 @@ def main(page: ft.Page):
             shadow=ft.BoxShadow(blur_radius=10, color=ft.Colors.with_opacity(0.1, SHADOW_COLOR))
         )
         
-        update_calendar(current_date)
+        sync_icon = ft.Icon(ft.Icons.CLOUD_UPLOAD_OUTLINED, color=WHITE)
+
+        def show_sync_state(pending: int):
+            sync_icon.visible = pending > 0
+            sync_icon.tooltip = f"{pending} entries waiting to sync"
+
+        def on_sync(pending: int):
+            # Runs on the sync thread, possibly after the user has left this screen.
+            if page.route == "/main":
+                show_sync_state(pending)
+                page.update()
+
+        def on_live_update(event: dict):
+            # Runs on the live-update thread; the activity cache has already been patched.
+            if page.route != "/main":
+                return
+            if event["type"] == "resync":
+                update_calendar(current_date)
+            elif event["type"] in ("activity", "journal-deleted") and event["date"][:7] == current_date.strftime("%Y-%m"):
+                render_calendar()
+
+        show_sync_state(local_store.pending_count())
+        outbox.on_change = on_sync
+        live_updates.on_event = on_live_update
+
+        # Live updates keep the calendar current; without them, a cheap If-None-Match check on entering
+        # the view picks up entries made elsewhere.
+        update_calendar(current_date, revalidate=not live_updates.live)
         fetch_wellness_tip()
 
         return ft.View(
@@ -550,12 +1508,15 @@ def main(page: ft.Page):
             ],
             appbar=ft.AppBar(
                 title=ft.Text(f"VibeCheck - {app_state.get('user_name', '')}"),
-                actions=[ft.IconButton(icon=ft.Icons.LOGOUT, tooltip="Logout", on_click=lambda _: page.go("/"))],
+                actions=[sync_icon, ft.IconButton(icon=ft.Icons.LOGOUT, tooltip="Logout", on_click=lambda _: page.go("/"))],
             ),
         )
 
     # --- Route Management ---
     def route_change(e):
+        # Results still in flight for the previous screen must not land on the new one.
+        runner.new_route()
+        live_updates.on_event = None
         page.views.clear()
         if page.route == "/main":
             page.views.append(create_main_view())
@@ -568,6 +1529,10 @@ def main(page: ft.Page):
         else:
             app_state["user_id"] = None
             app_state["user_name"] = None
+            activity_cache.clear()
+            live_updates.stop()
+            if api.token:
+                threading.Thread(target=api.logout, daemon=True).start()
             page.views.append(create_login_view())
         page.update()
 
@@ -0,0 +1,302 @@
+# analytics.py
+
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+import itertools
+import threading
+import time
+import numpy as np
+
+# Like renderer.py, this module stays free of FastAPI and database imports: back.py hands the engine
+# a loader that yields daily rollup rows, and everything here is plain NumPy over those rows.
+
+# --- Analytics Windows ---
+ROLLING_WINDOW_DAYS = 7
+VOLATILITY_WINDOW_DAYS = 30
+TREND_WINDOW_DAYS = 14
+
+EPOCH_DATE = date(1970, 1, 1)
+# Composite (user, day) keys: day numbers stay far below this, so user segments never overlap.
+USER_KEY_STRIDE = 1 << 32
+
+# --- MOOD FRAME ---
+_frame_serials = itertools.count(1)
+
+class MoodFrame:
+    """Daily mood aggregates of many users as parallel arrays sorted by (user_id, day).
+
+    Every derived column is computed for all users at once: per-user figures come from sorted-segment
+    reductions over the user boundaries, and calendar-day windows from one searchsorted over composite
+    (user, day) keys, so no Python loop ever runs per user or per row.
+    """
+
+    def __init__(self, user_ids: np.ndarray, days: np.ndarray, counts: np.ndarray, sums: np.ndarray):
+        # Identifies this frame to caches without keeping it alive.
+        self.serial = next(_frame_serials)
+        self.user_ids = user_ids
+        self.days = days
+        self.counts = counts
+        self.sums = sums
+        self.means = sums / np.maximum(counts, 1)
+
+        n = len(days)
+        new_user = np.ones(n, dtype=bool)
+        new_user[1:] = user_ids[1:] != user_ids[:-1]
+        self.starts = np.flatnonzero(new_user)
+        self.ends = np.append(self.starts[1:], n)
+        self.users = user_ids[self.starts]
+        segment = np.cumsum(new_user) - 1
+        self.keys = keys = segment * USER_KEY_STRIDE + days
+
+        # Rolling windows cover calendar days, not rows: each row's window starts at the first row of the
+        # same user no more than `window - 1` days earlier.
+        rolling_start = np.searchsorted(keys, keys - (ROLLING_WINDOW_DAYS - 1), side="left")
+        self.rolling_mean = _window_sum(sums, rolling_start) / _window_sum(counts, rolling_start)
+
+        # Volatility is the standard deviation of daily means over the window; a single day has none.
+        volatility_start = np.searchsorted(keys, keys - (VOLATILITY_WINDOW_DAYS - 1), side="left")
+        window_days = np.arange(1, n + 1) - volatility_start
+        mean = _window_sum(self.means, volatility_start) / window_days
+        mean_sq = _window_sum(self.means ** 2, volatility_start) / window_days
+        self.volatility = np.where(window_days > 1, np.sqrt(np.maximum(mean_sq - mean ** 2, 0)), np.nan)
+
+        # Streaks: a run breaks wherever a user changes or a day is skipped. `run` is each row's
+        # 1-based position in its run of consecutive logged days.
+        breaks = new_user.copy()
+        breaks[1:] |= np.diff(days) != 1
+        run_id = np.cumsum(breaks) - 1
+        run_starts = np.flatnonzero(breaks)
+        self.run = np.arange(n) - run_starts[run_id] + 1
+
+        # Running totals behind features(): any window's sums are two lookups. Trend x values are days since the
+        # user's first logged day, which keeps the products small enough for float64 cumulative sums.
+        offsets = (days - days[self.starts][segment]) if n else days
+        self._cumulative = {
+            name: np.concatenate(([0], np.cumsum(values)))
+            for name, values in (("count", counts), ("sum", sums), ("mean", self.means),
+                                 ("mean_sq", self.means ** 2), ("x", offsets), ("x_sq", offsets ** 2),
+                                 ("xy", offsets * self.means))
+        }
+
+        if n:
+            self.entries = np.add.reduceat(counts, self.starts)
+            self.totals = np.add.reduceat(sums, self.starts)
+            self.longest_streak = np.maximum.reduceat(self.run, self.starts)
+        else:
+            self.entries = self.totals = self.longest_streak = np.zeros(0, dtype=np.int64)
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[List[tuple]]) -> "MoodFrame":
+        """Builds a frame from chunks of (user_id, day, count, sum) rows already sorted by (user_id, day)."""
+        parts = [np.asarray(chunk, dtype=np.int64).reshape(-1, 4) for chunk in chunks if chunk]
+        data = np.concatenate(parts) if parts else np.zeros((0, 4), dtype=np.int64)
+        return cls(data[:, 0], data[:, 1], data[:, 2], data[:, 3])
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    def segment(self, user_id: int) -> Optional[int]:
+        i = int(np.searchsorted(self.users, user_id))
+        if i < len(self.users) and self.users[i] == user_id:
+            return i
+        return None
+
+    def daily(self, user_id: int, start_day: int) -> List[dict]:
+        """The user's (day, count, sum) rows from `start_day` on, in the shape of daily_mood_rollup rows."""
+        i = self.segment(user_id)
+        if i is None:
+            return []
+        lo, hi = self.starts[i], self.ends[i]
+        lo += int(np.searchsorted(self.days[lo:hi], start_day, side="left"))
+        return [{"day": int(day), "count": int(count), "sum": int(total)}
+                for day, count, total in zip(self.days[lo:hi], self.counts[lo:hi], self.sums[lo:hi])]
+
+    def features(self, today: int, segments: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+        """Windowed features as of `today` for the given user segments (all users by default), as arrays.
+
+        mean_7d is weighted by entries, variance_7d is over daily means, and trend_slope is the least-squares
+        slope of daily means over the trend window in mood points per day. Undefined values are NaN.
+        """
+        if segments is None:
+            segments = np.arange(len(self.users))
+        base = segments * USER_KEY_STRIDE
+        last = self.ends[segments] - 1
+        # Rows after `today` (a clock running behind the data) are left out of every window.
+        stop = np.searchsorted(self.keys, base + today, side="right")
+
+        def window(days: int) -> Dict[str, np.ndarray]:
+            start = np.searchsorted(self.keys, base + today - (days - 1), side="left")
+            sums = {name: c[stop] - c[start] for name, c in self._cumulative.items()}
+            sums["days"] = stop - start
+            return sums
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            recent = window(ROLLING_WINDOW_DAYS)
+            n = recent["days"]
+            mean_7d = np.where(recent["count"] > 0, recent["sum"] / recent["count"], np.nan)
+            variance_7d = np.where(n > 1, np.maximum(recent["mean_sq"] / n - (recent["mean"] / n) ** 2, 0), np.nan)
+
+            trend = window(TREND_WINDOW_DAYS)
+            n = trend["days"]
+            denominator = n * trend["x_sq"] - trend["x"] ** 2
+            slope = (n * trend["xy"] - trend["x"] * trend["mean"]) / denominator
+            trend_slope = np.where((n >= 3) & (denominator > 0), slope, np.nan)
+
+        last_day = self.days[last]
+        return {
+            "user_id": self.users[segments],
+            "entries_7d": recent["count"],
+            "logged_days_7d": recent["days"],
+            "mean_7d": mean_7d,
+            "variance_7d": variance_7d,
+            "trend_slope": trend_slope,
+            "days_since_last": today - last_day,
+            "current_streak": np.where(last_day >= today - 1, self.run[last], 0),
+        }
+
+    def summary(self, user_id: int, today: int) -> Optional[dict]:
+        """Headline figures for one user; rolling values are as of the user's most recent logged day."""
+        i = self.segment(user_id)
+        if i is None:
+            return None
+        last = self.ends[i] - 1
+        last_day = int(self.days[last])
+        volatility = self.volatility[last]
+        return {
+            "days_logged": int(self.ends[i] - self.starts[i]),
+            "entries": int(self.entries[i]),
+            "mean": round(float(self.totals[i] / self.entries[i]), 2),
+            "as_of": (EPOCH_DATE + timedelta(days=last_day)).isoformat(),
+            f"rolling_mean_{ROLLING_WINDOW_DAYS}d": round(float(self.rolling_mean[last]), 2),
+            f"volatility_{VOLATILITY_WINDOW_DAYS}d": None if np.isnan(volatility) else round(float(volatility), 2),
+            # A streak is still current if its last day is today or yesterday (today may not be logged yet).
+            "current_streak": int(self.run[last]) if last_day >= today - 1 else 0,
+            "longest_streak": int(self.longest_streak[i]),
+        }
+
+    def cohort(self, today: int) -> dict:
+        """Figures across all users, e.g. how many are active and how their average moods are spread."""
+        if not len(self.users):
+            return {"users": 0}
+        last = self.ends - 1
+        active = self.days[last] >= today - (ROLLING_WINDOW_DAYS - 1)
+        current = np.where(self.days[last] >= today - 1, self.run[last], 0)
+        user_means = self.totals / self.entries
+        return {
+            "users": int(len(self.users)),
+            f"active_{ROLLING_WINDOW_DAYS}d": int(np.count_nonzero(active)),
+            "mean_of_means": round(float(user_means.mean()), 2),
+            "mean_quartiles": [round(float(q), 2) for q in np.percentile(user_means, [25, 50, 75])],
+            "with_current_streak": int(np.count_nonzero(current >= 2)),
+            "longest_streak": int(self.longest_streak.max()),
+        }
+
+def _window_sum(values: np.ndarray, window_start: np.ndarray) -> np.ndarray:
+    """Sum of values[window_start[i]:i + 1] for every row i, from one cumulative sum."""
+    cumulative = np.concatenate(([0], np.cumsum(values)))
+    return cumulative[1:] - cumulative[window_start]
+
+# --- ANALYTICS ENGINE ---
+class AnalyticsEngine:
+    """Keeps one MoodFrame of every user and answers per-user lookups from it.
+
+    A write marks its user stale; the next lookup for that user re-reads only their rows into a small
+    frame of their own, which is used until the next full reload replaces both. Full reloads run in a
+    background thread every `refresh_interval` seconds.
+    """
+
+    def __init__(self, load: Callable[[Optional[int]], Iterable[List[tuple]]], refresh_interval: float):
+        self._load = load
+        self.refresh_interval = refresh_interval
+        self._lock = threading.Lock()
+        self._frame: Optional[MoodFrame] = None
+        self._version = 0
+        # user_id -> version at which the user was last invalidated, and per-user frames built since then.
+        self._stale: Dict[int, int] = {}
+        self._user_frames: Dict[int, MoodFrame] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.refreshes = 0
+        self.refresh_ms = 0.0
+        self.user_reloads = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="vibecheck-analytics", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            thread.join()
+
+    def _run(self):
+        while True:
+            self.refresh()
+            if self._stop.wait(self.refresh_interval):
+                return
+
+    def refresh(self):
+        with self._lock:
+            started_at = self._version
+        started = time.perf_counter()
+        frame = MoodFrame.from_chunks(self._load(None))
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self._frame = frame
+            # Users invalidated while the reload ran may have been read before their write; keep them stale.
+            self._stale = {user_id: v for user_id, v in self._stale.items() if v > started_at}
+            self._user_frames = {user_id: f for user_id, f in self._user_frames.items() if user_id in self._stale}
+            self.refreshes += 1
+            self.refresh_ms = elapsed_ms
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._version += 1
+            self._stale[user_id] = self._version
+            self._user_frames.pop(user_id, None)
+
+    def frame_for(self, user_id: int) -> MoodFrame:
+        """The frame holding the user's current rows; only a stale user costs a database read."""
+        with self._lock:
+            frame = self._user_frames.get(user_id)
+            if frame is not None:
+                return frame
+            if self._frame is not None and user_id not in self._stale:
+                return self._frame
+            version = self._stale.get(user_id)
+        frame = MoodFrame.from_chunks(self._load(user_id))
+        with self._lock:
+            self.user_reloads += 1
+            # Only cache it if no newer write for this user landed while it was being read.
+            if version is not None and self._stale.get(user_id) == version:
+                self._user_frames[user_id] = frame
+        return frame
+
+    def daily(self, user_id: int, start_day: int) -> List[dict]:
+        return self.frame_for(user_id).daily(user_id, start_day)
+
+    def summary(self, user_id: int, today: int) -> Optional[dict]:
+        return self.frame_for(user_id).summary(user_id, today)
+
+    def cohort(self, today: int) -> dict:
+        with self._lock:
+            frame = self._frame
+        return frame.cohort(today) if frame is not None else {"users": 0}
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "rows": len(self._frame) if self._frame is not None else 0,
+                "users": len(self._frame.users) if self._frame is not None else 0,
+                "refreshes": self.refreshes,
+                "refresh_ms": round(self.refresh_ms, 2),
+                "refresh_interval": self.refresh_interval,
+                "stale_users": len(self._stale),
+                "user_reloads": self.user_reloads,
+            }
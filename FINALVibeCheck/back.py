@@ -1,64 +1,608 @@
 # back.py
 
-from fastapi import FastAPI, HTTPException, status
-from fastapi.responses import FileResponse
+from fastapi import Depends, FastAPI, Header, HTTPException, Query, Request, Response, status
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import date, timedelta, datetime
-from typing import List, Optional
-import matplotlib
-matplotlib.use("Agg")
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import pandas as pd
+from typing import Annotated, List, Literal, Optional, Union
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager, nullcontext, suppress
+import asyncio
+import functools
 import sqlite3
 import os
-import random
+import queue
+import threading
+import time
 import hashlib
-import numpy as np
-import requests
+import logging
+import hmac
+import inspect
+import base64
+import math
+import secrets
+import signal
+import json
+import calendar
+import re
+import csv
+import io
+import tempfile
+import httpx
+from renderer import ChartRenderer, RendererBusy
+from analytics import AnalyticsEngine, MoodFrame
+from insights import InsightEngine
+
+logger = logging.getLogger("vibecheck")
+
+# --- Database Configuration ---
+DB_PATH = os.environ.get("VIBECHECK_DB_PATH", "wellness.db")
+DB_POOL_SIZE = int(os.environ.get("VIBECHECK_DB_POOL_SIZE", "8"))
+DB_POOL_TIMEOUT = float(os.environ.get("VIBECHECK_DB_POOL_TIMEOUT", "10"))
+DB_QUEUE_SIZE = int(os.environ.get("VIBECHECK_DB_QUEUE_SIZE", "256"))
+DB_JOURNAL_MODE = os.environ.get("VIBECHECK_DB_JOURNAL_MODE", "WAL")
+DB_PRAGMAS = {
+    "synchronous": os.environ.get("VIBECHECK_DB_SYNCHRONOUS", "NORMAL"),
+    "cache_size": int(os.environ.get("VIBECHECK_DB_CACHE_SIZE", "-16000")),
+    "mmap_size": int(os.environ.get("VIBECHECK_DB_MMAP_SIZE", str(128 * 1024 * 1024))),
+    "temp_store": os.environ.get("VIBECHECK_DB_TEMP_STORE", "MEMORY"),
+}
+# Group commit: mood inserts are queued to one writer thread that commits them in shared transactions.
+DB_GROUP_COMMIT = os.environ.get("VIBECHECK_DB_GROUP_COMMIT", "0") == "1"
+DB_GROUP_COMMIT_WINDOW_MS = float(os.environ.get("VIBECHECK_DB_GROUP_COMMIT_WINDOW_MS", "2"))
+DB_GROUP_COMMIT_MAX_ROWS = int(os.environ.get("VIBECHECK_DB_GROUP_COMMIT_MAX_ROWS", "64"))
 
 # --- FastAPI App Initialization ---
-app = FastAPI(title="VibeCheck", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    event_broker.open()
+    restore_signals = close_streams_on_exit()
+    chart_renderer.start()
+    analytics.start()
+    await tip_service.start()
+    yield
+    event_broker.close()
+    restore_signals()
+    await tip_service.stop()
+    if response_cache is not None:
+        await response_cache.close()
+    analytics.stop()
+    password_hasher.shutdown()
+    chart_renderer.shutdown()
+    async_db.shutdown()
+    DatabaseManager.close()
+
+app = FastAPI(title="VibeCheck", version="1.0.0", lifespan=lifespan)
 
 # --- Static Directory Setup ---
 os.makedirs("static", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
-# --- Color Constant for Charts ---
-PRIMARY_COLOR = "#0d6efd"
+# --- Chart Cache Configuration ---
+CHART_CACHE_DIR = os.environ.get("VIBECHECK_CHART_CACHE_DIR", "chart_cache")
+CHART_MEMORY_CACHE_SIZE = int(os.environ.get("VIBECHECK_CHART_MEMORY_CACHE_SIZE", "64"))
+CHART_DISK_CACHE_SIZE = int(os.environ.get("VIBECHECK_CHART_DISK_CACHE_SIZE", "1024"))
+# Bump whenever render_mood_chart changes its output so old cached PNGs are not reused.
+CHART_STYLE_VERSION = 2
+
+# --- Chart Renderer Configuration ---
+CHART_RENDER_WORKERS = int(os.environ.get("VIBECHECK_CHART_RENDER_WORKERS", "2"))
+CHART_RENDER_QUEUE_SIZE = int(os.environ.get("VIBECHECK_CHART_RENDER_QUEUE_SIZE", "16"))
+CHART_RENDER_TIMEOUT = float(os.environ.get("VIBECHECK_CHART_RENDER_TIMEOUT", "30"))
+CHART_RENDER_RETRY_AFTER = int(os.environ.get("VIBECHECK_CHART_RENDER_RETRY_AFTER", "2"))
+
+# --- Journal Pagination Configuration ---
+JOURNAL_PAGE_SIZE = int(os.environ.get("VIBECHECK_JOURNAL_PAGE_SIZE", "20"))
+JOURNAL_PAGE_MAX = int(os.environ.get("VIBECHECK_JOURNAL_PAGE_MAX", "100"))
+# Search snippets wrap each hit in these control characters; unlike markup, they cannot be typed into an entry.
+SNIPPET_OPEN = "\x02"
+SNIPPET_CLOSE = "\x03"
+
+# --- Batch Ingestion Configuration ---
+BATCH_MAX_ENTRIES = int(os.environ.get("VIBECHECK_BATCH_MAX_ENTRIES", "500"))
+
+# --- Import/Export Configuration ---
+TRANSFER_CHUNK_SIZE = int(os.environ.get("VIBECHECK_TRANSFER_CHUNK_SIZE", "5000"))
+IMPORT_MAX_BYTES = int(os.environ.get("VIBECHECK_IMPORT_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Uploads larger than this are spooled to a temporary file instead of held in memory.
+IMPORT_SPOOL_SIZE = 8 * 1024 * 1024
+
+# --- Analytics Configuration ---
+# Seconds between full reloads of the analytics engine; users who log moods in between are reloaded on their own.
+ANALYTICS_REFRESH_INTERVAL = float(os.environ.get("VIBECHECK_ANALYTICS_REFRESH_INTERVAL", "600"))
+ANALYTICS_LOAD_CHUNK = 50000
+INSIGHT_CACHE_SIZE = int(os.environ.get("VIBECHECK_INSIGHT_CACHE_SIZE", "4096"))
+
+# --- Password Hashing Configuration ---
+# scrypt cost: N=2**14, r=8 takes about 16 MiB and tens of milliseconds per hash. Raising it only affects
+# new hashes; existing ones are upgraded on the user's next successful login.
+PASSWORD_SCRYPT_N = int(os.environ.get("VIBECHECK_PASSWORD_SCRYPT_N", "16384"))
+PASSWORD_SCRYPT_R = 8
+PASSWORD_SCRYPT_P = 1
+PASSWORD_HASH_WORKERS = int(os.environ.get("VIBECHECK_PASSWORD_HASH_WORKERS", "2"))
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get("VIBECHECK_PASSWORD_HASH_QUEUE_SIZE", "32"))
+
+# --- Login Rate Limit Configuration ---
+# Token buckets: each key may make BURST attempts at once, refilled at PER_MINUTE attempts per minute.
+LOGIN_USER_BURST = int(os.environ.get("VIBECHECK_LOGIN_USER_BURST", "5"))
+LOGIN_USER_PER_MINUTE = float(os.environ.get("VIBECHECK_LOGIN_USER_PER_MINUTE", "5"))
+LOGIN_IP_BURST = int(os.environ.get("VIBECHECK_LOGIN_IP_BURST", "20"))
+LOGIN_IP_PER_MINUTE = float(os.environ.get("VIBECHECK_LOGIN_IP_PER_MINUTE", "30"))
+LOGIN_LIMITER_MAX_KEYS = 100000
+
+# --- Session Configuration ---
+# Tokens are signed with VIBECHECK_SESSION_SECRET if set, else with a random key kept in this file.
+SESSION_SECRET = os.environ.get("VIBECHECK_SESSION_SECRET")
+SESSION_SECRET_PATH = os.environ.get("VIBECHECK_SESSION_SECRET_PATH", "session.key")
+SESSION_TTL_DAYS = float(os.environ.get("VIBECHECK_SESSION_TTL_DAYS", "30"))
+SESSION_CACHE_SIZE = int(os.environ.get("VIBECHECK_SESSION_CACHE_SIZE", "10000"))
+# How long a verified session is trusted from memory; bounds how late a logout elsewhere is noticed.
+SESSION_CACHE_TTL = float(os.environ.get("VIBECHECK_SESSION_CACHE_TTL", "60"))
+# Chart image URLs are signed for between one and two of these windows, in seconds.
+CHART_URL_TTL = int(os.environ.get("VIBECHECK_CHART_URL_TTL", "300"))
+# Bearer token for the /api/*-stats diagnostics routes; while unset they are disabled.
+ADMIN_TOKEN = os.environ.get("VIBECHECK_ADMIN_TOKEN")
+
+# --- Response Cache Configuration ---
+# "memory" (per process), "off", or a redis:// URL to share cached responses between server processes.
+RESPONSE_CACHE = os.environ.get("VIBECHECK_RESPONSE_CACHE", "memory")
+RESPONSE_CACHE_SIZE = int(os.environ.get("VIBECHECK_RESPONSE_CACHE_SIZE", "4096"))
+RESPONSE_CACHE_TTL = int(os.environ.get("VIBECHECK_RESPONSE_CACHE_TTL", "3600"))
+
+# --- Live Events Configuration ---
+# Events one open stream may fall behind by before it is told to resync instead.
+EVENTS_QUEUE_SIZE = int(os.environ.get("VIBECHECK_EVENTS_QUEUE_SIZE", "64"))
+# Recent events kept per user, and users they are kept for, so a reconnecting client only gets what it missed.
+EVENTS_REPLAY_SIZE = int(os.environ.get("VIBECHECK_EVENTS_REPLAY_SIZE", "32"))
+EVENTS_REPLAY_USERS = int(os.environ.get("VIBECHECK_EVENTS_REPLAY_USERS", "4096"))
+EVENTS_KEEPALIVE = float(os.environ.get("VIBECHECK_EVENTS_KEEPALIVE", "15"))
+EVENTS_STREAM_MAX_AGE = float(os.environ.get("VIBECHECK_EVENTS_STREAM_MAX_AGE", "300"))
+EVENTS_MAX_STREAMS_PER_USER = int(os.environ.get("VIBECHECK_EVENTS_MAX_STREAMS_PER_USER", "4"))
+
+# --- Wellness Tip Configuration ---
+QUOTE_URL = os.environ.get("VIBECHECK_QUOTE_URL", "https://zenquotes.io/api/today")
+QUOTE_TIMEOUT = float(os.environ.get("VIBECHECK_QUOTE_TIMEOUT", "3"))
+QUOTE_FAILURE_THRESHOLD = int(os.environ.get("VIBECHECK_QUOTE_FAILURE_THRESHOLD", "3"))
+QUOTE_BREAKER_COOLDOWN = float(os.environ.get("VIBECHECK_QUOTE_BREAKER_COOLDOWN", "300"))
+QUOTE_RETRY_INTERVAL = float(os.environ.get("VIBECHECK_QUOTE_RETRY_INTERVAL", "60"))
+
+# Bundled tips, served whenever the quote of the day has not been fetched from upstream.
+LOCAL_QUOTES = [
+    ("Almost everything will work again if you unplug it for a few minutes, including you.", "Anne Lamott"),
+    ("You don't have to control your thoughts. You just have to stop letting them control you.", "Dan Millman"),
+    ("Happiness is not something ready made. It comes from your own actions.", "Dalai Lama"),
+    ("It does not matter how slowly you go as long as you do not stop.", "Confucius"),
+    ("Keep your face always toward the sunshine, and shadows will fall behind you.", "Walt Whitman"),
+    ("The best way out is always through.", "Robert Frost"),
+    ("Act as if what you do makes a difference. It does.", "William James"),
+    ("Nothing can bring you peace but yourself.", "Ralph Waldo Emerson"),
+    ("Rest when you're weary. Refresh and renew yourself, your body, your mind, your spirit.", "Ralph Marston"),
+    ("There is hope, even when your brain tells you there isn't.", "John Green"),
+    ("Self-care is how you take your power back.", "Lalah Delia"),
+    ("The present moment is filled with joy and happiness. If you are attentive, you will see it.", "Thich Nhat Hanh"),
+    ("You are allowed to be both a masterpiece and a work in progress simultaneously.", "Sophia Bush"),
+    ("Feelings are just visitors. Let them come and go.", "Mooji"),
+]
+
+# --- DATA LAYER (ConnectionPool) ---
+class ConnectionPool:
+    """A fixed-size pool of long-lived SQLite connections shared by the request threads."""
+
+    def __init__(self, path: str, size: int, timeout: float, pragmas: Optional[dict] = None):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._open = 0
+        self._closed = False
+        self.checkouts = 0
+        self.waits = 0
+        self.wait_seconds = 0.0
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        # These settings are per-connection, so every pooled handle gets them on open.
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def acquire(self):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("The connection pool has been closed.")
+            self.checkouts += 1
+            try:
+                return self._idle.get_nowait()
+            except queue.Empty:
+                pass
+            can_open = self._open < self.size
+            if can_open:
+                self._open += 1
+            else:
+                self.waits += 1
+
+        if can_open:
+            try:
+                return self._connect()
+            except sqlite3.Error:
+                with self._lock:
+                    self._open -= 1
+                raise
+
+        started = time.perf_counter()
+        try:
+            return self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+            raise TimeoutError(f"No database connection became free within {self.timeout}s.")
+        finally:
+            with self._lock:
+                self.wait_seconds += time.perf_counter() - started
+
+    def release(self, conn):
+        with self._lock:
+            if not self._closed:
+                self._idle.put(conn)
+                return
+            self._open -= 1
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Checks out a connection for one transaction: commits on success, rolls back on error."""
+        conn = self.acquire()
+        try:
+            with conn:
+                yield conn
+        finally:
+            self.release(conn)
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._open -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": self._idle.qsize(),
+                "in_use": self._open - self._idle.qsize(),
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "wait_ms_total": round(self.wait_seconds * 1000, 2),
+                "closed": self._closed,
+            }
+
+# --- Day Numbers ---
+# Entries carry an integer `day` (days since 1970-01-01 in local time) next to the epoch `ts`,
+# so per-day reads compare integers instead of slicing and parsing ISO strings.
+EPOCH_DATE = date(1970, 1, 1)
+
+def to_day_number(d: date) -> int:
+    return (d - EPOCH_DATE).days
+
+def from_day_number(day: int) -> date:
+    return EPOCH_DATE + timedelta(days=day)
+
+# --- Daily Mood Rollup ---
+# One row per (user, day) with the running aggregates of that day's mood scores.
+# Every mood insert merges into it in the same transaction, one entry or a whole imported day at a time.
+ROLLUP_UPSERT_SQL = """
+    INSERT INTO daily_mood_rollup (user_id, day, count, sum, min, max) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(user_id, day) DO UPDATE SET
+        count = count + excluded.count,
+        sum = sum + excluded.sum,
+        min = MIN(min, excluded.min),
+        max = MAX(max, excluded.max)
+"""
+def rollup_merges(scores) -> List[tuple]:
+    """Folds (user_id, day, mood_score) triples into one ROLLUP_UPSERT_SQL parameter row per (user, day)."""
+    rollup = {}
+    for user_id, day, score in scores:
+        count, total, low, high = rollup.get((user_id, day), (0, 0, score, score))
+        rollup[(user_id, day)] = (count + 1, total + score, min(low, score), max(high, score))
+    return [(*key, *agg) for key, agg in rollup.items()]
+
+ROLLUP_REBUILD_SQL = """
+    INSERT INTO daily_mood_rollup (user_id, day, count, sum, min, max)
+    SELECT user_id, day, COUNT(*), SUM(mood_score), MIN(mood_score), MAX(mood_score)
+    FROM mood_entries WHERE day IS NOT NULL GROUP BY user_id, day
+"""
+
+# Bucket start expressions for mood series, each yielding the day number of the bucket's first day.
+# Day 0 (1970-01-01) was a Thursday, so (day + 3) % 7 is the weekday with Monday = 0.
+SERIES_BUCKETS = {
+    "day": "day",
+    "week": "day - ((day + 3) % 7)",
+    "month": "CAST(julianday(strftime('%Y-%m-01', day + 2440587.5)) - 2440587.5 AS INTEGER)",
+}
+
+# --- Schema Migrations ---
+# MIGRATIONS[n - 1] upgrades a database from user_version n - 1 to n. Append new steps; never edit old ones.
+def _migration_1_base_tables(conn):
+    c = conn.cursor()
+    c.execute('''CREATE TABLE IF NOT EXISTS users (
+                   user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   name TEXT NOT NULL UNIQUE,
+                   password_hash TEXT NOT NULL,
+                   created_at TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS mood_entries (
+                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   user_id INTEGER,
+                   mood_score INTEGER,
+                   notes TEXT,
+                   date TEXT,
+                   FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS journal_entries (
+                   id INTEGER PRIMARY KEY AUTOINCREMENT,
+                   user_id INTEGER,
+                   content TEXT,
+                   date TEXT,
+                   FOREIGN KEY(user_id) REFERENCES users(user_id))''')
+
+def _migration_2_user_date_indexes(conn):
+    # Every per-user read filters on user_id and then ranges over or orders by date.
+    # The mood index also carries the selected columns so those reads never touch the table.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_mood_entries_user_date "
+                 "ON mood_entries(user_id, date, mood_score, notes)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_entries_user_date "
+                 "ON journal_entries(user_id, date)")
+
+def _migration_3_integer_timestamps(conn):
+    for table in ("mood_entries", "journal_entries"):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN ts INTEGER")
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN day INTEGER")
+        # `date` holds naive local time; the 'utc' modifier converts it to a real epoch like datetime.timestamp().
+        # julianday('1970-01-01') is 2440587.5, so the difference is a whole local day number.
+        conn.execute(f"""UPDATE {table}
+                         SET ts = CAST(strftime('%s', date, 'utc') AS INTEGER),
+                             day = CAST(julianday(SUBSTR(date, 1, 10)) - 2440587.5 AS INTEGER)
+                         WHERE ts IS NULL""")
+    conn.execute("DROP INDEX IF EXISTS idx_mood_entries_user_date")
+    conn.execute("DROP INDEX IF EXISTS idx_journal_entries_user_date")
+    conn.execute("CREATE INDEX idx_mood_entries_user_day ON mood_entries(user_id, day, ts, mood_score)")
+    conn.execute("CREATE INDEX idx_journal_entries_user_day ON journal_entries(user_id, day)")
+
+def _migration_4_daily_mood_rollup(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS daily_mood_rollup (
+                      user_id INTEGER NOT NULL,
+                      day INTEGER NOT NULL,
+                      count INTEGER NOT NULL,
+                      sum INTEGER NOT NULL,
+                      min INTEGER NOT NULL,
+                      max INTEGER NOT NULL,
+                      PRIMARY KEY (user_id, day)) WITHOUT ROWID''')
+    conn.execute(ROLLUP_REBUILD_SQL)
+
+def _migration_5_journal_fts(conn):
+    # External-content index: journal_fts stores only the inverted index and reads text back from journal_entries.
+    # user_id is indexed as a token so a search intersects with the user's own entries inside FTS5, instead of
+    # ranking every user's matches and filtering afterwards. rank ignores that column when scoring.
+    # The triggers keep the index in step with every insert, delete and edit, whichever code path makes them.
+    conn.execute("""CREATE VIRTUAL TABLE journal_fts USING fts5(
+                      content, user_id, content='journal_entries', content_rowid='id',
+                      tokenize='unicode61 remove_diacritics 2', prefix='2 3')""")
+    conn.execute("INSERT INTO journal_fts(journal_fts, rank) VALUES ('rank', 'bm25(1.0, 0.0)')")
+    conn.execute("""CREATE TRIGGER journal_fts_ai AFTER INSERT ON journal_entries BEGIN
+                      INSERT INTO journal_fts(rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+                    END""")
+    conn.execute("""CREATE TRIGGER journal_fts_ad AFTER DELETE ON journal_entries BEGIN
+                      INSERT INTO journal_fts(journal_fts, rowid, content, user_id) VALUES ('delete', old.id, old.content, old.user_id);
+                    END""")
+    conn.execute("""CREATE TRIGGER journal_fts_au AFTER UPDATE OF content, user_id ON journal_entries BEGIN
+                      INSERT INTO journal_fts(journal_fts, rowid, content, user_id) VALUES ('delete', old.id, old.content, old.user_id);
+                      INSERT INTO journal_fts(rowid, content, user_id) VALUES (new.id, new.content, new.user_id);
+                    END""")
+    conn.execute("INSERT INTO journal_fts(journal_fts) VALUES ('rebuild')")
+
+def _migration_6_client_keys(conn):
+    # Idempotency keys from offline clients. NULL for entries made through the single-entry endpoints,
+    # which the partial index leaves out, so only keyed entries have to be unique per user.
+    for table in ("mood_entries", "journal_entries"):
+        conn.execute(f"ALTER TABLE {table} ADD COLUMN client_key TEXT")
+        conn.execute(f"CREATE UNIQUE INDEX idx_{table}_client_key ON {table}(user_id, client_key) "
+                     "WHERE client_key IS NOT NULL")
+
+def _migration_7_sessions(conn):
+    conn.execute('''CREATE TABLE sessions (
+                      session_id TEXT PRIMARY KEY,
+                      user_id INTEGER NOT NULL,
+                      created_at INTEGER NOT NULL,
+                      expires_at INTEGER NOT NULL,
+                      FOREIGN KEY(user_id) REFERENCES users(user_id)) WITHOUT ROWID''')
+    conn.execute("CREATE INDEX idx_sessions_user_expires ON sessions(user_id, expires_at)")
+
+MIGRATIONS = [
+    _migration_1_base_tables,
+    _migration_2_user_date_indexes,
+    _migration_3_integer_timestamps,
+    _migration_4_daily_mood_rollup,
+    _migration_5_journal_fts,
+    _migration_6_client_keys,
+    _migration_7_sessions,
+]
+
+# --- DATA LAYER (GroupCommitWriter) ---
+class DatabaseBusy(Exception):
+    pass
+
+MOOD_INSERT_SQL = "INSERT INTO mood_entries (user_id, mood_score, notes, date, ts, day) VALUES (?, ?, ?, ?, ?, ?)"
+
+class GroupCommitWriter:
+    """Single writer thread that commits queued mood inserts together.
+
+    The first queued row opens a batch; rows arriving within `window` seconds (up to `max_rows`) join it,
+    and the whole batch is inserted and merged into the rollup in one transaction. Each caller's future
+    resolves only after that transaction has committed, so a resolved future is as durable as a plain
+    commit under the configured `PRAGMA synchronous`, while many rows share a single commit and sync.
+    """
+
+    LATENCY_SAMPLES = 1024
+
+    def __init__(self, pool: ConnectionPool, window: float, max_rows: int, max_pending: int):
+        self.pool = pool
+        self.window = window
+        self.max_rows = max_rows
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._commit_ms = deque(maxlen=self.LATENCY_SAMPLES)
+        self.batches = 0
+        self.rows = 0
+        self.max_batch = 0
+        self.failed_batches = 0
+        self.rejected = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="vibecheck-db-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, row: tuple) -> Future:
+        """Queues a (user_id, mood_score, notes, date, ts, day) row; the future resolves once it is committed."""
+        self.start()
+        future = Future()
+        try:
+            self._queue.put_nowait((row, future))
+        except queue.Full:
+            with self._lock:
+                self.rejected += 1
+            raise DatabaseBusy()
+        return future
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.perf_counter() + self.window
+            stopping = False
+            while len(batch) < self.max_rows:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                batch.append(item)
+            for _, future in batch:
+                # A waiter cancelled from here on can no longer cancel the future under the writer.
+                # Rows whose waiter already gave up are still committed; only their answer is dropped.
+                future.set_running_or_notify_cancel()
+            try:
+                self._commit(batch)
+            except Exception as exc:
+                # Fail this batch only; the thread must live on for every later insert.
+                logger.exception("Group commit of %d rows failed", len(batch))
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+            if stopping:
+                return
+
+    def _commit(self, batch: List[tuple]):
+        rows = [row for row, _ in batch]
+        started = time.perf_counter()
+        try:
+            with self.pool.connection() as conn:
+                conn.executemany(MOOD_INSERT_SQL, rows)
+                conn.executemany(ROLLUP_UPSERT_SQL, rollup_merges((row[0], row[5], row[1]) for row in rows))
+        except Exception as exc:
+            with self._lock:
+                self.failed_batches += 1
+            if len(batch) > 1:
+                # Retry one row per transaction so a single bad row cannot fail its neighbours.
+                for item in batch:
+                    self._commit([item])
+                return
+            if not batch[0][1].cancelled():
+                batch[0][1].set_exception(exc)
+            return
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.batches += 1
+            self.rows += len(batch)
+            self.max_batch = max(self.max_batch, len(batch))
+            self._commit_ms.append(elapsed_ms)
+        for _, future in batch:
+            if not future.cancelled():
+                future.set_result(None)
+
+    def shutdown(self):
+        """Commits everything already queued, then stops the writer thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def stats(self) -> dict:
+        with self._lock:
+            samples = sorted(self._commit_ms)
+            return {
+                "window_ms": round(self.window * 1000, 2),
+                "max_rows": self.max_rows,
+                "pending": self._queue.qsize(),
+                "batches": self.batches,
+                "rows": self.rows,
+                "avg_batch": round(self.rows / self.batches, 2) if self.batches else 0,
+                "max_batch": self.max_batch,
+                "failed_batches": self.failed_batches,
+                "rejected": self.rejected,
+                "commit_ms_p50": round(samples[len(samples) // 2], 2) if samples else 0,
+                "commit_ms_p95": round(samples[int(len(samples) * 0.95)], 2) if samples else 0,
+                "commit_ms_max": round(samples[-1], 2) if samples else 0,
+            }
 
 # --- DATA LAYER (DatabaseManager) ---
 class DatabaseManager:
+    pool = ConnectionPool(DB_PATH, DB_POOL_SIZE, DB_POOL_TIMEOUT, DB_PRAGMAS)
+    writer = (GroupCommitWriter(pool, DB_GROUP_COMMIT_WINDOW_MS / 1000, DB_GROUP_COMMIT_MAX_ROWS, DB_QUEUE_SIZE)
+              if DB_GROUP_COMMIT else None)
+
     @staticmethod
     def get_connection():
-        conn = sqlite3.connect("wellness.db")
-        conn.row_factory = sqlite3.Row
-        return conn
+        return DatabaseManager.pool.connection()
+
+    @staticmethod
+    def close():
+        if DatabaseManager.writer is not None:
+            DatabaseManager.writer.shutdown()
+        DatabaseManager.pool.close()
 
     @staticmethod
     def init_db():
         with DatabaseManager.get_connection() as conn:
-            c = conn.cursor()
-            c.execute('''CREATE TABLE IF NOT EXISTS users (
-                           user_id INTEGER PRIMARY KEY AUTOINCREMENT,
-                           name TEXT NOT NULL UNIQUE,
-                           password_hash TEXT NOT NULL,
-                           created_at TEXT)''')
-            c.execute('''CREATE TABLE IF NOT EXISTS mood_entries (
-                           id INTEGER PRIMARY KEY AUTOINCREMENT,
-                           user_id INTEGER,
-                           mood_score INTEGER,
-                           notes TEXT,
-                           date TEXT,
-                           FOREIGN KEY(user_id) REFERENCES users(user_id))''')
-            c.execute('''CREATE TABLE IF NOT EXISTS journal_entries (
-                           id INTEGER PRIMARY KEY AUTOINCREMENT,
-                           user_id INTEGER,
-                           content TEXT,
-                           date TEXT,
-                           FOREIGN KEY(user_id) REFERENCES users(user_id))''')
-            conn.commit()
+            # journal_mode is persistent and cannot change inside a transaction, so set it first.
+            conn.execute(f"PRAGMA journal_mode = {DB_JOURNAL_MODE}")
+        DatabaseManager.migrate()
+
+    @staticmethod
+    def migrate():
+        with DatabaseManager.get_connection() as conn:
+            # BEGIN IMMEDIATE serializes concurrent starters; the loser sees the bumped version.
+            conn.execute("BEGIN IMMEDIATE")
+            current_version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for version, migration in enumerate(MIGRATIONS, start=1):
+                if version > current_version:
+                    migration(conn)
+                    conn.execute(f"PRAGMA user_version = {version}")
 
     @staticmethod
     def get_user_by_name(name: str):
@@ -66,8 +610,7 @@ class DatabaseManager:
             return conn.cursor().execute("SELECT * FROM users WHERE name = ?", (name,)).fetchone()
 
     @staticmethod
-    def create_user(name: str, password: str) -> Optional[dict]:
-        password_hash = hashlib.sha256(password.encode()).hexdigest()
+    def create_user(name: str, password_hash: str) -> Optional[dict]:
         created_at = datetime.now().isoformat()
         with DatabaseManager.get_connection() as conn:
             try:
@@ -80,66 +623,1278 @@ class DatabaseManager:
                 return None
     
     @staticmethod
-    def add_mood_entry(user_id: int, mood_score: int, notes: str):
+    def mood_entry_row(user_id: int, mood_score: int, notes: str) -> tuple:
+        now = datetime.now()
+        return (user_id, mood_score, notes, now.isoformat(), int(now.timestamp()), to_day_number(now.date()))
+
+    @staticmethod
+    def update_password_hash(user_id: int, password_hash: str):
+        with DatabaseManager.get_connection() as conn:
+            conn.execute("UPDATE users SET password_hash = ? WHERE user_id = ?", (password_hash, user_id))
+
+    @staticmethod
+    def create_session(session_id: str, user_id: int, created_at: int, expires_at: int):
+        with DatabaseManager.get_connection() as conn:
+            # Expired sessions are cleared per user as they log in again, so the table stays small.
+            conn.execute("DELETE FROM sessions WHERE user_id = ? AND expires_at <= ?", (user_id, created_at))
+            conn.execute("INSERT INTO sessions (session_id, user_id, created_at, expires_at) VALUES (?, ?, ?, ?)",
+                         (session_id, user_id, created_at, expires_at))
+
+    @staticmethod
+    def get_session(session_id: str):
+        with DatabaseManager.get_connection() as conn:
+            return conn.execute("SELECT user_id, expires_at FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+
+    @staticmethod
+    def delete_session(session_id: str):
+        with DatabaseManager.get_connection() as conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+
+    @staticmethod
+    def add_mood_entry(user_id: int, mood_score: int, notes: str) -> tuple:
+        """Stores the mood and returns its row (user_id, mood_score, notes, date, ts, day)."""
+        row = DatabaseManager.mood_entry_row(user_id, mood_score, notes)
+        if DatabaseManager.writer is not None:
+            DatabaseManager.writer.submit(row).result()
+            return row
         with DatabaseManager.get_connection() as conn:
-            conn.execute(
-                "INSERT INTO mood_entries (user_id, mood_score, notes, date) VALUES (?, ?, ?, ?)",
-                (user_id, mood_score, notes, datetime.now().isoformat())
-            )
+            conn.execute(MOOD_INSERT_SQL, row)
+            conn.execute(ROLLUP_UPSERT_SQL, (user_id, row[5], 1, mood_score, mood_score, mood_score))
             conn.commit()
+        return row
 
     @staticmethod
-    def add_journal_entry(user_id: int, content: str):
+    def add_journal_entry(user_id: int, content: str) -> dict:
+        now = datetime.now()
         with DatabaseManager.get_connection() as conn:
-            conn.execute("INSERT INTO journal_entries (user_id, content, date) VALUES (?, ?, ?)",
-                         (user_id, content, datetime.now().date().isoformat()))
+            cursor = conn.execute("INSERT INTO journal_entries (user_id, content, date, ts, day) VALUES (?, ?, ?, ?, ?)",
+                                  (user_id, content, now.date().isoformat(), int(now.timestamp()), to_day_number(now.date())))
             conn.commit()
+            return {"id": cursor.lastrowid, "date": now.date().isoformat(), "content": content, "client_key": None}
 
     @staticmethod
-    def get_activity_dates(user_id: int):
+    def get_journal_entries_by_keys(user_id: int, client_keys: List[str]):
+        if not client_keys:
+            return []
         with DatabaseManager.get_connection() as conn:
+            rows = conn.execute(
+                f"""SELECT id, date, content, client_key FROM journal_entries
+                    WHERE user_id = ? AND client_key IN ({",".join("?" * len(client_keys))}) ORDER BY day, id""",
+                (user_id, *client_keys)).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def get_activity_dates(user_id: int, start_day: int, end_day: int):
+        with DatabaseManager.get_connection() as conn:
+            # Both halves are range scans on the (user_id, day) indexes; UNION sorts and de-duplicates.
             query = """
-                SELECT SUBSTR(date, 1, 10) AS activity_date FROM mood_entries WHERE user_id = ?
+                SELECT day FROM mood_entries WHERE user_id = ? AND day BETWEEN ? AND ?
                 UNION
-                SELECT date AS activity_date FROM journal_entries WHERE user_id = ?
+                SELECT day FROM journal_entries WHERE user_id = ? AND day BETWEEN ? AND ?
             """
-            rows = conn.cursor().execute(query, (user_id, user_id)).fetchall()
-            return [row['activity_date'] for row in rows]
+            rows = conn.cursor().execute(query, (user_id, start_day, end_day, user_id, start_day, end_day)).fetchall()
+            return [from_day_number(row['day']).isoformat() for row in rows]
+
+    @staticmethod
+    def get_journal_page(user_id: int, limit: int, before: Optional[tuple] = None):
+        """Newest-first journal entries strictly older than the (day, id) key `before`, if given."""
+        with DatabaseManager.get_connection() as conn:
+            # (user_id, day) index entries end in the rowid, so this is a backwards index walk with no sort step,
+            # and a page costs the same however far back it is.
+            if before is None:
+                rows = conn.cursor().execute(
+                    "SELECT id, date, content, day, client_key FROM journal_entries WHERE user_id = ? ORDER BY day DESC, id DESC LIMIT ?",
+                    (user_id, limit)).fetchall()
+            else:
+                rows = conn.cursor().execute(
+                    "SELECT id, date, content, day, client_key FROM journal_entries WHERE user_id = ? AND (day, id) < (?, ?) ORDER BY day DESC, id DESC LIMIT ?",
+                    (user_id, before[0], before[1], limit)).fetchall()
+            return [dict(row) for row in rows]
 
     @staticmethod
-    def get_all_journal_entries(user_id: int):
+    def search_journal_entries(user_id: int, terms: str, limit: int, offset: int):
+        """Best bm25 matches first, each with a snippet whose hits are wrapped in SNIPPET_OPEN/SNIPPET_CLOSE."""
+        match = f'user_id : "{user_id}" AND content : ({terms})'
         with DatabaseManager.get_connection() as conn:
-            rows = conn.cursor().execute("SELECT id, date, content FROM journal_entries WHERE user_id = ? ORDER BY date DESC", (user_id,)).fetchall()
+            rows = conn.cursor().execute(
+                """SELECT j.id, j.date, snippet(journal_fts, 0, ?, ?, '…', 16) AS snippet
+                   FROM journal_fts JOIN journal_entries j ON j.id = journal_fts.rowid
+                   WHERE journal_fts MATCH ?
+                   ORDER BY journal_fts.rank, j.id DESC LIMIT ? OFFSET ?""",
+                (SNIPPET_OPEN, SNIPPET_CLOSE, match, limit, offset)).fetchall()
             return [dict(row) for row in rows]
 
     @staticmethod
-    def delete_journal_entry(entry_id: int):
+    def delete_journal_entry(entry_id: int, user_id: int) -> Optional[int]:
+        """Deletes the entry if it belongs to the user and returns its day; None if there was no such entry of theirs."""
         with DatabaseManager.get_connection() as conn:
-            conn.execute("DELETE FROM journal_entries WHERE id = ?", (entry_id,))
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT day FROM journal_entries WHERE id = ? AND user_id = ?", (entry_id, user_id)).fetchone()
+            if row is not None:
+                conn.execute("DELETE FROM journal_entries WHERE id = ?", (entry_id,))
             conn.commit()
+            return row['day'] if row is not None else None
 
     @staticmethod
-    def get_mood_entries(user_id: int, limit_days: int):
-        start_date = (datetime.now() - timedelta(days=limit_days)).isoformat()
+    def get_mood_entries_for_today(user_id: int):
+        today = to_day_number(datetime.now().date())
         with DatabaseManager.get_connection() as conn:
             rows = conn.cursor().execute(
-                "SELECT mood_score, date, notes FROM mood_entries WHERE user_id = ? AND date >= ? ORDER BY date ASC", 
-                (user_id, start_date)
+                "SELECT mood_score, date, notes, client_key FROM mood_entries WHERE user_id = ? AND day = ? ORDER BY ts ASC, id ASC",
+                (user_id, today)
             ).fetchall()
             return [dict(row) for row in rows]
-    
+
     @staticmethod
-    def get_mood_entries_for_today(user_id: int):
-        today_str = datetime.now().date().isoformat()
+    def get_mood_rollup_days(user_id: int, days: List[int]):
+        with DatabaseManager.get_connection() as conn:
+            rows = conn.execute(
+                f"SELECT day, count, sum FROM daily_mood_rollup WHERE user_id = ? AND day IN ({','.join('?' * len(days))})",
+                (user_id, *days)).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def iter_mood_rollup(user_id: Optional[int] = None):
+        """Yields chunks of (user_id, day, count, sum) rollup rows in (user_id, day) order, for one user or all."""
+        with DatabaseManager.get_connection() as conn:
+            if user_id is None:
+                cursor = conn.execute("SELECT user_id, day, count, sum FROM daily_mood_rollup ORDER BY user_id, day")
+            else:
+                cursor = conn.execute("SELECT user_id, day, count, sum FROM daily_mood_rollup "
+                                      "WHERE user_id = ? ORDER BY day", (user_id,))
+            while True:
+                rows = cursor.fetchmany(ANALYTICS_LOAD_CHUNK)
+                if not rows:
+                    return
+                yield [tuple(row) for row in rows]
+
+    @staticmethod
+    def get_mood_series(user_id: int, start_day: int, end_day: int, bucket: str):
+        bucket_expr = SERIES_BUCKETS[bucket]
         with DatabaseManager.get_connection() as conn:
             rows = conn.cursor().execute(
-                "SELECT mood_score, date, notes FROM mood_entries WHERE user_id = ? AND date >= ? ORDER BY date ASC", 
-                (user_id, today_str)
+                f"""SELECT {bucket_expr} AS bucket, SUM(count) AS count, SUM(sum) AS sum
+                    FROM daily_mood_rollup WHERE user_id = ? AND day BETWEEN ? AND ?
+                    GROUP BY bucket ORDER BY bucket ASC""",
+                (user_id, start_day, end_day)
             ).fetchall()
             return [dict(row) for row in rows]
 
+    @staticmethod
+    def add_entries_batch(user_id: int, moods: List[tuple], journals: List[tuple]):
+        """Stores keyed (client_key, date, ts, day, mood_score, notes) moods and (client_key, date, ts, day, content)
+        journals in one transaction, skipping keys the user already has. Returns (stored keys, duplicate keys)."""
+        with DatabaseManager.get_connection() as conn:
+            # IMMEDIATE takes the write lock before the duplicate check, so a concurrent retry of the
+            # same batch waits here instead of slipping in between the check and the insert.
+            conn.execute("BEGIN IMMEDIATE")
+            duplicates = []
+            fresh = {}
+            for table, rows in (("mood_entries", moods), ("journal_entries", journals)):
+                keys = [row[0] for row in rows]
+                existing = set()
+                if keys:
+                    placeholders = ",".join("?" * len(keys))
+                    existing = {row[0] for row in conn.execute(
+                        f"SELECT client_key FROM {table} WHERE user_id = ? AND client_key IN ({placeholders})",
+                        (user_id, *keys))}
+                fresh[table] = []
+                for row in rows:
+                    if row[0] in existing:
+                        duplicates.append(row[0])
+                    else:
+                        existing.add(row[0])
+                        fresh[table].append(row)
+
+            conn.executemany(
+                "INSERT INTO mood_entries (user_id, client_key, date, ts, day, mood_score, notes) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(user_id, *row) for row in fresh["mood_entries"]])
+            conn.executemany(ROLLUP_UPSERT_SQL, rollup_merges(
+                (user_id, day, score) for _, _, _, day, score, _ in fresh["mood_entries"]))
+            conn.executemany(
+                "INSERT INTO journal_entries (user_id, client_key, date, ts, day, content) VALUES (?, ?, ?, ?, ?, ?)",
+                [(user_id, *row) for row in fresh["journal_entries"]])
+            stored = [row[0] for row in fresh["mood_entries"] + fresh["journal_entries"]]
+            return stored, duplicates
+
+    @staticmethod
+    def export_mood_entries(user_id: int, after: Optional[tuple], limit: int):
+        """Next chunk of a user's moods in (day, ts, id) order, strictly after the key `after`."""
+        after = after or (-2**62, -2**62, 0)
+        with DatabaseManager.get_connection() as conn:
+            rows = conn.cursor().execute(
+                """SELECT id, date, ts, day, mood_score, notes FROM mood_entries
+                   WHERE user_id = ? AND (day, ts, id) > (?, ?, ?) ORDER BY day, ts, id LIMIT ?""",
+                (user_id, *after, limit)).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def export_journal_entries(user_id: int, after: Optional[tuple], limit: int):
+        """Next chunk of a user's journal entries in (day, id) order, strictly after the key `after`."""
+        after = after or (-2**62, 0)
+        with DatabaseManager.get_connection() as conn:
+            rows = conn.cursor().execute(
+                """SELECT id, date, ts, day, content FROM journal_entries
+                   WHERE user_id = ? AND (day, id) > (?, ?) ORDER BY day, id LIMIT ?""",
+                (user_id, *after, limit)).fetchall()
+            return [dict(row) for row in rows]
+
+    @staticmethod
+    def import_entries(user_id: int, moods: List[tuple], journals: List[tuple]):
+        """Inserts one chunk of (date, ts, day, mood_score, notes) moods and (date, ts, day, content) journals atomically."""
+        with DatabaseManager.get_connection() as conn:
+            conn.executemany(
+                "INSERT INTO mood_entries (user_id, date, ts, day, mood_score, notes) VALUES (?, ?, ?, ?, ?, ?)",
+                [(user_id, *mood) for mood in moods])
+            # One rollup merge per day in the chunk rather than one per imported row.
+            conn.executemany(ROLLUP_UPSERT_SQL, rollup_merges((user_id, day, score) for _, _, day, score, _ in moods))
+            conn.executemany(
+                "INSERT INTO journal_entries (user_id, date, ts, day, content) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, *journal) for journal in journals])
+            conn.commit()
+
+    @staticmethod
+    def rebuild_mood_rollup():
+        with DatabaseManager.get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM daily_mood_rollup")
+            conn.execute(ROLLUP_REBUILD_SQL)
+            return conn.execute("SELECT COUNT(*) FROM daily_mood_rollup").fetchone()[0]
+
 DatabaseManager.init_db()
 
+# --- DATA LAYER (AsyncDatabaseManager) ---
+class AsyncDatabaseManager:
+    """Awaitable facade over DatabaseManager for the async routes.
+
+    Calls run on a dedicated thread pool sized to the connection pool, so a worker never waits for a
+    connection and the event loop never blocks on SQLite. The number of queued calls is capped; past
+    the cap callers get DatabaseBusy instead of piling up unbounded latency.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vibecheck-db")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.rejected = 0
+
+    async def call(self, method, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise DatabaseBusy()
+            self._pending += 1
+        try:
+            return await asyncio.wrap_future(self._executor.submit(method, *args, **kwargs))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def __getattr__(self, name: str):
+        method = getattr(DatabaseManager, name)
+
+        async def call(*args, **kwargs):
+            return await self.call(method, *args, **kwargs)
+        return call
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"pending": self._pending, "max_pending": self.max_pending, "rejected": self.rejected}
+
+async_db = AsyncDatabaseManager(DB_POOL_SIZE, DB_QUEUE_SIZE)
+analytics = AnalyticsEngine(DatabaseManager.iter_mood_rollup, ANALYTICS_REFRESH_INTERVAL)
+insight_engine = InsightEngine(analytics, INSIGHT_CACHE_SIZE)
+
+def today_number() -> int:
+    return to_day_number(datetime.now().date())
+
+async def daily_mood_rows(user_id: int, limit_days: int) -> List[dict]:
+    """The user's (day, count, sum) rollup rows for the last `limit_days` days, served by the analytics engine."""
+    return await async_db.call(analytics.daily, user_id, today_number() - limit_days)
+
+@app.exception_handler(DatabaseBusy)
+async def database_busy_handler(request: Request, exc: DatabaseBusy):
+    return JSONResponse(status_code=503, content={"detail": "The server is busy. Please try again shortly."},
+                        headers={"Retry-After": "1"})
+
+# --- CHART CACHE (ChartCache) ---
+class ChartCache:
+    """Bounded LRU of rendered chart PNGs, kept in memory and mirrored to disk across restarts."""
+
+    def __init__(self, directory: str, memory_size: int, disk_size: int):
+        self.directory = directory
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.png")
+
+    def _remember(self, key: str, png: bytes):
+        self._memory[key] = png
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            png = self._memory.get(key)
+            if png is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+                return png
+        try:
+            with open(self._path(key), "rb") as f:
+                png = f.read()
+            os.utime(self._path(key))
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.disk_hits += 1
+            self._remember(key, png)
+        return png
+
+    def put(self, key: str, png: bytes):
+        with self._lock:
+            self._remember(key, png)
+        tmp_path = f"{self._path(key)}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(png)
+        os.replace(tmp_path, self._path(key))
+        self._trim_disk()
+
+    def _trim_disk(self):
+        entries = [e for e in os.scandir(self.directory) if e.name.endswith(".png")]
+        if len(entries) <= self.disk_size:
+            return
+        entries.sort(key=lambda e: e.stat().st_mtime)
+        for entry in entries[:len(entries) - self.disk_size]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"memory_entries": len(self._memory), "hits": self.hits,
+                    "disk_hits": self.disk_hits, "misses": self.misses}
+
+chart_cache = ChartCache(CHART_CACHE_DIR, CHART_MEMORY_CACHE_SIZE, CHART_DISK_CACHE_SIZE)
+
+def chart_version(user_id: int, timespan: str, daily_rows: List[dict]) -> str:
+    """Content address of a chart: it only changes when the rollup rows behind it change."""
+    payload = repr((CHART_STYLE_VERSION, user_id, timespan,
+                    [(row['day'], row['count'], row['sum']) for row in daily_rows]))
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+chart_renderer = ChartRenderer(CHART_RENDER_WORKERS, CHART_RENDER_QUEUE_SIZE, CHART_RENDER_RETRY_AFTER)
+
+# --- Conditional JSON Responses ---
+def json_body(payload) -> bytes:
+    """Canonical JSON encoding, so equal payloads always get equal bytes and ETags."""
+    return json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":")).encode()
+
+def json_etag(body: bytes) -> str:
+    return f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+
+# --- RESPONSE CACHE (ResponseCache) ---
+class MemoryCacheBackend:
+    """In-process LRU of cached responses. Only the event loop touches it, so it needs no lock.
+
+    Responses expire after `ttl` seconds. Generation counters live outside the LRU and never expire:
+    evicting one would reset it and revive older responses.
+    """
+
+    shared = False
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._generations = {}
+
+    async def fetch(self, user_id: int, key: str) -> tuple:
+        entry = self._entries.get(key)
+        value = None
+        if entry is not None:
+            expires, value = entry
+            if expires <= time.monotonic():
+                del self._entries[key]
+                value = None
+            else:
+                self._entries.move_to_end(key)
+        return self._generations.get(user_id, 0), value
+
+    async def store(self, key: str, value: bytes, ttl: int):
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def bump(self, user_id: int):
+        self._generations[user_id] = self._generations.get(user_id, 0) + 1
+
+    async def close(self):
+        pass
+
+    def size(self) -> int:
+        return len(self._entries)
+
+class RedisCacheBackend:
+    """Cached responses and generation counters in Redis, shared by every server process using the same URL.
+
+    Needs the optional `redis` package. Responses expire after `ttl` seconds; counters never do.
+    """
+
+    shared = True
+
+    def __init__(self, url: str, prefix: str = "vibecheck:"):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise RuntimeError("VIBECHECK_RESPONSE_CACHE is a Redis URL, but the 'redis' package is not installed.")
+        self._redis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    async def fetch(self, user_id: int, key: str) -> tuple:
+        # One round trip for both the user's generation and the cached value.
+        generation, value = await self._redis.mget([f"{self.prefix}gen:{user_id}", self.prefix + key])
+        return int(generation or 0), value
+
+    async def store(self, key: str, value: bytes, ttl: int):
+        await self._redis.set(self.prefix + key, value, ex=ttl)
+
+    async def bump(self, user_id: int):
+        await self._redis.incr(f"{self.prefix}gen:{user_id}")
+
+    async def close(self):
+        await self._redis.aclose()
+
+    def size(self) -> Optional[int]:
+        return None
+
+class ResponseCache:
+    """JSON bodies of per-user read endpoints, keyed by (route, user_id, params) and the user's generation.
+
+    Every write to a user's entries bumps their generation, and a cached body is only served while the
+    generation it was computed under is still current. The generation is read before the endpoint runs,
+    so a body computed while a write lands is stored as already stale. Backend errors count as misses.
+    """
+
+    def __init__(self, backend, ttl: int):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.bumps = 0
+        self.errors = 0
+
+    @staticmethod
+    def key(route: str, user_id: int, params: dict) -> str:
+        # Today's day number is part of every key: "today" and "the last 7 days" move at midnight.
+        return f"resp:{route}:{user_id}:{to_day_number(date.today())}:{json.dumps(params, sort_keys=True, default=str)}"
+
+    async def get(self, user_id: int, key: str) -> tuple:
+        """(generation, etag, body) with etag and body None on a miss."""
+        try:
+            generation, value = await self.backend.fetch(user_id, key)
+        except Exception:
+            self.errors += 1
+            return None, None, None
+        if value is not None:
+            stored_generation, etag, body = value.split(b"\n", 2)
+            if int(stored_generation) == generation:
+                self.hits += 1
+                return generation, etag.decode(), body
+        self.misses += 1
+        return generation, None, None
+
+    async def put(self, key: str, generation: int, etag: str, body: bytes):
+        try:
+            await self.backend.store(key, b"%d\n%s\n" % (generation, etag.encode()) + body, self.ttl)
+        except Exception:
+            self.errors += 1
+
+    async def bump(self, user_id: int):
+        try:
+            await self.backend.bump(user_id)
+            self.bumps += 1
+        except Exception:
+            self.errors += 1
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "entries": self.backend.size(),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0,
+            "bumps": self.bumps,
+            "errors": self.errors,
+        }
+
+def create_response_cache() -> Optional[ResponseCache]:
+    if RESPONSE_CACHE == "off":
+        return None
+    if RESPONSE_CACHE == "memory":
+        return ResponseCache(MemoryCacheBackend(RESPONSE_CACHE_SIZE), RESPONSE_CACHE_TTL)
+    return ResponseCache(RedisCacheBackend(RESPONSE_CACHE), RESPONSE_CACHE_TTL)
+
+response_cache = create_response_cache()
+
+def cached_response(route: str, per_process: bool = False):
+    """Serves a per-user GET endpoint from response_cache, with an ETag and 304s for unchanged bodies.
+
+    The endpoint takes `user_id` and returns a JSON-able payload; its other arguments form the cache key.
+    `per_process` marks an endpoint answered from this process's analytics engine. Another process's
+    engine may not have seen a write yet, so such bodies are never stored in a shared backend.
+    The request is injected for the If-None-Match check whether or not the endpoint declares it.
+    """
+    def decorate(endpoint):
+        signature = inspect.signature(endpoint)
+        takes_request = "request" in signature.parameters
+
+        @functools.wraps(endpoint)
+        async def wrapper(**kwargs):
+            request = kwargs["request"] if takes_request else kwargs.pop("request")
+            user_id = kwargs["user_id"]
+            params = {name: value for name, value in kwargs.items() if name not in ("user_id", "request")}
+            key = ResponseCache.key(route, user_id, params)
+            cache = response_cache if response_cache and not (per_process and response_cache.backend.shared) else None
+            generation, etag, body = await cache.get(user_id, key) if cache else (None, None, None)
+            if body is None:
+                body = json_body(await endpoint(**kwargs))
+                etag = json_etag(body)
+                if generation is not None:
+                    await cache.put(key, generation, etag, body)
+            headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+            if request.headers.get("if-none-match") == etag:
+                return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+            return Response(content=body, media_type="application/json", headers=headers)
+
+        if not takes_request:
+            request_parameter = inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+            wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), request_parameter])
+        return wrapper
+    return decorate
+
+async def user_data_changed(user_id: int):
+    """Called after every write to a user's entries: drops their cached responses and analytics."""
+    analytics.invalidate(user_id)
+    if response_cache is not None:
+        await response_cache.bump(user_id)
+
+# --- LIVE EVENTS (EventBroker) ---
+class EventBroker:
+    """In-process pub/sub carrying small changes from the write routes to the users' open /api/events streams.
+
+    Publishers and streams all run on the event loop, so nothing here is locked. Events are numbered, and
+    the last `replay_size` of each recently subscribed user are kept: a client that reconnects with
+    Last-Event-ID is sent exactly what it missed. When that history no longer reaches back far enough, or
+    a stream falls `queue_size` events behind, the client gets one "resync" event and refetches instead.
+    A stream only hears about writes handled by its own server process.
+    """
+
+    def __init__(self, queue_size: int, replay_size: int, replay_users: int, max_streams: int):
+        self.queue_size = queue_size
+        self.replay_size = replay_size
+        self.replay_users = replay_users
+        self.max_streams = max_streams
+        # Part of every event id, so an id from before a restart is never mistaken for a current one.
+        self.boot = secrets.token_hex(4)
+        self._seq = 0
+        # user_id -> set of stream queues
+        self._streams = {}
+        # user_id -> [floor, deque of (seq, event)]: the deque holds every event of theirs numbered above floor.
+        self._history = OrderedDict()
+        self.published = 0
+        self.resyncs = 0
+        self.closed = False
+
+    def event_id(self, seq: Optional[int] = None) -> str:
+        """The id of event `seq`, or of the latest event published."""
+        return f"{self.boot}-{self._seq if seq is None else seq}"
+
+    def _parse_id(self, event_id: str) -> Optional[int]:
+        boot, _, seq = event_id.partition("-")
+        return int(seq) if boot == self.boot and seq.isdigit() else None
+
+    def listening(self, user_id: int) -> bool:
+        """Whether the user has had a stream recently; nobody else's events are worth building."""
+        return user_id in self._history or user_id in self._streams
+
+    def _track(self, user_id: int) -> list:
+        history = self._history.get(user_id)
+        if history is None:
+            history = self._history[user_id] = [self._seq, deque()]
+            while len(self._history) > self.replay_users:
+                self._history.popitem(last=False)
+        self._history.move_to_end(user_id)
+        return history
+
+    def _deliver(self, stream: asyncio.Queue, items: List[tuple]):
+        if stream.qsize() + len(items) > self.queue_size:
+            # Replaying a long backlog costs more than a refetch, so drop it and say so.
+            while not stream.empty():
+                stream.get_nowait()
+            stream.put_nowait((self._seq, {"type": "resync"}))
+            self.resyncs += 1
+            return
+        for item in items:
+            stream.put_nowait(item)
+
+    def publish(self, user_id: int, events: List[dict]):
+        history = self._track(user_id)
+        items = []
+        for event in events:
+            self._seq += 1
+            items.append((self._seq, event))
+        history[1].extend(items)
+        while len(history[1]) > self.replay_size:
+            history[0] = history[1].popleft()[0]
+        self.published += len(items)
+        for stream in self._streams.get(user_id, ()):
+            self._deliver(stream, items)
+
+    def admit(self, user_id: int):
+        """Raises the HTTP error a new stream of the user's would be refused with, if any."""
+        if self.closed:
+            # The server is shutting down; a client reconnecting right away must not hold it open again.
+            raise HTTPException(status_code=503, detail="The server is shutting down.")
+        if len(self._streams.get(user_id, ())) >= self.max_streams:
+            raise HTTPException(status_code=429, detail="Too many open event streams.")
+
+    def subscribe(self, user_id: int, last_event_id: Optional[str]) -> asyncio.Queue:
+        """Opens a stream, primed with the user's events after `last_event_id` or a resync if they are gone."""
+        self.admit(user_id)
+        streams = self._streams.get(user_id, set())
+        history = self._track(user_id)
+        stream = asyncio.Queue()
+        if last_event_id:
+            last = self._parse_id(last_event_id)
+            if last is not None and last >= history[0]:
+                self._deliver(stream, [item for item in history[1] if item[0] > last])
+            else:
+                stream.put_nowait((self._seq, {"type": "resync"}))
+                self.resyncs += 1
+        self._streams[user_id] = streams | {stream}
+        return stream
+
+    def unsubscribe(self, user_id: int, stream: asyncio.Queue):
+        streams = self._streams.get(user_id, set()) - {stream}
+        if streams:
+            self._streams[user_id] = streams
+        else:
+            self._streams.pop(user_id, None)
+
+    def open(self):
+        self.closed = False
+
+    def close(self):
+        """Ends every open stream; their clients reconnect with Last-Event-ID once the server is back."""
+        if self.closed:
+            return
+        self.closed = True
+        for streams in self._streams.values():
+            for stream in streams:
+                stream.put_nowait((None, None))
+
+    def stats(self) -> dict:
+        return {"streams": sum(len(streams) for streams in self._streams.values()), "users": len(self._streams),
+                "replay_users": len(self._history), "published": self.published, "resyncs": self.resyncs}
+
+event_broker = EventBroker(EVENTS_QUEUE_SIZE, EVENTS_REPLAY_SIZE, EVENTS_REPLAY_USERS, EVENTS_MAX_STREAMS_PER_USER)
+
+async def publish_entries(user_id: int, moods: List[dict] = (), journals: List[dict] = ()):
+    """Sends new entries to the user's streams, with the days they landed on and those days' new mood averages."""
+    if not event_broker.listening(user_id):
+        return
+    events = [{"type": "mood", **mood} for mood in moods] + [{"type": "journal", **journal} for journal in journals]
+    events += [{"type": "activity", "date": day} for day in sorted({event["date"][:10] for event in events})]
+    mood_days = {to_day_number(date.fromisoformat(mood["date"][:10])) for mood in moods}
+    if mood_days:
+        for row in sorted(await async_db.get_mood_rollup_days(user_id, sorted(mood_days)), key=lambda row: row["day"]):
+            events.append({"type": "rollup", "date": from_day_number(row["day"]).isoformat(),
+                           "count": row["count"], "mean": round(row["sum"] / row["count"], 2)})
+    event_broker.publish(user_id, events)
+
+def close_streams_on_exit():
+    """Chains onto the server's SIGINT/SIGTERM handlers to end open event streams; returns an undo function.
+
+    uvicorn waits for every open response before it runs the lifespan shutdown, so without this a
+    Ctrl+C or a --reload would hang until each stream reached EVENTS_STREAM_MAX_AGE. Handlers can only be
+    set from the main thread, so a lifespan run anywhere else (TestClient, an embedding server) skips the
+    hook and relies on the close after `yield` alone.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return lambda: None
+    loop = asyncio.get_running_loop()
+    installed = {}
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        previous = signal.getsignal(signum)
+        if not callable(previous):
+            continue
+
+        def handler(signum, frame, previous=previous):
+            loop.call_soon_threadsafe(event_broker.close)
+            previous(signum, frame)
+        signal.signal(signum, handler)
+        installed[signum] = (handler, previous)
+
+    def restore():
+        for signum, (handler, previous) in installed.items():
+            # Leave alone a handler someone installed over ours in the meantime.
+            if signal.getsignal(signum) is handler:
+                signal.signal(signum, previous)
+    return restore
+
+def sse_message(event: dict, event_id: Optional[str] = None) -> str:
+    lines = f"id: {event_id}\n" if event_id else ""
+    return f"{lines}event: {event['type']}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
+
+async def event_stream(user_id: int, token: str, request: Request, last_event_id: Optional[str]):
+    # Subscribing here rather than in the route ties the stream to this generator's finally: a client gone
+    # before the response starts iterating never subscribes, instead of leaving a queue behind.
+    try:
+        stream = event_broker.subscribe(user_id, last_event_id)
+    except HTTPException:
+        return
+    # A new stream's "ready" carries the latest id, so even a client that has seen no events yet can resume.
+    # A resumed one's does not: if it dropped again before the replay, it must ask for the same events.
+    ready_id = None if last_event_id else event_broker.event_id()
+    # Streams end after EVENTS_STREAM_MAX_AGE; the client reconnects with Last-Event-ID and misses nothing.
+    deadline = time.monotonic() + EVENTS_STREAM_MAX_AGE
+    try:
+        yield sse_message({"type": "ready"}, ready_id)
+        while (timeout := min(EVENTS_KEEPALIVE, deadline - time.monotonic())) > 0:
+            try:
+                seq, event = await asyncio.wait_for(stream.get(), timeout)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                # A logout elsewhere ends the stream at the next keepalive instead of leaving it open for days.
+                await authenticate(token)
+                yield ": keepalive\n\n"
+                continue
+            if event is None:
+                return
+            yield sse_message(event, event_broker.event_id(seq))
+    except HTTPException:
+        return
+    finally:
+        event_broker.unsubscribe(user_id, stream)
+
+# --- IMPORT / EXPORT ---
+# One record per line: {"type": "mood", "date", "ts", "mood_score", "notes"} or {"type": "journal", "date", "ts", "content"}.
+# CSV carries the same records with every column present and the unused ones left empty.
+TRANSFER_FIELDS = ["type", "date", "ts", "mood_score", "notes", "content"]
+TRANSFER_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+class TransferStats:
+    """Totals and the most recent run for exports and imports, served by /api/transfer-stats."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {kind: {"runs": 0, "rows": 0, "bytes": 0, "seconds": 0.0, "last": None} for kind in ("export", "import")}
+
+    def record(self, kind: str, rows: int, nbytes: int, seconds: float):
+        last = {"rows": rows, "bytes": nbytes, "seconds": round(seconds, 3),
+                "rows_per_second": round(rows / seconds) if seconds > 0 else None}
+        with self._lock:
+            totals = self._stats[kind]
+            totals["runs"] += 1
+            totals["rows"] += rows
+            totals["bytes"] += nbytes
+            totals["seconds"] += seconds
+            totals["last"] = last
+        return last
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {kind: {**totals, "seconds": round(totals["seconds"], 3)} for kind, totals in self._stats.items()}
+
+transfer_stats = TransferStats()
+
+def encode_transfer_rows(records: List[dict], fmt: str) -> bytes:
+    if fmt == "csv":
+        buffer = io.StringIO()
+        csv.DictWriter(buffer, TRANSFER_FIELDS, lineterminator="\n").writerows(records)
+        return buffer.getvalue().encode()
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records).encode()
+
+async def export_user_data(user_id: int, fmt: str):
+    """Yields the user's moods, then journal entries, one keyset chunk at a time so memory stays flat."""
+    started, rows, nbytes = time.perf_counter(), 0, 0
+    try:
+        if fmt == "csv":
+            header = (",".join(TRANSFER_FIELDS) + "\n").encode()
+            nbytes += len(header)
+            yield header
+        after = None
+        while chunk := await async_db.export_mood_entries(user_id, after, TRANSFER_CHUNK_SIZE):
+            after = (chunk[-1]["day"], chunk[-1]["ts"], chunk[-1]["id"])
+            data = encode_transfer_rows([{"type": "mood", "date": row["date"], "ts": row["ts"], "mood_score": row["mood_score"],
+                                          "notes": row["notes"]} for row in chunk], fmt)
+            rows, nbytes = rows + len(chunk), nbytes + len(data)
+            yield data
+        after = None
+        while chunk := await async_db.export_journal_entries(user_id, after, TRANSFER_CHUNK_SIZE):
+            after = (chunk[-1]["day"], chunk[-1]["id"])
+            data = encode_transfer_rows([{"type": "journal", "date": row["date"], "ts": row["ts"], "content": row["content"]}
+                                         for row in chunk], fmt)
+            rows, nbytes = rows + len(chunk), nbytes + len(data)
+            yield data
+    finally:
+        transfer_stats.record("export", rows, nbytes, time.perf_counter() - started)
+
+def parse_transfer_record(record: dict, line: int):
+    """Validates one import record and returns ("mood" | "journal", row tuple for DatabaseManager.import_entries)."""
+    try:
+        kind = record.get("type")
+        when = datetime.fromisoformat(record["date"])
+        ts = int(record["ts"]) if record.get("ts") not in (None, "") else int(when.timestamp())
+        if kind == "mood":
+            score = int(record["mood_score"])
+            if not 1 <= score <= 10:
+                raise ValueError("mood_score must be between 1 and 10")
+            return kind, (record["date"], ts, to_day_number(when.date()), score, record.get("notes") or "")
+        if kind == "journal":
+            content = record.get("content") or ""
+            if not content:
+                raise ValueError("journal content is empty")
+            return kind, (record["date"], ts, to_day_number(when.date()), content)
+        raise ValueError("type must be 'mood' or 'journal'")
+    except (KeyError, TypeError, ValueError) as err:
+        raise HTTPException(status_code=400, detail=f"Line {line}: invalid record ({err}).")
+
+def iter_transfer_records(stream, fmt: str):
+    """Yields (line number, record) from an uploaded NDJSON or CSV file, reading it line by line."""
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    try:
+        if fmt == "csv":
+            reader = csv.DictReader(text)
+            for record in reader:
+                yield reader.line_num, record
+        else:
+            for line_number, line in enumerate(text, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    raise HTTPException(status_code=400, detail=f"Line {line_number}: not valid JSON.")
+                if not isinstance(record, dict):
+                    raise HTTPException(status_code=400, detail=f"Line {line_number}: expected a JSON object.")
+                yield line_number, record
+    except (UnicodeDecodeError, csv.Error) as err:
+        raise HTTPException(status_code=400, detail=f"Could not read the upload ({err}).")
+    finally:
+        # Hand the file back open; the route owns and closes it.
+        text.detach()
+
+def import_user_data(user_id: int, stream, fmt: str, nbytes: int) -> dict:
+    """Imports an uploaded file in TRANSFER_CHUNK_SIZE transactions. Runs on a database worker thread."""
+    started = time.perf_counter()
+    # Validate the whole file first so a bad line near the end does not leave half an import behind.
+    for line, record in iter_transfer_records(stream, fmt):
+        parse_transfer_record(record, line)
+    stream.seek(0)
+
+    moods, journals = [], []
+    counts = {"mood": 0, "journal": 0}
+    for line, record in iter_transfer_records(stream, fmt):
+        kind, row = parse_transfer_record(record, line)
+        (moods if kind == "mood" else journals).append(row)
+        counts[kind] += 1
+        if len(moods) + len(journals) >= TRANSFER_CHUNK_SIZE:
+            DatabaseManager.import_entries(user_id, moods, journals)
+            moods, journals = [], []
+    if moods or journals:
+        DatabaseManager.import_entries(user_id, moods, journals)
+    throughput = transfer_stats.record("import", counts["mood"] + counts["journal"], nbytes, time.perf_counter() - started)
+    return {"moods": counts["mood"], "journals": counts["journal"], **throughput}
+
+def local_tip() -> dict:
+    # Indexed by date so the fallback tip stays the same for the whole day.
+    quote, author = LOCAL_QUOTES[date.today().toordinal() % len(LOCAL_QUOTES)]
+    return {"quote": quote, "author": author, "source": "local"}
+
+def next_midnight_timestamp() -> float:
+    return datetime.combine(date.today() + timedelta(days=1), datetime.min.time()).timestamp()
+
+class WellnessTipService:
+    """Caches the upstream quote of the day until midnight and refreshes it off the request path.
+
+    Requests never wait on upstream: they get the cached tip (even if stale) or a bundled one,
+    while a background task keeps the cache warm. After repeated failures a circuit breaker
+    stops calling upstream for a cooldown period.
+    """
+
+    def __init__(self, url: str, timeout: float, failure_threshold: int, cooldown: float, retry_interval: float):
+        self.url = url
+        self.timeout = timeout
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.retry_interval = retry_interval
+        self._tip = None
+        self._expires_at = 0.0
+        self._refresh_task = None
+        self._background_task = None
+        self._client = None
+        self.failures = 0
+        self._opened_at = None
+
+    def get(self) -> dict:
+        refreshing = self._refresh_task is not None and not self._refresh_task.done()
+        if time.time() >= self._expires_at and not refreshing and not self._breaker_open():
+            # Stale-while-revalidate: answer now, refresh in the background.
+            self._refresh_task = asyncio.get_running_loop().create_task(self.refresh())
+        return self._tip or local_tip()
+
+    def _breaker_open(self) -> bool:
+        return self._opened_at is not None and time.monotonic() - self._opened_at < self.cooldown
+
+    async def refresh(self) -> bool:
+        if self._breaker_open():
+            return False
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        try:
+            response = await self._client.get(self.url)
+            response.raise_for_status()
+            data = response.json()[0]
+            tip = {"quote": data['q'], "author": data['a'], "source": "zenquotes"}
+        except (httpx.HTTPError, ValueError, KeyError, IndexError, TypeError):
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                # Open (or re-open, after a failed half-open attempt) the breaker.
+                self._opened_at = time.monotonic()
+            return False
+        self._tip = tip
+        self._expires_at = next_midnight_timestamp()
+        self.failures = 0
+        self._opened_at = None
+        return True
+
+    async def _run(self):
+        while True:
+            if time.time() >= self._expires_at:
+                await self.refresh()
+            wait = self._expires_at - time.time()
+            await asyncio.sleep(wait if wait > 0 else self.retry_interval)
+
+    async def start(self):
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        if self._background_task is None:
+            self._background_task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        for task in (self._background_task, self._refresh_task):
+            if task is not None and not task.done():
+                task.cancel()
+                with suppress(asyncio.CancelledError):
+                    await task
+        self._background_task = self._refresh_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+tip_service = WellnessTipService(QUOTE_URL, QUOTE_TIMEOUT, QUOTE_FAILURE_THRESHOLD,
+                                 QUOTE_BREAKER_COOLDOWN, QUOTE_RETRY_INTERVAL)
+
+# --- PASSWORD HASHING (PasswordHasher) ---
+class HasherBusy(Exception):
+    pass
+
+class PasswordHasher:
+    """scrypt password hashes, computed on a dedicated thread pool with a capped queue.
+
+    hashlib.scrypt releases the GIL, so hashes run beside the event loop and the database workers; the
+    worker count caps how much CPU logins can take, and past `max_pending` queued calls new ones get
+    HasherBusy. Stored hashes look like `scrypt$N$r$p$salt$hash` (base64 parts). Bare 64-digit hex values
+    are unsalted SHA-256 hashes from before; they still verify and are replaced on the next login.
+    """
+
+    def __init__(self, n: int, r: int, p: int, workers: int, max_pending: int):
+        self.n, self.r, self.p = n, r, p
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="vibecheck-hash")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.workers = workers
+        self.hashes = 0
+        self.hash_seconds = 0.0
+        self.rejected = 0
+
+    def _scrypt(self, password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+        started = time.perf_counter()
+        digest = hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p, maxmem=256 * n * r, dklen=32)
+        with self._lock:
+            self.hashes += 1
+            self.hash_seconds += time.perf_counter() - started
+        return digest
+
+    def hash(self, password: str) -> str:
+        salt = os.urandom(16)
+        digest = self._scrypt(password, salt, self.n, self.r, self.p)
+        return (f"scrypt${self.n}${self.r}${self.p}$"
+                f"{base64.b64encode(salt).decode()}${base64.b64encode(digest).decode()}")
+
+    def verify(self, password: str, stored: str) -> bool:
+        """Whether the password matches; a stored hash that cannot be parsed matches nothing."""
+        try:
+            if not stored.startswith("scrypt$"):
+                return hmac.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored)
+            _, n, r, p, salt, digest = stored.split("$")
+            computed = self._scrypt(password, base64.b64decode(salt, validate=True), int(n), int(r), int(p))
+            return hmac.compare_digest(computed, base64.b64decode(digest, validate=True))
+        except (ValueError, TypeError, OverflowError) as err:
+            # A corrupt or truncated row; refuse the login rather than fail the request with a 500.
+            logger.error("Refusing a malformed stored password hash (%s: %s)", type(err).__name__, err)
+            return False
+
+    def needs_rehash(self, stored: str) -> bool:
+        return not stored.startswith(f"scrypt${self.n}${self.r}${self.p}$")
+
+    async def call(self, method, *args):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.rejected += 1
+                raise HasherBusy()
+            self._pending += 1
+        try:
+            return await asyncio.wrap_future(self._executor.submit(method, *args))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "hashes": self.hashes,
+                "avg_hash_ms": round(self.hash_seconds / self.hashes * 1000, 2) if self.hashes else 0,
+                "rejected": self.rejected,
+            }
+
+password_hasher = PasswordHasher(PASSWORD_SCRYPT_N, PASSWORD_SCRYPT_R, PASSWORD_SCRYPT_P,
+                                 PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_SIZE)
+
+@app.exception_handler(HasherBusy)
+async def hasher_busy_handler(request: Request, exc: HasherBusy):
+    return JSONResponse(status_code=503, content={"detail": "Too many sign-ins right now. Please try again shortly."},
+                        headers={"Retry-After": "1"})
+
+# --- LOGIN RATE LIMITING (TokenBucketLimiter) ---
+class TokenBucketLimiter:
+    """Per-key token buckets: a key may spend `capacity` attempts at once and regains `rate` per second.
+
+    Buckets live in an LRU capped at `max_keys`; a forgotten key simply starts again with a full bucket.
+    """
+
+    def __init__(self, capacity: int, rate: float, max_keys: int):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def acquire(self, key: str) -> float:
+        """Takes one token for `key`. Returns 0 if it was allowed, otherwise seconds until a token is free."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                self.allowed += 1
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                self.limited += 1
+                wait = (1 - tokens) / self.rate
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+            return wait
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"keys": len(self._buckets), "allowed": self.allowed, "limited": self.limited}
+
+login_user_limiter = TokenBucketLimiter(LOGIN_USER_BURST, LOGIN_USER_PER_MINUTE / 60, LOGIN_LIMITER_MAX_KEYS)
+login_ip_limiter = TokenBucketLimiter(LOGIN_IP_BURST, LOGIN_IP_PER_MINUTE / 60, LOGIN_LIMITER_MAX_KEYS)
+
+def check_auth_rate(request: Request, name: Optional[str] = None):
+    """Spends a token from the client's IP bucket and, if given, the username's; raises 429 when either is empty."""
+    checks = [(login_ip_limiter, request.client.host if request.client else "unknown")]
+    if name is not None:
+        checks.append((login_user_limiter, name.strip().lower()))
+    for limiter, key in checks:
+        wait = limiter.acquire(key)
+        if wait:
+            raise HTTPException(status_code=429, detail="Too many sign-in attempts. Please wait a moment and try again.",
+                                headers={"Retry-After": str(math.ceil(wait))})
+
+# --- SESSIONS (SessionManager) ---
+class SessionManager:
+    """Signed bearer tokens for rows of the sessions table, resolved through an LRU/TTL cache.
+
+    A token is `<session id>.<HMAC-SHA256 of the id>`, so a forged or mangled token is refused without any
+    lookup. A correctly signed one is resolved to its user from the cache; a miss reads the sessions row
+    (or its absence) and keeps the answer for `cache_ttl` seconds. Logging out drops the cache entry here
+    at once; another server process notices within `cache_ttl`.
+    """
+
+    def __init__(self, secret: bytes, ttl: float, cache_size: int, cache_ttl: float):
+        self._secret = secret
+        self.ttl = ttl
+        self.cache_size = cache_size
+        self.cache_ttl = cache_ttl
+        # session_id -> (user_id or None if unknown/revoked, session expiry, cache expiry)
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _signature(self, session_id: str) -> str:
+        digest = hmac.new(self._secret, session_id.encode(), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+
+    def issue(self, user_id: int) -> tuple:
+        """Creates a session; returns (token, expiry as epoch seconds)."""
+        session_id = secrets.token_urlsafe(24)
+        now = int(time.time())
+        expires_at = now + int(self.ttl)
+        DatabaseManager.create_session(session_id, user_id, now, expires_at)
+        return f"{session_id}.{self._signature(session_id)}", expires_at
+
+    def session_id(self, token: str) -> Optional[str]:
+        """The session id inside a token, or None if its signature does not match."""
+        session_id, _, signature = token.partition(".")
+        if session_id and hmac.compare_digest(signature, self._signature(session_id)):
+            return session_id
+        return None
+
+    def cached(self, session_id: str) -> tuple:
+        """(True, user_id or None) if the cache has a fresh answer for the session, else (False, None)."""
+        now = time.time()
+        with self._lock:
+            entry = self._cache.get(session_id)
+            if entry is not None and entry[2] > now:
+                self._cache.move_to_end(session_id)
+                self.hits += 1
+                return True, entry[0] if entry[1] > now else None
+            self.misses += 1
+            return False, None
+
+    def load(self, session_id: str) -> Optional[int]:
+        """Reads the session from the database and caches the answer; None if it is unknown or expired."""
+        row = DatabaseManager.get_session(session_id)
+        now = time.time()
+        user_id, expires_at = (row['user_id'], row['expires_at']) if row else (None, 0)
+        with self._lock:
+            self._cache[session_id] = (user_id, expires_at, now + self.cache_ttl)
+            self._cache.move_to_end(session_id)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return user_id if expires_at > now else None
+
+    def chart_signature(self, user_id: int, expires: int) -> str:
+        """Signs a chart URL for one user; unlike a session token it is only good until `expires`."""
+        return self._signature(f"chart:{user_id}:{expires}")
+
+    def revoke(self, session_id: str):
+        DatabaseManager.delete_session(session_id)
+        with self._lock:
+            self._cache.pop(session_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"cached": len(self._cache), "max_cached": self.cache_size, "hits": self.hits, "misses": self.misses}
+
+def load_session_secret() -> bytes:
+    if SESSION_SECRET:
+        return SESSION_SECRET.encode()
+    try:
+        # O_EXCL: when several workers start together, exactly one creates the key and the rest read it.
+        fd = os.open(SESSION_SECRET_PATH, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    except FileExistsError:
+        with open(SESSION_SECRET_PATH, "rb") as f:
+            return f.read()
+    secret = secrets.token_bytes(32)
+    with os.fdopen(fd, "wb") as f:
+        f.write(secret)
+    return secret
+
+sessions = SessionManager(load_session_secret(), SESSION_TTL_DAYS * 86400, SESSION_CACHE_SIZE, SESSION_CACHE_TTL)
+
+# --- Authorization Dependencies ---
+def bearer_token(request: Request) -> Optional[str]:
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    return token.strip() if scheme.lower() == "bearer" and token.strip() else None
+
+async def authenticate(token: Optional[str]) -> int:
+    """The user a token belongs to. Cached sessions are answered without leaving the event loop."""
+    session_id = sessions.session_id(token) if token else None
+    user_id = None
+    if session_id is not None:
+        found, user_id = sessions.cached(session_id)
+        if not found:
+            user_id = await async_db.call(sessions.load, session_id)
+    if user_id is None:
+        raise HTTPException(status_code=401, detail="Your session has expired. Please log in again.",
+                            headers={"WWW-Authenticate": "Bearer"})
+    return user_id
+
+async def session_user(request: Request) -> int:
+    return await authenticate(bearer_token(request))
+
+def require_owner(user_id: int, session_user_id: int):
+    if user_id != session_user_id:
+        raise HTTPException(status_code=403, detail="You can only access your own entries.")
+
+async def path_owner(user_id: int, session_user_id: int = Depends(session_user)):
+    """Route dependency: the {user_id} in the path must be the signed-in user."""
+    require_owner(user_id, session_user_id)
+
+async def admin_only(request: Request):
+    """Route dependency: diagnostics need the VIBECHECK_ADMIN_TOKEN, not a user's session."""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Diagnostics are disabled. Set VIBECHECK_ADMIN_TOKEN to enable them.")
+    token = bearer_token(request)
+    if token is None or not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Diagnostics need the admin token.",
+                            headers={"WWW-Authenticate": "Bearer"})
+
+async def chart_owner(user_id: int, request: Request, expires: Optional[int] = None, sig: Optional[str] = None):
+    # Image widgets cannot send headers, so the chart PNG also accepts a signature from /mood-chart-access.
+    if expires is not None and sig and expires > time.time():
+        if hmac.compare_digest(sig, sessions.chart_signature(user_id, expires)):
+            return
+    require_owner(user_id, await authenticate(bearer_token(request)))
+
 # --- Pydantic Models ---
 class UserAuthInput(BaseModel):
     name: str
@@ -153,144 +1908,360 @@ class JournalInput(BaseModel):
     content: str
 class MoodCheckResponse(BaseModel):
     has_enough_data: bool
+    chart_version: Optional[str] = None
+class BatchMoodEntry(BaseModel):
+    type: Literal["mood"]
+    client_key: str = Field(min_length=1, max_length=64)
+    timestamp: datetime
+    mood_score: int = Field(ge=1, le=10)
+    notes: Optional[str] = ""
+class BatchJournalEntry(BaseModel):
+    type: Literal["journal"]
+    client_key: str = Field(min_length=1, max_length=64)
+    timestamp: datetime
+    content: str = Field(min_length=1)
+class BatchInput(BaseModel):
+    user_id: int
+    entries: List[Annotated[Union[BatchMoodEntry, BatchJournalEntry], Field(discriminator="type")]] = Field(max_length=BATCH_MAX_ENTRIES)
 
 # --- API ROUTES ---
 @app.post("/api/register", tags=["Authentication"])
-def register_user(user_input: UserAuthInput):
-    new_user = DatabaseManager.create_user(user_input.name, user_input.password)
+async def register_user(user_input: UserAuthInput, request: Request):
+    check_auth_rate(request)
+    password_hash = await password_hasher.call(password_hasher.hash, user_input.password)
+    new_user = await async_db.create_user(user_input.name, password_hash)
     if new_user:
         return {"message": "User created successfully", "user": new_user}
     raise HTTPException(status_code=409, detail="An account with this username already exists.")
 
 @app.post("/api/login", tags=["Authentication"])
-def login_user(user_input: UserAuthInput):
-    user = DatabaseManager.get_user_by_name(user_input.name)
+async def login_user(user_input: UserAuthInput, request: Request):
+    check_auth_rate(request, user_input.name)
+    user = await async_db.get_user_by_name(user_input.name)
     if not user:
         raise HTTPException(status_code=404, detail="No account found with that username.")
-    password_hash = hashlib.sha256(user_input.password.encode()).hexdigest()
-    if password_hash == user['password_hash']:
-        return {"message": "Login successful", "user_id": user['user_id'], "name": user['name']}
-    raise HTTPException(status_code=401, detail="Incorrect password. Please try again.")
+    if not await password_hasher.call(password_hasher.verify, user_input.password, user['password_hash']):
+        raise HTTPException(status_code=401, detail="Incorrect password. Please try again.")
+    if password_hasher.needs_rehash(user['password_hash']):
+        # Legacy SHA-256 (or older scrypt cost) rows are upgraded now that the plain password is at hand.
+        new_hash = await password_hasher.call(password_hasher.hash, user_input.password)
+        await async_db.update_password_hash(user['user_id'], new_hash)
+    token, expires_at = await async_db.call(sessions.issue, user['user_id'])
+    return {"message": "Login successful", "user_id": user['user_id'], "name": user['name'],
+            "token": token, "expires_at": expires_at}
+
+@app.post("/api/logout", tags=["Authentication"])
+async def logout_user(request: Request):
+    token = bearer_token(request)
+    session_id = sessions.session_id(token) if token else None
+    if session_id is not None:
+        await async_db.call(sessions.revoke, session_id)
+    return {"message": "Logged out"}
     
 @app.post("/api/mood-entry", tags=["Mood Tracking"])
-def add_mood(entry: MoodInput):
-    DatabaseManager.add_mood_entry(entry.user_id, entry.mood_score, entry.notes)
+async def add_mood(entry: MoodInput, session_user_id: int = Depends(session_user)):
+    require_owner(entry.user_id, session_user_id)
+    if DatabaseManager.writer is not None:
+        # Wait for the group commit here rather than parking a database worker thread on it.
+        row = DatabaseManager.mood_entry_row(entry.user_id, entry.mood_score, entry.notes)
+        await asyncio.wrap_future(DatabaseManager.writer.submit(row))
+    else:
+        row = await async_db.add_mood_entry(entry.user_id, entry.mood_score, entry.notes)
+    await user_data_changed(entry.user_id)
+    await publish_entries(entry.user_id, moods=[{"date": row[3], "mood_score": row[1], "notes": row[2], "client_key": None}])
     return {"message": "Mood entry added successfully"}
 
 @app.post("/api/journal-entry", tags=["Journaling"])
-def add_journal(entry: JournalInput):
-    DatabaseManager.add_journal_entry(entry.user_id, entry.content)
+async def add_journal(entry: JournalInput, session_user_id: int = Depends(session_user)):
+    require_owner(entry.user_id, session_user_id)
+    journal = await async_db.add_journal_entry(entry.user_id, entry.content)
+    await user_data_changed(entry.user_id)
+    await publish_entries(entry.user_id, journals=[journal])
     return {"message": "Journal entry added successfully"}
 
-@app.get("/api/activity-dates/{user_id}", tags=["Journaling"])
-def get_activity_dates(user_id: int):
-    dates = DatabaseManager.get_activity_dates(user_id)
-    return {"dates": dates}
+def parse_month(value: str, name: str) -> date:
+    """Parses a 'YYYY-MM' query value into the first day of that month."""
+    try:
+        return datetime.strptime(value, "%Y-%m").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"'{name}' must be a month in YYYY-MM format.")
+
+@app.post("/api/entries/batch", tags=["Sync"])
+async def add_entries_batch(batch: BatchInput, session_user_id: int = Depends(session_user)):
+    require_owner(batch.user_id, session_user_id)
+    moods, journals = [], []
+    for entry in batch.entries:
+        # Entries keep the client's wall-clock time; offsets are folded into server-local time like every other row.
+        when = entry.timestamp.astimezone().replace(tzinfo=None) if entry.timestamp.tzinfo else entry.timestamp
+        ts, day = int(when.timestamp()), to_day_number(when.date())
+        if entry.type == "mood":
+            moods.append((entry.client_key, when.isoformat(), ts, day, entry.mood_score, entry.notes or ""))
+        else:
+            journals.append((entry.client_key, when.date().isoformat(), ts, day, entry.content))
+    stored, duplicates = await async_db.add_entries_batch(batch.user_id, moods, journals)
+    if stored:
+        await user_data_changed(batch.user_id)
+        if event_broker.listening(batch.user_id):
+            # Other devices of the user see the synced entries without refetching; journal ids come from the database.
+            stored_keys = set(stored)
+            new_moods = [{"date": when, "mood_score": score, "notes": notes, "client_key": key}
+                         for key, when, _, _, score, notes in moods if key in stored_keys]
+            new_journals = await async_db.get_journal_entries_by_keys(
+                batch.user_id, [row[0] for row in journals if row[0] in stored_keys])
+            await publish_entries(batch.user_id, new_moods, new_journals)
+    # Duplicates were stored by an earlier attempt, so the client can treat them as synced too.
+    return {"stored": stored, "duplicates": duplicates}
+
+@app.get("/api/activity-dates/{user_id}", tags=["Journaling"], dependencies=[Depends(path_owner)])
+@cached_response("activity-dates")
+async def get_activity_dates(user_id: int,
+                             start: Optional[str] = Query(None, alias="from"),
+                             end: Optional[str] = Query(None, alias="to")):
+    # Months are inclusive; leaving a bound out keeps the old behaviour of returning the whole history.
+    first_day = parse_month(start, "from") if start else date.min
+    last_month = parse_month(end, "to") if end else date.max.replace(day=1)
+    if first_day > last_month:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    last_day = last_month.replace(day=calendar.monthrange(last_month.year, last_month.month)[1])
+    dates = await async_db.get_activity_dates(user_id, to_day_number(first_day), to_day_number(last_day))
+    return {"from": start, "to": end, "dates": dates}
+
+def parse_journal_cursor(cursor: str) -> tuple:
+    """Parses a 'day:id' cursor from a previous /journals page."""
+    try:
+        day, entry_id = cursor.split(":")
+        return int(day), int(entry_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+@app.get("/api/journals/{user_id}", tags=["Journaling"], dependencies=[Depends(path_owner)])
+@cached_response("journals")
+async def get_journals(user_id: int, cursor: Optional[str] = None,
+                       limit: int = Query(JOURNAL_PAGE_SIZE, ge=1, le=JOURNAL_PAGE_MAX)):
+    before = parse_journal_cursor(cursor) if cursor else None
+    # One extra row tells us whether another page exists without a COUNT query.
+    rows = await async_db.get_journal_page(user_id, limit + 1, before)
+    page, has_more = rows[:limit], len(rows) > limit
+    next_cursor = f"{page[-1]['day']}:{page[-1]['id']}" if has_more else None
+    entries = [{"id": row["id"], "date": row["date"], "content": row["content"], "client_key": row["client_key"]} for row in page]
+    return {"entries": entries, "next_cursor": next_cursor}
 
-@app.get("/api/journals/{user_id}", tags=["Journaling"])
-def get_journals(user_id: int):
-    return DatabaseManager.get_all_journal_entries(user_id)
+def fts_match_query(text: str) -> Optional[str]:
+    """Turns free text into an FTS5 query: every word must match, and the last one may be a prefix."""
+    # Quoting each word means punctuation and FTS5 operators in user input can never cause a syntax error.
+    words = re.findall(r"\w+", text)
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+@app.get("/api/journals/{user_id}/search", tags=["Journaling"], dependencies=[Depends(path_owner)])
+async def search_journals(user_id: int, q: str = Query(..., max_length=200), cursor: Optional[str] = None,
+                          limit: int = Query(JOURNAL_PAGE_SIZE, ge=1, le=JOURNAL_PAGE_MAX)):
+    terms = fts_match_query(q)
+    if terms is None:
+        return {"entries": [], "next_cursor": None}
+    # Results are ordered by relevance rather than by a unique key, so the cursor is a plain offset.
+    try:
+        offset = int(cursor) if cursor else 0
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    rows = await async_db.search_journal_entries(user_id, terms, limit + 1, max(offset, 0))
+    next_cursor = str(offset + limit) if len(rows) > limit else None
+    return {"entries": rows[:limit], "next_cursor": next_cursor}
 
 @app.delete("/api/journal/{entry_id}", tags=["Journaling"])
-def delete_journal(entry_id: int):
-    DatabaseManager.delete_journal_entry(entry_id)
+async def delete_journal(entry_id: int, session_user_id: int = Depends(session_user)):
+    day = await async_db.delete_journal_entry(entry_id, session_user_id)
+    if day is None:
+        raise HTTPException(status_code=404, detail="Journal entry not found.")
+    await user_data_changed(session_user_id)
+    if event_broker.listening(session_user_id):
+        # "active" says whether the calendar should still mark the day.
+        still_active = bool(await async_db.get_activity_dates(session_user_id, day, day))
+        event_broker.publish(session_user_id, [{"type": "journal-deleted", "id": entry_id,
+                                                "date": from_day_number(day).isoformat(), "active": still_active}])
     return {"message": "Journal entry deleted successfully"}
 
+@app.get("/api/export/{user_id}", tags=["Data Transfer"], dependencies=[Depends(path_owner)])
+async def export_data(user_id: int, fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")):
+    headers = {"Content-Disposition": f'attachment; filename="vibecheck-{user_id}.{fmt}"'}
+    return StreamingResponse(export_user_data(user_id, fmt), media_type=TRANSFER_MEDIA_TYPES[fmt], headers=headers)
+
+@app.post("/api/import/{user_id}", tags=["Data Transfer"], dependencies=[Depends(path_owner)])
+async def import_data(user_id: int, request: Request,
+                      fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$")):
+    with tempfile.SpooledTemporaryFile(max_size=IMPORT_SPOOL_SIZE) as upload:
+        size = 0
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > IMPORT_MAX_BYTES:
+                raise HTTPException(status_code=413, detail="The import file is too large.")
+            upload.write(chunk)
+        upload.seek(0)
+        try:
+            return await async_db.call(import_user_data, user_id, upload, fmt, size)
+        finally:
+            # Chunks committed before a failure are kept, so the user's figures may have changed either way.
+            await user_data_changed(user_id)
+            # Too many changes to send one by one; open clients refetch instead.
+            if event_broker.listening(user_id):
+                event_broker.publish(user_id, [{"type": "resync"}])
+
+@app.get("/api/events/{user_id}", tags=["Live Updates"], dependencies=[Depends(path_owner)])
+async def get_events(user_id: int, request: Request, last_event_id: Optional[str] = Header(None)):
+    # Refused streams get their 503/429 here; the stream itself subscribes once the response starts.
+    event_broker.admit(user_id)
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    return StreamingResponse(event_stream(user_id, bearer_token(request), request, last_event_id),
+                             media_type="text/event-stream", headers=headers)
+
+@app.get("/api/pool-stats", tags=["Diagnostics"], dependencies=[Depends(admin_only)])
+async def get_pool_stats():
+    writer = DatabaseManager.writer
+    return {**DatabaseManager.pool.stats(), "executor": async_db.stats(),
+            "group_commit": writer.stats() if writer is not None else None}
+
+@app.get("/api/chart-cache-stats", tags=["Diagnostics"], dependencies=[Depends(admin_only)])
+async def get_chart_cache_stats():
+    return {**chart_cache.stats(), "renderer": chart_renderer.stats()}
+
+@app.get("/api/transfer-stats", tags=["Diagnostics"], dependencies=[Depends(admin_only)])
+async def get_transfer_stats():
+    return transfer_stats.stats()
+
+@app.get("/api/analytics-stats", tags=["Diagnostics"], dependencies=[Depends(admin_only)])
+async def get_analytics_stats():
+    return {**analytics.stats(), "cohort": analytics.cohort(today_number()), "insights": insight_engine.stats()}
+
+@app.get("/api/response-cache-stats", tags=["Diagnostics"], dependencies=[Depends(admin_only)])
+async def get_response_cache_stats():
+    return response_cache.stats() if response_cache is not None else {"backend": None}
+
+@app.get("/api/event-stats", tags=["Diagnostics"], dependencies=[Depends(admin_only)])
+async def get_event_stats():
+    return event_broker.stats()
+
+@app.get("/api/auth-stats", tags=["Diagnostics"], dependencies=[Depends(admin_only)])
+async def get_auth_stats():
+    return {"hasher": password_hasher.stats(), "user_limiter": login_user_limiter.stats(),
+            "ip_limiter": login_ip_limiter.stats(), "sessions": sessions.stats()}
+
 @app.get("/api/wellness-tip", tags=["Insights"])
-def get_wellness_tip():
-    try:
-        response = requests.get("https://zenquotes.io/api/today")
-        response.raise_for_status()
-        data = response.json()[0]
-        return {"quote": data['q'], "author": data['a']}
-    except requests.exceptions.RequestException:
-        return {"quote": "Could not fetch a tip. Check your internet connection.", "author": "VibeCheck"}
-
-@app.get("/api/recommendation/{user_id}", tags=["Insights"])
-def get_recommendation(user_id: int):
-    # Expanded lists of hard-coded, randomized responses
-    positive_insights = [
-        "Your recent mood has been consistently positive. Keep up the great work!", "Seeing lots of positive moods from you lately. Whatever you're doing, it's working!", "It looks like you've been having a great week. Keep embracing that positive energy.", "Your mood log is shining brightly! Thanks for sharing your positive moments.", "A consistent high mood is a great sign of well-being. Keep riding that wave!", "Fantastic! Your recent entries show a very positive trend. Keep it up.", "It's wonderful to see such positive check-ins. You're doing great.", "Your mood trend is pointing straight up! We love to see it.", "You've been in a great headspace recently. Remember what this feels like.", "The data shows a happy and healthy mindset. Keep building on this momentum.", "Keep doing what you're doing! The positivity is clear from your entries.", "Your consistent positive mood is an achievement worth celebrating.", "It's great to see you thriving. Your mood log reflects a period of well-being.", "Your mood entries are overwhelmingly positive. That's a wonderful sign.", "The trend is clear: you've been feeling great. Keep that positive momentum going!"
-    ]
-    neutral_insights = [
-        "Your mood has been fluctuating. Remember to take time for self-care activities.", "Some good days, some not-so-good days. That's a normal part of life's rhythm.", "It seems like a mix of ups and downs recently. A consistent routine can sometimes help stabilize mood.", "Your mood seems balanced but with some variations. Check in with yourself and see what you need today.", "A mixed bag of moods is common. What's one small thing you can do for yourself today?", "Your log shows a blend of different feelings. Remember that all your emotions are valid.", "Navigating both highs and lows is part of the journey. Be patient with yourself.", "It looks like an average week. Consider scheduling a small activity you enjoy to give yourself a boost.", "Your mood is steady but has room for a lift. How about some fresh air or your favorite music?", "A neutral trend can be a good time for reflection. What's one thing that could make tomorrow brighter?", "The data shows a mix of moods. It's okay to have days where you just feel 'okay'.", "Your mood has been steady. Acknowledging these neutral moments is as important as the highs and lows.", "This period of balance could be a good time to build some new, healthy habits.", "Your log shows a stable, neutral trend. This can be a sign of resilience.", "It's okay to just be. Your mood entries show a period of calm and balance."
-    ]
-    negative_insights = [
-        "It seems you've had a tough few days. Consider talking to a friend or engaging in a relaxing hobby.", "Your mood has been trending lower recently. Remember that it's okay not to be okay. Prioritize rest.", "Seeing a pattern of lower moods. A short walk outside can sometimes make a surprising difference.", "It looks like things have been challenging lately. Please be extra kind to yourself.", "Remember that tough times don't last forever. Your favorite comfort movie or a warm drink might help.", "Your recent entries suggest you're going through a rough patch. Your feelings are valid; let yourself feel them.", "When your mood is low, small comforts can help. Consider listening to some calming music or a podcast.", "It's brave of you to keep logging even on difficult days. Acknowledging your feelings is a huge first step.", "It looks like you could use a break. Is there something simple you can do to de-stress, even for 5 minutes?", "Seeing this pattern is a sign to check in with yourself. Remember the support resources in the app if you need them.", "Be gentle with yourself. Storms don't last forever.", "It's okay to feel this way. Acknowledging difficult emotions is a sign of strength.", "This seems like a difficult period. Make sure you're getting enough rest and being kind to your body and mind.", "Remember that even a small step is still a step forward. Don't pressure yourself too much right now.", "Your log shows you're navigating some tough feelings. Reaching out to someone you trust can often lighten the load."
-    ]
-
-    # Logic to select and return an insight
-    mood_entries = DatabaseManager.get_mood_entries(user_id, limit_days=7)
-    
-    if len(mood_entries) < 3:
-        return {"recommendation": "Keep logging your mood for a few more days to unlock personalized insights!"}
+async def get_wellness_tip():
+    return tip_service.get()
 
-    scores = [entry['mood_score'] for entry in mood_entries]
-    avg_score = np.mean(scores)
+@app.get("/api/recommendation/{user_id}", tags=["Insights"], dependencies=[Depends(path_owner)])
+@cached_response("recommendation", per_process=True)
+async def get_recommendation(user_id: int):
+    return await async_db.call(insight_engine.recommend, user_id, today_number())
 
-    # Determine the mood category and select a random message
-    if avg_score >= 7:
-        suggestion = random.choice(positive_insights)
-    elif avg_score >= 4:
-        suggestion = random.choice(neutral_insights)
-    else:
-        suggestion = random.choice(negative_insights)
-        
-    return {"recommendation": suggestion}
+@app.get("/api/analytics/{user_id}", tags=["Insights"], dependencies=[Depends(path_owner)])
+async def get_analytics(user_id: int):
+    summary = await async_db.call(analytics.summary, user_id, today_number())
+    if summary is None:
+        raise HTTPException(status_code=404, detail="No mood data yet.")
+    return summary
 
-@app.get("/api/today-moods/{user_id}", tags=["Visualizations"])
-def get_today_moods(user_id: int):
-    return DatabaseManager.get_mood_entries_for_today(user_id)
+@app.get("/api/today-moods/{user_id}", tags=["Visualizations"], dependencies=[Depends(path_owner)])
+@cached_response("today-moods")
+async def get_today_moods(user_id: int):
+    return await async_db.get_mood_entries_for_today(user_id)
 
-@app.get("/api/mood-data-check/{user_id}", response_model=MoodCheckResponse, tags=["Visualizations"])
-def check_mood_data(user_id: int, timespan: str):
+@app.get("/api/mood-series/{user_id}", tags=["Visualizations"], dependencies=[Depends(path_owner)])
+@cached_response("mood-series")
+async def get_mood_series(user_id: int,
+                          start: Optional[date] = Query(None, alias="from"),
+                          end: Optional[date] = Query(None, alias="to"),
+                          bucket: str = Query("day", pattern="^(day|week|month)$")):
+    end = end or datetime.now().date()
+    start = start or end - timedelta(days=30)
+    if start > end:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'.")
+    rows = await async_db.get_mood_series(user_id, to_day_number(start), to_day_number(end), bucket)
+    # Columnar arrays keep the payload small: one list per field instead of one object per point.
+    payload = {
+        "bucket": bucket,
+        "from": start.isoformat(),
+        "to": end.isoformat(),
+        "dates": [from_day_number(row['bucket']).isoformat() for row in rows],
+        "mean": [round(row['sum'] / row['count'], 2) for row in rows],
+        "count": [row['count'] for row in rows],
+    }
+    return payload
+
+@app.get("/api/mood-data-check/{user_id}", response_model=MoodCheckResponse, tags=["Visualizations"],
+         dependencies=[Depends(path_owner)])
+@cached_response("mood-data-check", per_process=True)
+async def check_mood_data(user_id: int, timespan: str):
     MINIMUM_DISTINCT_DAYS = 2
     if timespan not in ["7d", "30d"]:
         return {"has_enough_data": False}
     limit = 7 if timespan == "7d" else 30
-    mood_entries = DatabaseManager.get_mood_entries(user_id, limit_days=limit)
-    if len(mood_entries) < MINIMUM_DISTINCT_DAYS:
-        return {"has_enough_data": False}
-    df = pd.DataFrame(mood_entries)
-    df['date'] = pd.to_datetime(df['date'])
-    distinct_days = df['date'].dt.date.nunique()
-    has_enough = distinct_days >= MINIMUM_DISTINCT_DAYS
-    return {"has_enough_data": has_enough}
-
-@app.get("/api/mood-chart/{user_id}", tags=["Visualizations"])
-def get_mood_chart(user_id: int, timespan: str = "30d"):
+    daily_rows = await daily_mood_rows(user_id, limit_days=limit)
+    has_enough = len(daily_rows) >= MINIMUM_DISTINCT_DAYS
+    # The UI puts chart_version in the chart URL, so unchanged data maps to an unchanged URL.
+    version = chart_version(user_id, timespan, daily_rows) if has_enough else None
+    return {"has_enough_data": has_enough, "chart_version": version}
+
+@app.get("/api/mood-chart-access/{user_id}", tags=["Visualizations"], dependencies=[Depends(path_owner)])
+async def get_mood_chart_access(user_id: int):
+    # Expiry is rounded up to a window boundary, so chart URLs built within one window are identical.
+    expires = (int(time.time()) // CHART_URL_TTL + 2) * CHART_URL_TTL
+    return {"expires": expires, "sig": sessions.chart_signature(user_id, expires)}
+
+@app.get("/api/mood-chart/{user_id}", tags=["Visualizations"], dependencies=[Depends(chart_owner)])
+async def get_mood_chart(user_id: int, request: Request, timespan: str = "30d"):
     limit = 7 if timespan == "7d" else 30
-    mood_entries = DatabaseManager.get_mood_entries(user_id, limit_days=limit)
+    daily_rows = await daily_mood_rows(user_id, limit_days=limit)
     title = f"Your Daily Average Mood (Last {limit} Days)"
-    if not mood_entries:
+    if not daily_rows:
         raise HTTPException(status_code=404, detail="Not enough mood data for this period.")
-    df = pd.DataFrame(mood_entries)
-    df['date'] = pd.to_datetime(df['date'])
-    plot_df = df.groupby(df['date'].dt.date)['mood_score'].mean().reset_index()
-    plot_df['date'] = pd.to_datetime(plot_df['date'])
-    
-    fig, ax = plt.subplots(figsize=(12, 6))
-    
-    ax.plot(plot_df['date'], plot_df['mood_score'], marker='o', linestyle='-', color=PRIMARY_COLOR)
-    ax.set_title(title, fontsize=16, loc='center')
-    ax.set_ylabel("Mood")
-    ax.set_yticks([1, 3, 5, 7, 9])
-    ax.set_yticklabels(['😠 Angry', '😟 Sad', '😐 Neutral', '😊 Content', '😄 Happy'])
-    ax.set_ylim(0, 10)
-    ax.grid(True, linestyle='--', alpha=0.6, axis='y')
-    
-    ax.margins(x=0.05)
-    
-    ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d'))
-    if timespan == "7d":
-        ax.xaxis.set_major_locator(mdates.DayLocator(interval=1))
-    else:
-        ax.xaxis.set_major_locator(mdates.DayLocator(interval=3))
 
-    plt.setp(ax.get_xticklabels(), rotation=0, ha='center')
-    
-    plt.tight_layout()
-    chart_path = f"static/mood_chart_{user_id}.png"
-    plt.savefig(chart_path)
-    plt.close(fig)
-    return FileResponse(chart_path, media_type="image/png")
\ No newline at end of file
+    version = chart_version(user_id, timespan, daily_rows)
+    headers = {"ETag": f'"{version}"', "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == headers["ETag"]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    png = await asyncio.to_thread(chart_cache.get, version)
+    if png is None:
+        dates = [from_day_number(row['day']) for row in daily_rows]
+        averages = [row['sum'] / row['count'] for row in daily_rows]
+        try:
+            render = chart_renderer.submit(version, dates, averages, title, timespan)
+            # shield() keeps a timed-out waiter from cancelling a render other requests share.
+            png = await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(render)), CHART_RENDER_TIMEOUT)
+        except (RendererBusy, asyncio.TimeoutError):
+            raise HTTPException(status_code=503, detail="Charts are busy right now. Please try again shortly.",
+                                headers={"Retry-After": str(CHART_RENDER_RETRY_AFTER)})
+        except Exception:
+            # A crashed worker (BrokenProcessPool) or a failed render; the renderer has already replaced a broken pool.
+            logger.exception("Rendering chart %s failed", version)
+            raise HTTPException(status_code=503, detail="The chart could not be drawn. Please try again shortly.",
+                                headers={"Retry-After": str(CHART_RENDER_RETRY_AFTER)})
+        await asyncio.to_thread(chart_cache.put, version, png)
+    return Response(content=png, media_type="image/png", headers=headers)
+
+# --- Maintenance Commands ---
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="VibeCheck database maintenance.")
+    parser.add_argument("command", choices=["rebuild-rollup", "insight-digest"])
+    parser.add_argument("--output", help="insight-digest: NDJSON file to write (default: standard output)")
+    args = parser.parse_args()
+    if args.command == "rebuild-rollup":
+        print(f"Rebuilt daily_mood_rollup: {DatabaseManager.rebuild_mood_rollup()} rows.")
+    elif args.command == "insight-digest":
+        import sys
+        from collections import Counter
+
+        frame = MoodFrame.from_chunks(DatabaseManager.iter_mood_rollup())
+        categories = Counter()
+        with open(args.output, "w", encoding="utf-8") if args.output else nullcontext(sys.stdout) as out:
+            for row in InsightEngine.digest(frame, today_number()):
+                categories[row["category"]] += 1
+                out.write(json.dumps(row) + "\n")
+        summary = ", ".join(f"{name}: {count}" for name, count in categories.most_common())
+        print(f"Scored {len(frame.users)} users ({summary}).", file=sys.stderr)
@@ -0,0 +1,77 @@
+# bench_auth.py
+
+"""Login throughput and latency under a sign-in storm, and what the storm costs the mood endpoints.
+
+Part one turns the rate limiters off and varies VIBECHECK_PASSWORD_HASH_WORKERS: each run reports logins
+per second with p50/p99, next to the p99 of a steady trickle of mood writes by an already signed-in user.
+Part two keeps the default limiters and hammers one username from one address, reporting how many
+attempts got through and how many were answered 429.
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+
+from common import latency_summary, percentile, running_server, sign_in
+
+USERS = 20
+PASSWORD = "benchmark-pw"
+UNLIMITED = {"VIBECHECK_LOGIN_USER_BURST": "1000000", "VIBECHECK_LOGIN_IP_BURST": "1000000",
+             "VIBECHECK_PASSWORD_HASH_QUEUE_SIZE": "1000"}
+
+async def storm(base_url: str, concurrency: int, duration: float, names: list) -> tuple:
+    """Logs in as `names` from `concurrency` clients while probing mood writes; returns (logins, statuses, moods)."""
+    async with httpx.AsyncClient(base_url=base_url, timeout=60) as client:
+        prober_id, prober_headers = await sign_in(client, "prober", PASSWORD)
+        for name in set(names):
+            await client.post("/api/register", json={"name": name, "password": PASSWORD})
+        logins, moods, statuses = [], [], {}
+        stop = time.perf_counter() + duration
+
+        async def login_loop(k: int):
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                response = await client.post("/api/login", json={"name": names[k % len(names)], "password": PASSWORD})
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+                if response.status_code == 200:
+                    logins.append(time.perf_counter() - started)
+
+        async def mood_loop():
+            while time.perf_counter() < stop:
+                started = time.perf_counter()
+                await client.post("/api/mood-entry", headers=prober_headers,
+                                  json={"user_id": prober_id, "mood_score": 5, "notes": ""})
+                moods.append(time.perf_counter() - started)
+                await asyncio.sleep(0.05)
+
+        await asyncio.gather(mood_loop(), *[login_loop(k) for k in range(concurrency)])
+    return logins, statuses, sorted(moods)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[4, 16])
+    parser.add_argument("--duration", type=float, default=8.0, help="seconds per run")
+    parser.add_argument("--port", type=int, default=8792)
+    args = parser.parse_args()
+
+    names = [f"auth-{i}" for i in range(USERS)]
+    print("Rate limiters off:")
+    for workers in args.workers:
+        for concurrency in args.concurrency:
+            with running_server(args.port, {**UNLIMITED, "VIBECHECK_PASSWORD_HASH_WORKERS": str(workers)}) as server:
+                logins, statuses, moods = asyncio.run(storm(server.url, concurrency, args.duration, names))
+            print(f"  hash workers={workers:2d}  concurrency={concurrency:3d}  logins: {latency_summary(logins, args.duration)}"
+                  f"  | mood p99={percentile(moods, 0.99) * 1000:6.1f}ms  other statuses={statuses.keys() - {200} or '-'}")
+
+    print("Default rate limiters, one username from one address:")
+    concurrency = max(args.concurrency)
+    with running_server(args.port) as server:
+        logins, statuses, moods = asyncio.run(storm(server.url, concurrency, args.duration, names[:1]))
+    print(f"  concurrency={concurrency:3d}  statuses={dict(sorted(statuses.items()))}"
+          f"  | mood p50={percentile(moods, 0.5) * 1000:6.1f}ms p99={percentile(moods, 0.99) * 1000:6.1f}ms")
+
+if __name__ == "__main__":
+    main()
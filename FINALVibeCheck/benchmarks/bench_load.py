@@ -0,0 +1,68 @@
+# bench_load.py
+
+"""Mixed read/write load against a running backend: requests per second and p50/p99 latency.
+
+Each client picks one of 50 users and one of the per-user reads (calendar dates, today's moods,
+recommendation, mood series), the wellness tip, or a new mood entry. To compare against another
+version of the backend, check it out next to this one and pass both folders:
+
+    git worktree add ../vibecheck-old <commit>
+    python benchmarks/bench_load.py --app-dir . --app-dir ../vibecheck-old/FINALVibeCheck
+"""
+
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+
+from common import APP_DIR, latency_summary, running_server, sign_in
+
+USERS = 50
+# Signing in all the users at once would otherwise trip the per-address login limiter.
+SERVER_ENV = {"VIBECHECK_LOGIN_IP_BURST": "100000"}
+
+async def run_load(base_url: str, concurrency: int, duration: float) -> str:
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30) as client:
+        users = [await sign_in(client, f"load-{i}") for i in range(USERS)]
+        latencies = []
+        errors = 0
+        stop = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < stop:
+                user_id, headers = random.choice(users)
+                kind = random.choice(["activity-dates", "today-moods", "recommendation", "mood-series", "tip", "write"])
+                started = time.perf_counter()
+                if kind == "write":
+                    response = await client.post("/api/mood-entry", headers=headers,
+                                                 json={"user_id": user_id, "mood_score": random.randint(1, 10), "notes": ""})
+                elif kind == "tip":
+                    response = await client.get("/api/wellness-tip")
+                else:
+                    response = await client.get(f"/api/{kind}/{user_id}", headers=headers)
+                latencies.append(time.perf_counter() - started)
+                errors += response.status_code >= 400
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return f"{latency_summary(latencies, duration)}  errors={errors}"
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", action="append", help="folder holding back.py (repeatable; default: this one)")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[16, 64])
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds per run")
+    parser.add_argument("--port", type=int, default=8790)
+    args = parser.parse_args()
+
+    for app_dir in args.app_dir or [APP_DIR]:
+        for concurrency in args.concurrency:
+            with running_server(args.port, SERVER_ENV, app_dir) as server:
+                result = asyncio.run(run_load(server.url, concurrency, args.duration))
+            print(f"{app_dir}  concurrency={concurrency:3d}  {result}")
+
+if __name__ == "__main__":
+    main()
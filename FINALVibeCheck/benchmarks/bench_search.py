@@ -0,0 +1,94 @@
+# bench_search.py
+
+"""Journal search latency on a synthetic corpus, by query shape.
+
+Builds a scratch database of --entries journal entries spread over --users users (1M by default),
+inserting through the same path as /api/import so the FTS5 index is filled by its triggers, then times
+DatabaseManager.search_journal_entries for common, rare, prefix and multi-word queries.
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from common import APP_DIR, percentile
+
+VOCABULARY_SIZE = 20000
+CHUNK = 5000
+
+def synthetic_words(rng: random.Random) -> list:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = set()
+    while len(words) < VOCABULARY_SIZE:
+        words.add("".join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+def run(args):
+    import back
+    from back import DatabaseManager
+
+    rng = random.Random(7)
+    words = synthetic_words(rng)
+    # Zipf-like weights: a few words appear in most entries, most words in very few.
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+    per_user = args.entries // args.users
+    today = back.today_number()
+
+    started = time.perf_counter()
+    for user_id in range(1, args.users + 1):
+        for first in range(0, per_user, CHUNK):
+            journals = []
+            for i in range(first, min(first + CHUNK, per_user)):
+                day = today - i % 3650
+                content = " ".join(rng.choices(words, cum_weights=cum_weights, k=rng.randint(20, 60)))
+                journals.append((back.from_day_number(day).isoformat(), day * 86400, day, content))
+            DatabaseManager.import_entries(user_id, [], journals)
+    build_seconds = time.perf_counter() - started
+    total = per_user * args.users
+    size_mb = os.path.getsize(os.environ["VIBECHECK_DB_PATH"]) / 1e6
+    print(f"indexed {total} entries in {build_seconds:.1f}s ({total / build_seconds:.0f}/s), database {size_mb:.0f} MB")
+
+    shapes = {
+        "common word": lambda: f'"{words[rng.randrange(5)]}"',
+        "rare word": lambda: f'"{words[rng.randrange(5000, VOCABULARY_SIZE)]}"',
+        "prefix": lambda: f'"{words[rng.randrange(50, 500)][:3]}"*',
+        "two words": lambda: f'"{words[rng.randrange(50)]}" "{words[rng.randrange(50, 2000)]}"',
+    }
+    for shape, make_terms in shapes.items():
+        latencies, hits = [], []
+        for _ in range(args.queries):
+            user_id = rng.randint(1, args.users)
+            terms = make_terms()
+            t = time.perf_counter()
+            rows = DatabaseManager.search_journal_entries(user_id, terms, back.JOURNAL_PAGE_SIZE + 1, 0)
+            latencies.append(time.perf_counter() - t)
+            hits.append(len(rows))
+        latencies.sort()
+        print(f"{shape:12s} p50={percentile(latencies, 0.5) * 1000:7.2f}ms  p99={percentile(latencies, 0.99) * 1000:7.2f}ms  "
+              f"mean results={statistics.mean(hits):.1f}")
+    DatabaseManager.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--queries", type=int, default=200, help="timed searches per query shape")
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix="vibecheck-bench-")
+    os.environ["VIBECHECK_DB_PATH"] = os.path.join(work_dir, "wellness.db")
+    os.chdir(work_dir)
+    sys.path.insert(0, APP_DIR)
+    try:
+        run(args)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
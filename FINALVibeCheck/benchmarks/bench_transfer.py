@@ -0,0 +1,82 @@
+# bench_transfer.py
+
+"""Import and export throughput, and the server's peak memory, for one user with --rows entries.
+
+The NDJSON upload is generated while it is sent and the export is counted while it arrives, so neither
+side of this script holds the file either. A flat peak RSS as --rows grows shows the server streams too.
+RSS also counts database pages read through SQLite's memory map, up to VIBECHECK_DB_MMAP_SIZE (128 MB by
+default); set it to 0 to see the server's own memory alone.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from common import ADMIN_TOKEN, running_server, sign_in
+
+LINES_PER_CHUNK = 10000
+
+def ndjson_upload(rows: int, journal_every: int):
+    """Yields the upload in chunks: mostly moods, with a journal entry every `journal_every` rows."""
+    start = 1_600_000_000
+    lines = []
+    for i in range(rows):
+        ts = start + i * 600
+        when = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(ts))
+        if i % journal_every == 0:
+            record = {"type": "journal", "date": when, "ts": ts, "content": f"Benchmark journal entry {i}, with a little text."}
+        else:
+            record = {"type": "mood", "date": when, "ts": ts, "mood_score": i % 10 + 1, "notes": "benchmark"}
+        lines.append(json.dumps(record))
+        if len(lines) == LINES_PER_CHUNK:
+            yield ("\n".join(lines) + "\n").encode()
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--journal-every", type=int, default=10, help="every Nth row is a journal entry")
+    parser.add_argument("--port", type=int, default=8791)
+    args = parser.parse_args()
+
+    env = {"VIBECHECK_IMPORT_MAX_BYTES": str(10 * 1024 ** 3)}
+    with running_server(args.port, env) as server:
+        async def sign_in_once():
+            async with httpx.AsyncClient(base_url=server.url, timeout=30) as client:
+                return await sign_in(client, "transfer")
+        user_id, headers = asyncio.run(sign_in_once())
+        idle_rss = server.peak_rss_mb()
+
+        with httpx.Client(base_url=server.url, headers=headers, timeout=None) as client:
+            started = time.perf_counter()
+            response = client.post(f"/api/import/{user_id}", content=ndjson_upload(args.rows, args.journal_every))
+            response.raise_for_status()
+            seconds = time.perf_counter() - started
+            print(f"import         {args.rows / seconds:9.0f} rows/s  {seconds:7.1f}s  server: {response.json()}")
+            print(f"  peak server RSS {server.peak_rss_mb():.0f} MB (idle {idle_rss:.0f} MB)")
+
+            for fmt in ("ndjson", "csv"):
+                started = time.perf_counter()
+                first_byte = None
+                lines = nbytes = 0
+                with client.stream("GET", f"/api/export/{user_id}", params={"format": fmt}) as export:
+                    export.raise_for_status()
+                    for chunk in export.iter_bytes():
+                        first_byte = first_byte or time.perf_counter() - started
+                        lines += chunk.count(b"\n")
+                        nbytes += len(chunk)
+                seconds = time.perf_counter() - started
+                rows = lines - (fmt == "csv")
+                print(f"export {fmt:6s}  {rows / seconds:9.0f} rows/s  {seconds:7.1f}s  {nbytes / 1e6:.0f} MB, "
+                      f"first byte after {first_byte * 1000:.0f}ms")
+            print(f"  peak server RSS {server.peak_rss_mb():.0f} MB")
+            stats = client.get("/api/transfer-stats", headers={"Authorization": f"Bearer {ADMIN_TOKEN}"}).json()
+            print(f"server-side: {stats}")
+
+if __name__ == "__main__":
+    main()
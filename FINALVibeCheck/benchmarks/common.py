@@ -0,0 +1,86 @@
+# common.py
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import List, NamedTuple, Optional
+
+import httpx
+
+# Helpers shared by the benchmark scripts. Every run gets its own server process and scratch database,
+# so a benchmark never touches the wellness.db next to back.py.
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_TOKEN = "benchmark-admin"
+
+class Server(NamedTuple):
+    url: str
+    pid: int
+
+    def peak_rss_mb(self) -> float:
+        """The server's peak resident memory so far (Linux only)."""
+        with open(f"/proc/{self.pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+        return float("nan")
+
+@contextmanager
+def running_server(port: int, env: Optional[dict] = None, app_dir: str = APP_DIR):
+    """Starts `uvicorn back:app` from `app_dir` in a scratch directory and yields it once it answers."""
+    work_dir = tempfile.mkdtemp(prefix="vibecheck-bench-")
+    server_env = {
+        **os.environ,
+        "VIBECHECK_DB_PATH": os.path.join(work_dir, "wellness.db"),
+        "VIBECHECK_ADMIN_TOKEN": ADMIN_TOKEN,
+        # Nothing listens here, so the tip route answers from its local quotes instead of the internet.
+        "VIBECHECK_QUOTE_URL": "http://127.0.0.1:1/",
+        **(env or {}),
+        "PYTHONPATH": os.path.abspath(app_dir),
+    }
+    log = open(os.path.join(work_dir, "server.log"), "w")
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "back:app", "--port", str(port), "--log-level", "warning"],
+                              cwd=work_dir, env=server_env, stdout=log, stderr=subprocess.STDOUT)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + 60
+        while True:
+            if server.poll() is not None:
+                raise RuntimeError(f"The server exited early; see {log.name}.")
+            try:
+                httpx.get(f"{base_url}/api/wellness-tip", timeout=1)
+                break
+            except httpx.HTTPError:
+                if time.monotonic() > deadline:
+                    raise
+                time.sleep(0.2)
+        yield Server(base_url, server.pid)
+    finally:
+        server.terminate()
+        server.wait(30)
+        log.close()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+async def sign_in(client: httpx.AsyncClient, name: str, password: str = "benchmark-pw") -> tuple:
+    """Registers (if needed) and logs in; returns (user_id, headers for that user's requests)."""
+    await client.post("/api/register", json={"name": name, "password": password})
+    response = await client.post("/api/login", json={"name": name, "password": password})
+    response.raise_for_status()
+    data = response.json()
+    # Older trees, from before sessions, return no token; their routes need no header.
+    headers = {"Authorization": f"Bearer {data['token']}"} if "token" in data else {}
+    return data["user_id"], headers
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * fraction))]
+
+def latency_summary(latencies: List[float], duration: float) -> str:
+    latencies = sorted(latencies)
+    return (f"req/s={len(latencies) / duration:7.1f}  p50={percentile(latencies, 0.5) * 1000:7.1f}ms  "
+            f"p99={percentile(latencies, 0.99) * 1000:7.1f}ms  n={len(latencies)}")
@@ -0,0 +1,194 @@
+# insights.py
+
+from collections import OrderedDict
+from typing import Dict, Iterator
+import random
+import threading
+import numpy as np
+from analytics import AnalyticsEngine, MoodFrame
+
+# Like analytics.py, this module has no FastAPI or database imports: it turns the analytics engine's
+# feature columns into a category per user and picks a message for it from the catalog below.
+
+# --- Message Catalog ---
+# Built once at import; every response picks from these tuples.
+CATALOG = {
+    "not_enough": (
+        "Keep logging your mood for a few more days to unlock personalized insights!",
+    ),
+    "welcome_back": (
+        "Welcome back! A quick check-in today is a great way to pick the habit back up.",
+        "It's been a few days since your last check-in. How are you feeling right now?",
+        "Good to see you again. Logging even one mood today helps you spot your patterns.",
+        "No pressure about the break. Every check-in counts, starting with today's.",
+        "Life gets busy. Take a moment now to notice how you're doing.",
+    ),
+    "low": (
+        "It seems you've had a tough few days. Consider talking to a friend or engaging in a relaxing hobby.",
+        "Your mood has been trending lower recently. Remember that it's okay not to be okay. Prioritize rest.",
+        "Seeing a pattern of lower moods. A short walk outside can sometimes make a surprising difference.",
+        "It looks like things have been challenging lately. Please be extra kind to yourself.",
+        "Remember that tough times don't last forever. Your favorite comfort movie or a warm drink might help.",
+        "Your recent entries suggest you're going through a rough patch. Your feelings are valid; let yourself feel them.",
+        "When your mood is low, small comforts can help. Consider listening to some calming music or a podcast.",
+        "It's brave of you to keep logging even on difficult days. Acknowledging your feelings is a huge first step.",
+        "It looks like you could use a break. Is there something simple you can do to de-stress, even for 5 minutes?",
+        "Seeing this pattern is a sign to check in with yourself. Remember the support resources in the app if you need them.",
+        "Be gentle with yourself. Storms don't last forever.",
+        "It's okay to feel this way. Acknowledging difficult emotions is a sign of strength.",
+        "This seems like a difficult period. Make sure you're getting enough rest and being kind to your body and mind.",
+        "Remember that even a small step is still a step forward. Don't pressure yourself too much right now.",
+        "Your log shows you're navigating some tough feelings. Reaching out to someone you trust can often lighten the load.",
+    ),
+    "declining": (
+        "Your mood has been drifting lower over the past two weeks. Try to plan something small you enjoy.",
+        "The last few days have been a little harder than before. Be gentle with yourself and rest where you can.",
+        "Your check-ins show a downward trend lately. Talking to someone you trust can make a real difference.",
+        "Things seem to be getting heavier recently. Small routines like a walk or regular sleep can help steady you.",
+        "Your recent entries are lower than the ones before. Noticing that is an important first step.",
+    ),
+    "improving": (
+        "Your mood has been climbing over the past two weeks. Whatever you've changed, it seems to be helping!",
+        "Things are looking up! Your recent check-ins are steadily better than before.",
+        "Nice upward trend lately. Take a moment to notice what has been working for you.",
+        "Your mood is on the rise. Keep leaning into the habits that got you here.",
+        "Each week is looking a bit brighter than the last. That's real progress.",
+    ),
+    "fluctuating": (
+        "Your mood has been swinging quite a bit this week. A steady routine for sleep and meals can help even it out.",
+        "Big ups and downs lately. Jotting down what happened on the hardest and best days may reveal a pattern.",
+        "This week has been a rollercoaster. Be patient with yourself; strong swings are tiring.",
+        "Your check-ins vary a lot from day to day. Short breaks and time outside can help when things feel unsettled.",
+        "Some very different days recently. Remember that both the highs and the lows will pass.",
+    ),
+    "streak": (
+        "You've checked in every day for over a week. That consistency is a gift to yourself!",
+        "What a streak! Daily check-ins make your mood map more useful every day.",
+        "A week or more of daily check-ins. You're building a habit that really pays off.",
+        "Your logging streak is going strong. Keep showing up for yourself.",
+        "Consistency like yours makes it much easier to spot what helps you feel good.",
+    ),
+    "positive": (
+        "Your recent mood has been consistently positive. Keep up the great work!",
+        "Seeing lots of positive moods from you lately. Whatever you're doing, it's working!",
+        "It looks like you've been having a great week. Keep embracing that positive energy.",
+        "Your mood log is shining brightly! Thanks for sharing your positive moments.",
+        "A consistent high mood is a great sign of well-being. Keep riding that wave!",
+        "Fantastic! Your recent entries show a very positive trend. Keep it up.",
+        "It's wonderful to see such positive check-ins. You're doing great.",
+        "Your mood trend is pointing straight up! We love to see it.",
+        "You've been in a great headspace recently. Remember what this feels like.",
+        "The data shows a happy and healthy mindset. Keep building on this momentum.",
+        "Keep doing what you're doing! The positivity is clear from your entries.",
+        "Your consistent positive mood is an achievement worth celebrating.",
+        "It's great to see you thriving. Your mood log reflects a period of well-being.",
+        "Your mood entries are overwhelmingly positive. That's a wonderful sign.",
+        "The trend is clear: you've been feeling great. Keep that positive momentum going!",
+    ),
+    "neutral": (
+        "Your mood has been fluctuating. Remember to take time for self-care activities.",
+        "Some good days, some not-so-good days. That's a normal part of life's rhythm.",
+        "It seems like a mix of ups and downs recently. A consistent routine can sometimes help stabilize mood.",
+        "Your mood seems balanced but with some variations. Check in with yourself and see what you need today.",
+        "A mixed bag of moods is common. What's one small thing you can do for yourself today?",
+        "Your log shows a blend of different feelings. Remember that all your emotions are valid.",
+        "Navigating both highs and lows is part of the journey. Be patient with yourself.",
+        "It looks like an average week. Consider scheduling a small activity you enjoy to give yourself a boost.",
+        "Your mood is steady but has room for a lift. How about some fresh air or your favorite music?",
+        "A neutral trend can be a good time for reflection. What's one thing that could make tomorrow brighter?",
+        "The data shows a mix of moods. It's okay to have days where you just feel 'okay'.",
+        "Your mood has been steady. Acknowledging these neutral moments is as important as the highs and lows.",
+        "This period of balance could be a good time to build some new, healthy habits.",
+        "Your log shows a stable, neutral trend. This can be a sign of resilience.",
+        "It's okay to just be. Your mood entries show a period of calm and balance.",
+    ),
+}
+
+# --- Rules ---
+# Checked in order against each user's features as of today; the first match picks the category.
+MIN_ENTRIES_7D = 3
+GAP_DAYS = 3
+LOW_MEAN = 4
+HIGH_MEAN = 7
+TREND_SLOPE = 0.25          # mood points per day over the trend window
+FLUCTUATING_VARIANCE = 6.25  # a standard deviation of 2.5 points between daily averages
+STREAK_DAYS = 7
+
+def classify(features: Dict[str, np.ndarray]) -> np.ndarray:
+    """One category name per user for columns from MoodFrame.features(). NaN features match no rule."""
+    mean = features["mean_7d"]
+    slope = features["trend_slope"]
+    rules = [
+        ("welcome_back", (features["entries_7d"] < MIN_ENTRIES_7D) & (features["days_since_last"] >= GAP_DAYS)),
+        ("not_enough", features["entries_7d"] < MIN_ENTRIES_7D),
+        ("low", mean < LOW_MEAN),
+        ("declining", slope <= -TREND_SLOPE),
+        ("fluctuating", features["variance_7d"] >= FLUCTUATING_VARIANCE),
+        ("improving", slope >= TREND_SLOPE),
+        ("streak", features["current_streak"] >= STREAK_DAYS),
+        ("positive", mean >= HIGH_MEAN),
+    ]
+    return np.select([condition for _, condition in rules], [name for name, _ in rules], default="neutral")
+
+# --- INSIGHT ENGINE ---
+class InsightEngine:
+    """Recommendations from the analytics engine's features, memoized per user.
+
+    A memo entry is reused while the user is still served by the same MoodFrame on the same day. A mood
+    write makes the analytics engine hand out a new frame for that user, so their entry misses next time;
+    other users' entries stay valid until the next full reload.
+    """
+
+    def __init__(self, analytics: AnalyticsEngine, cache_size: int):
+        self.analytics = analytics
+        self.cache_size = cache_size
+        self._memo = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def category(self, user_id: int, today: int) -> str:
+        frame = self.analytics.frame_for(user_id)
+        with self._lock:
+            cached = self._memo.get(user_id)
+            if cached is not None and cached[:2] == (frame.serial, today):
+                self._memo.move_to_end(user_id)
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+
+        segment = frame.segment(user_id)
+        if segment is None:
+            category = "not_enough"
+        else:
+            category = str(classify(frame.features(today, np.array([segment])))[0])
+        with self._lock:
+            self._memo[user_id] = (frame.serial, today, category)
+            self._memo.move_to_end(user_id)
+            while len(self._memo) > self.cache_size:
+                self._memo.popitem(last=False)
+        return category
+
+    def recommend(self, user_id: int, today: int) -> dict:
+        category = self.category(user_id, today)
+        return {"recommendation": random.choice(CATALOG[category]), "category": category}
+
+    @staticmethod
+    def digest(frame: MoodFrame, today: int) -> Iterator[dict]:
+        """Scores every user in the frame in one pass: their category and the features behind it."""
+        features = frame.features(today)
+        categories = classify(features)
+        columns = {name: values.tolist() for name, values in features.items()}
+        for i, category in enumerate(categories.tolist()):
+            row = {name: _rounded(values[i]) for name, values in columns.items()}
+            row["category"] = category
+            yield row
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"size": len(self._memo), "max_size": self.cache_size, "hits": self.hits, "misses": self.misses}
+
+def _rounded(value):
+    if isinstance(value, float):
+        return None if value != value else round(value, 3)
+    return value
@@ -0,0 +1,149 @@
+# renderer.py
+
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import List, Optional
+import io
+import multiprocessing
+import threading
+import matplotlib
+matplotlib.use("Agg")
+from matplotlib.figure import Figure
+import matplotlib.dates as mdates
+
+# This module is imported by the render worker processes, so it must stay free of
+# FastAPI and database imports; workers only ever need matplotlib.
+
+# --- Color Constant for Charts ---
+PRIMARY_COLOR = "#0d6efd"
+
+# --- CHART RENDERING ---
+def render_mood_chart(dates: List[date], averages: List[float], title: str, timespan: str) -> bytes:
+    # A standalone Figure (no pyplot) keeps no global state, so renders never interfere.
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
+
+    ax.plot(dates, averages, marker='o', linestyle='-', color=PRIMARY_COLOR)
+    ax.set_title(title, fontsize=16, loc='center')
+    ax.set_ylabel("Mood")
+    ax.set_yticks([1, 3, 5, 7, 9])
+    ax.set_yticklabels(['😠 Angry', '😟 Sad', '😐 Neutral', '😊 Content', '😄 Happy'])
+    ax.set_ylim(0, 10)
+    ax.grid(True, linestyle='--', alpha=0.6, axis='y')
+
+    ax.margins(x=0.05)
+
+    ax.xaxis.set_major_formatter(mdates.DateFormatter('%m-%d'))
+    if timespan == "7d":
+        ax.xaxis.set_major_locator(mdates.DayLocator(interval=1))
+    else:
+        ax.xaxis.set_major_locator(mdates.DayLocator(interval=3))
+
+    for label in ax.get_xticklabels():
+        label.set_rotation(0)
+        label.set_horizontalalignment('center')
+
+    fig.tight_layout()
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+def _warm_up():
+    # Runs once per worker: loads the Agg backend, fonts and emoji glyph fallbacks before the first request.
+    render_mood_chart([date.today()], [5.0], "", "7d")
+
+def _ping():
+    return True
+
+# --- RENDER POOL (ChartRenderer) ---
+class RendererBusy(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__("The chart renderer queue is full.")
+        self.retry_after = retry_after
+
+class ChartRenderer:
+    """Process pool for chart renders with per-key request coalescing and a bounded queue."""
+
+    def __init__(self, workers: int, max_pending: int, retry_after: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.renders = 0
+        self.coalesced = 0
+        self.rejected = 0
+        self.resets = 0
+
+    def _new_executor(self) -> ProcessPoolExecutor:
+        # "spawn" avoids forking a server process that already runs threads.
+        executor = ProcessPoolExecutor(max_workers=self.workers,
+                                       mp_context=multiprocessing.get_context("spawn"),
+                                       initializer=_warm_up)
+        # Workers are started on demand, so submit one no-op per worker to start them all now.
+        for _ in range(self.workers):
+            executor.submit(_ping)
+        return executor
+
+    def start(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = self._new_executor()
+
+    def submit(self, key: str, dates: List[date], averages: List[float], title: str, timespan: str) -> Future:
+        """Returns a future for the PNG bytes; callers asking for a key already being rendered share its future."""
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.coalesced += 1
+                return future
+            if len(self._in_flight) >= self.max_pending:
+                self.rejected += 1
+                raise RendererBusy(self.retry_after)
+            if self._executor is None:
+                self._executor = self._new_executor()
+            try:
+                future = self._executor.submit(render_mood_chart, dates, averages, title, timespan)
+            except BrokenProcessPool:
+                # A worker died (e.g. OOM-killed); replace the whole pool and try once more.
+                self._reset(self._executor)
+                self._executor = self._new_executor()
+                future = self._executor.submit(render_mood_chart, dates, averages, title, timespan)
+            executor = self._executor
+            self.renders += 1
+            self._in_flight[key] = future
+        future.add_done_callback(lambda done: self._finished(key, executor, done))
+        return future
+
+    def _finished(self, key: str, executor: ProcessPoolExecutor, future: Future):
+        broken = not future.cancelled() and isinstance(future.exception(), BrokenProcessPool)
+        with self._lock:
+            self._in_flight.pop(key, None)
+            # A worker died mid-render, so every later submit to this pool would fail; the next one starts a new pool.
+            if broken and self._executor is executor:
+                self._reset(executor)
+                self._executor = None
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        executor.shutdown(wait=False, cancel_futures=True)
+        self.resets += 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": len(self._in_flight),
+                "renders": self.renders,
+                "coalesced": self.coalesced,
+                "rejected": self.rejected,
+                "resets": self.resets,
+            }
@@ -0,0 +1,39 @@
+# conftest.py
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# back.py opens its database, signing key and cache directories at import time, relative to the
+# working directory, so point all of them at a scratch directory before any test imports it.
+WORK_DIR = tempfile.mkdtemp(prefix="vibecheck-tests-")
+os.environ.setdefault("VIBECHECK_DB_PATH", os.path.join(WORK_DIR, "wellness.db"))
+os.environ.setdefault("VIBECHECK_SESSION_SECRET", "test-secret")
+os.environ.setdefault("VIBECHECK_CHART_CACHE_DIR", os.path.join(WORK_DIR, "chart_cache"))
+# Every test signs in from the same TestClient address; keep the login limiter out of the way.
+os.environ.setdefault("VIBECHECK_LOGIN_IP_BURST", "100000")
+os.chdir(WORK_DIR)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture(scope="session")
+def client():
+    """A TestClient with the app's lifespan running; the pools it closes on exit cannot be reopened."""
+    from fastapi.testclient import TestClient
+    import back
+
+    with TestClient(back.app) as test_client:
+        yield test_client
+
+@pytest.fixture
+def login(client):
+    """Registers and signs in a fresh user; returns (user_id, Authorization headers)."""
+    import secrets
+
+    def login_as(name: str = None):
+        name = name or f"user-{secrets.token_hex(4)}"
+        client.post("/api/register", json={"name": name, "password": "correct horse"}).raise_for_status()
+        data = client.post("/api/login", json={"name": name, "password": "correct horse"}).json()
+        return data["user_id"], {"Authorization": f"Bearer {data['token']}"}
+    return login_as
@@ -0,0 +1,37 @@
+# test_event_streams.py
+
+import asyncio
+
+from starlette.requests import Request
+
+import back
+
+def stream_request(user_id: int) -> Request:
+    return Request({"type": "http", "method": "GET", "path": f"/api/events/{user_id}", "query_string": b"",
+                    "headers": [(b"authorization", b"Bearer unused")]})
+
+def open_streams(user_id: int) -> int:
+    return len(back.event_broker._streams.get(user_id, ()))
+
+def test_response_dropped_before_streaming_holds_no_stream():
+    # A client that disconnects before the response is iterated must not use up one of its streams.
+    async def scenario():
+        for _ in range(back.EVENTS_MAX_STREAMS_PER_USER + 1):
+            response = await back.get_events(7001, stream_request(7001), None)
+            del response
+        return open_streams(7001)
+
+    assert asyncio.run(scenario()) == 0
+
+def test_stream_subscribes_while_iterated_and_releases_on_close():
+    async def scenario():
+        response = await back.get_events(7002, stream_request(7002), None)
+        body = response.body_iterator
+        first = await body.__anext__()
+        during = open_streams(7002)
+        await body.aclose()
+        return first, during, open_streams(7002)
+
+    first, during, after = asyncio.run(scenario())
+    assert "event: ready" in first
+    assert (during, after) == (1, 0)
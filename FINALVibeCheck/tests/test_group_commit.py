@@ -0,0 +1,47 @@
+# test_group_commit.py
+
+import asyncio
+import time
+
+import back
+from back import DatabaseManager, GroupCommitWriter
+
+def mood_row(user_id: int, score: int) -> tuple:
+    now = time.time()
+    return (user_id, score, "", back.datetime.fromtimestamp(now).isoformat(), int(now), back.today_number())
+
+def test_cancelled_waiter_does_not_stop_the_writer():
+    writer = GroupCommitWriter(DatabaseManager.pool, window=0.05, max_rows=64, max_pending=16)
+
+    async def cancel_then_insert():
+        # Cancelling the awaiting task cancels the concurrent future, as a client disconnect would.
+        waiter = asyncio.ensure_future(asyncio.wrap_future(writer.submit(mood_row(9001, 4))))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.wait_for(asyncio.wrap_future(writer.submit(mood_row(9001, 6))), 5)
+
+    try:
+        asyncio.run(cancel_then_insert())
+        # A third insert after the batch holding the cancelled row has been committed.
+        writer.submit(mood_row(9001, 8)).result(timeout=5)
+        assert writer._thread.is_alive()
+    finally:
+        writer.shutdown()
+    with DatabaseManager.get_connection() as conn:
+        scores = [row[0] for row in conn.execute("SELECT mood_score FROM mood_entries WHERE user_id = 9001 ORDER BY id")]
+    # The cancelled waiter's row was still stored; only its acknowledgement was dropped.
+    assert scores == [4, 6, 8]
+
+def test_failed_batch_fails_its_waiters_and_keeps_the_thread(monkeypatch):
+    writer = GroupCommitWriter(DatabaseManager.pool, window=0.01, max_rows=64, max_pending=16)
+
+    def broken_commit(batch):
+        raise RuntimeError("boom")
+    try:
+        monkeypatch.setattr(writer, "_commit", broken_commit)
+        failed = writer.submit(mood_row(9002, 5))
+        assert isinstance(failed.exception(timeout=5), RuntimeError)
+        monkeypatch.undo()
+        writer.submit(mood_row(9002, 7)).result(timeout=5)
+    finally:
+        writer.shutdown()
@@ -0,0 +1,63 @@
+# test_journal_search.py
+
+import back
+
+def add_journals(client, user_id, headers, *contents):
+    for content in contents:
+        client.post("/api/journal-entry", json={"user_id": user_id, "content": content}, headers=headers).raise_for_status()
+
+def search(client, user_id, headers, q, **params):
+    response = client.get(f"/api/journals/{user_id}/search", params={"q": q, **params}, headers=headers)
+    response.raise_for_status()
+    return response.json()
+
+def test_search_finds_prefix_matches_with_highlighted_snippets(client, login):
+    user_id, headers = login()
+    add_journals(client, user_id, headers, "Went running in the park", "Rainy day, stayed in", "run run run")
+    result = search(client, user_id, headers, "runn")
+    assert [entry["snippet"] for entry in result["entries"]] == [
+        f"Went {back.SNIPPET_OPEN}running{back.SNIPPET_CLOSE} in the park"]
+    assert result["next_cursor"] is None
+
+def test_markup_in_entries_is_not_a_highlight(client, login):
+    user_id, headers = login()
+    add_journals(client, user_id, headers, "I typed <mark>tags</mark> before walking")
+    snippet = search(client, user_id, headers, "walking")["entries"][0]["snippet"]
+    assert snippet == f"I typed <mark>tags</mark> before {back.SNIPPET_OPEN}walking{back.SNIPPET_CLOSE}"
+
+def test_search_only_sees_own_entries(client, login):
+    user_id, headers = login()
+    other_id, other_headers = login()
+    add_journals(client, other_id, other_headers, "a secret about swimming")
+    assert search(client, user_id, headers, "swimming")["entries"] == []
+    response = client.get(f"/api/journals/{other_id}/search", params={"q": "swimming"}, headers=headers)
+    assert response.status_code == 403
+
+def test_search_pages_with_an_offset_cursor(client, login):
+    user_id, headers = login()
+    add_journals(client, user_id, headers, *[f"coffee number {i}" for i in range(5)])
+    seen = []
+    cursor = None
+    while True:
+        result = search(client, user_id, headers, "coffee", limit=2, **({"cursor": cursor} if cursor else {}))
+        seen += [entry["id"] for entry in result["entries"]]
+        cursor = result["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 5
+
+def test_query_syntax_is_taken_literally(client, login):
+    user_id, headers = login()
+    add_journals(client, user_id, headers, "ru or nothing")
+    assert len(search(client, user_id, headers, 'ru" OR NOT (')["entries"]) == 1
+    assert search(client, user_id, headers, "!!")["entries"] == []
+
+def test_deleted_entries_leave_the_index(client, login):
+    user_id, headers = login()
+    add_journals(client, user_id, headers, "forgettable gardening note")
+    entry_id = search(client, user_id, headers, "gardening")["entries"][0]["id"]
+    client.delete(f"/api/journal/{entry_id}", headers=headers).raise_for_status()
+    assert search(client, user_id, headers, "gardening")["entries"] == []
+    with back.DatabaseManager.get_connection() as conn:
+        # Raises if the external-content index has drifted from journal_entries.
+        conn.execute("INSERT INTO journal_fts(journal_fts, rank) VALUES('integrity-check', 1)")
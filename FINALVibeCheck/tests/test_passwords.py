@@ -0,0 +1,46 @@
+# test_passwords.py
+
+import hashlib
+import logging
+
+import pytest
+
+from back import DatabaseManager, PasswordHasher
+
+@pytest.fixture
+def hasher():
+    hasher = PasswordHasher(n=2 ** 10, r=8, p=1, workers=1, max_pending=4)
+    yield hasher
+    hasher.shutdown()
+
+def test_hash_round_trip(hasher):
+    stored = hasher.hash("correct horse")
+    assert hasher.verify("correct horse", stored)
+    assert not hasher.verify("wrong horse", stored)
+    assert not hasher.needs_rehash(stored)
+
+def test_legacy_sha256_hashes_still_verify(hasher):
+    legacy = hashlib.sha256(b"password123").hexdigest()
+    assert hasher.verify("password123", legacy)
+    assert not hasher.verify("password124", legacy)
+    assert hasher.needs_rehash(legacy)
+
+@pytest.mark.parametrize("stored", [
+    "scrypt$1024$8$1$c2FsdA==",                        # truncated: no digest part
+    "scrypt$1024$8$1$!!notbase64$ZGlnZXN0",            # salt is not base64
+    "scrypt$abc$8$1$c2FsdA==$ZGlnZXN0",                # N is not a number
+    "scrypt$1000$8$1$c2FsdA==$ZGlnZXN0",               # N is not a power of two
+    "scrypt$1024$8$1$c2FsdA==$ZGlnZXN0$extra",         # too many parts
+    "sha256-but-not-hex-\u00e9",                       # legacy value with non-ASCII text
+])
+def test_malformed_hashes_fail_closed_and_are_logged(hasher, stored, caplog):
+    with caplog.at_level(logging.ERROR, logger="vibecheck"):
+        assert hasher.verify("anything", stored) is False
+    assert "malformed stored password hash" in caplog.text
+
+def test_login_against_a_corrupt_row_is_refused(client):
+    client.post("/api/register", json={"name": "corrupt", "password": "correct horse"}).raise_for_status()
+    with DatabaseManager.get_connection() as conn:
+        conn.execute("UPDATE users SET password_hash = 'scrypt$16384$8$1$truncated' WHERE name = 'corrupt'")
+    response = client.post("/api/login", json={"name": "corrupt", "password": "correct horse"})
+    assert response.status_code == 401
@@ -0,0 +1,52 @@
+# test_query_plans.py
+
+from contextlib import contextmanager
+
+import pytest
+
+import back
+from back import DatabaseManager
+
+@pytest.fixture
+def traced(monkeypatch):
+    """Records every statement DatabaseManager runs, with its parameters filled in."""
+    statements = []
+    connection = DatabaseManager.get_connection
+
+    @contextmanager
+    def traced_connection():
+        with connection() as conn:
+            conn.set_trace_callback(statements.append)
+            try:
+                yield conn
+            finally:
+                conn.set_trace_callback(None)
+    monkeypatch.setattr(DatabaseManager, "get_connection", staticmethod(traced_connection))
+    return statements
+
+def query_plan(sql: str) -> list:
+    with DatabaseManager.get_connection() as conn:
+        return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+def assert_uses_indexes(statements: list, *indexes: str):
+    selects = [sql for sql in statements if sql.lstrip().upper().startswith("SELECT")]
+    assert selects, "the call ran no query"
+    for sql in selects:
+        plan = query_plan(sql)
+        scans = [step for step in plan if step.startswith("SCAN")]
+        assert not scans, f"full scan in {sql!r}: {plan}"
+        for index in indexes:
+            assert any(index in step for step in plan), f"{index} not used by {sql!r}: {plan}"
+
+def test_calendar_query_searches_both_day_indexes(traced):
+    DatabaseManager.get_activity_dates(1, back.to_day_number(back.date(2024, 1, 1)), back.today_number())
+    assert_uses_indexes(traced, "idx_mood_entries_user_day", "idx_journal_entries_user_day")
+
+def test_today_query_searches_mood_day_index(traced):
+    DatabaseManager.get_mood_entries_for_today(1)
+    assert_uses_indexes(traced, "idx_mood_entries_user_day")
+
+@pytest.mark.parametrize("before", [None, (back.today_number(), 1000)])
+def test_journal_page_query_searches_journal_day_index(traced, before):
+    DatabaseManager.get_journal_page(1, 20, before)
+    assert_uses_indexes(traced, "idx_journal_entries_user_day")
@@ -0,0 +1,107 @@
+# test_wellness_tip.py
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from back import WellnessTipService, local_tip
+
+class StubQuotes(BaseHTTPRequestHandler):
+    """Stands in for zenquotes.io; the test sets `server.healthy` and reads `server.hits`."""
+
+    def do_GET(self):
+        self.server.hits += 1
+        if not self.server.healthy:
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = json.dumps([{"q": "Stub quote.", "a": "Stub Author"}]).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+@pytest.fixture
+def upstream():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubQuotes)
+    server.healthy, server.hits = True, 0
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+def run(service: WellnessTipService, scenario):
+    async def main():
+        try:
+            return await scenario()
+        finally:
+            await service.stop()
+    return asyncio.run(main())
+
+def test_fetches_and_caches_until_midnight(upstream):
+    service = WellnessTipService(upstream.url, 1.0, 3, 60, 60)
+
+    async def scenario():
+        assert await service.refresh()
+        first, second = service.get(), service.get()
+        await asyncio.sleep(0)
+        return first, second
+    first, second = run(service, scenario)
+    assert first == second == {"quote": "Stub quote.", "author": "Stub Author", "source": "zenquotes"}
+    # Both reads came from the cache; only the refresh went upstream.
+    assert upstream.hits == 1
+
+def test_falls_back_to_a_local_tip_when_upstream_fails(upstream):
+    upstream.healthy = False
+    service = WellnessTipService(upstream.url, 1.0, 3, 60, 60)
+
+    async def scenario():
+        tip = service.get()
+        # get() answers at once and leaves the refresh running in the background.
+        await service._refresh_task
+        return tip
+    assert run(service, scenario) == local_tip()
+    assert upstream.hits == 1
+    assert service.failures == 1
+
+def test_breaker_opens_after_the_failure_threshold(upstream):
+    upstream.healthy = False
+    service = WellnessTipService(upstream.url, 1.0, 2, 60, 60)
+
+    async def scenario():
+        results = [await service.refresh() for _ in range(5)]
+        service.get()
+        return results
+    assert run(service, scenario) == [False] * 5
+    # Two failures open the breaker; neither the later refreshes nor get() reach upstream.
+    assert upstream.hits == 2
+    assert service._breaker_open()
+
+def test_half_open_retry_after_the_cooldown(upstream):
+    upstream.healthy = False
+    service = WellnessTipService(upstream.url, 1.0, 1, 0.2, 60)
+
+    async def scenario():
+        assert not await service.refresh()
+        assert service._breaker_open()
+        await asyncio.sleep(0.25)
+        # One trial call after the cooldown; it fails, so the breaker re-opens without further calls.
+        assert not await service.refresh()
+        assert not await service.refresh()
+        assert upstream.hits == 2
+        upstream.healthy = True
+        await asyncio.sleep(0.25)
+        return await service.refresh()
+    assert run(service, scenario)
+    assert upstream.hits == 3
+    assert not service._breaker_open() and service.failures == 0
+    assert service._tip["source"] == "zenquotes"